@@ -1,17 +1,22 @@
+import argparse
+import importlib
 import os
 from dotenv import load_dotenv
-import openai
 import time
 import sys
+import threading
 from datetime import datetime
 
-from db.init_duckdb import load_expenditures_table
 from llm.agent import TIFAgent
-from pdf_index.vector_index import build_pdf_index
+from llm.resources import AgentResources, WARM_UP_COMPONENTS
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI()
+
+# Short tool names for the progress line
+TOOL_NAMES = {"query_sql_database": "SQL", "search_pdf_documents": "PDF search"}
+
+# Heavy dependencies, timed one by one by --profile-startup
+STARTUP_IMPORTS = ["duckdb", "numpy", "pyarrow", "openai", "llama_index.core", "llama_index.llms.openai"]
 
 def print_header(text: str):
     """Print a formatted header."""
@@ -50,29 +55,129 @@ def print_with_spinner(text: str, spinner):
     sys.stdout.write(f"\r{next(spinner)} {text}")
     sys.stdout.flush()
 
-def ensure_pdf_index_exists(persist_dir="vectorstore"):
+class Spinner:
+    """Animate a spinner with a status line on a background thread until stopped."""
+
+    def __init__(self, text: str, interval: float = 0.1):
+        self.text = text
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._spin, daemon=True)
+
+    def _spin(self):
+        spinner = spinning_cursor()
+        while not self._stop.is_set():
+            print_with_spinner(self.text.ljust(60), spinner)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            # Clear the spinner
+            sys.stdout.write("\r" + " " * 100 + "\r")
+            sys.stdout.flush()
+
+def ensure_pdf_index_exists(persist_dir="vectorstore", pdf_dir="pdfs") -> bool:
     """
-    Check if PDF vector index exists. If not, build it.
+    Check if PDF vector index exists. If not, build it. Returns True if it was
+    built with an ingestion manifest and so can be brought up to date with any
+    new, changed or deleted PDFs by `update_pdf_index`.
     """
-    if not os.path.exists(os.path.join(persist_dir, "docstore.json")):
+    from pdf_index.binary_store import BinaryVectorStore
+    from pdf_index.manifest import IngestManifest
+
+    # A JSON store is only convertible if it has vectors; a bare docstore needs a rebuild
+    convertible = os.path.exists(os.path.join(persist_dir, "default__vector_store.json"))
+    if not (BinaryVectorStore.exists(persist_dir) or convertible):
+        from pdf_index.vector_index import build_pdf_index
         print_warning("No vector index found. Building one from PDFs...")
-        build_pdf_index(pdf_dir="pdfs", persist_dir=persist_dir)
+        build_pdf_index(pdf_dir=pdf_dir, persist_dir=persist_dir)
         print_success("PDF vector index built successfully!")
+        return False
+    if IngestManifest.load(persist_dir) is not None:
+        return True
+    print_success("PDF vector index found.")
+    return False
+
+def update_pdf_index(resources: AgentResources, persist_dir="vectorstore", pdf_dir="pdfs"):
+    """Bring the PDF index up to date with the PDFs on disk, then load it for searching."""
+    from pdf_index.vector_index import build_pdf_index
+
+    stats = build_pdf_index(pdf_dir=pdf_dir, persist_dir=persist_dir, incremental=True)
+    if stats["files_added"] or stats["files_changed"] or stats["files_removed"]:
+        # A question asked meanwhile may have opened the old index
+        resources.pdf_engine.reload()
     else:
-        print_success("PDF vector index found and loaded.")
+        resources.warm_up(["pdf index"])
+
+def start_warm_up(resources: AgentResources, update_index: bool):
+    """
+    Initialize the database, LLM client and SQL cache on one background thread
+    and update and load the PDF index on another, while the prompt is already
+    accepting input. A question that arrives first waits only for what it uses.
+    """
+    resources.start_warm_up([c for c in WARM_UP_COMPONENTS if c != "pdf index"])
+    target = (lambda: update_pdf_index(resources)) if update_index else (lambda: resources.warm_up(["pdf index"]))
+    threading.Thread(target=target, daemon=True, name="pdf-index-warm-up").start()
+
+def profile_startup():
+    """
+    Report what a cold start spends where: the imports of each heavy dependency
+    (each counting only modules not already imported by an earlier line), then
+    each component's initialization, run one after another in the foreground.
+    """
+    timings = []
+
+    def timed(label, work):
+        start_time = time.perf_counter()
+        work()
+        timings.append((label, time.perf_counter() - start_time))
+
+    # The app's own modules are already imported; this measures the work deferred until now
+    for module in STARTUP_IMPORTS:
+        try:
+            timed(f"import {module}", lambda: importlib.import_module(module))
+        except ImportError:
+            print_warning(f"{module} is not installed")
+    timed("PDF index check", ensure_pdf_index_exists)
+    resources = AgentResources()
+    timed("agent", lambda: TIFAgent(resources=resources))
+    for component, seconds in resources.warm_up().items():
+        timings.append((f"init {component}", seconds))
+    resources.close()
+
+    print_header("Startup Profile")
+    for label, seconds in timings:
+        print(f"  {label:<32} {seconds * 1000:>9.1f} ms")
+    print(f"  {'total':<32} {sum(seconds for _, seconds in timings) * 1000:>9.1f} ms")
 
 def main():
+    parser = argparse.ArgumentParser(description="Interactive assistant for TIF expenditures and reports.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report import and initialization time for each component, then exit")
+    args = parser.parse_args()
+    if args.profile_startup:
+        profile_startup()
+        return
+
     print_header("TIF Data Analysis Assistant")
     print_info("Initializing system...")
     
-    # Initialize database
-    print_step("Loading DuckDB with TIF expenditure data...")
-    ensure_pdf_index_exists()
+    # Only building a missing PDF index blocks the prompt; everything else warms up in the background
+    print_step("Checking the PDF vector index...")
+    update_index = ensure_pdf_index_exists()
     
     # Initialize the TIF agent
     print_step("Initializing AI agent...")
-    agent = TIFAgent(client)
-    print_success("System ready!")
+    resources = AgentResources()
+    agent = TIFAgent(resources=resources)
+    start_warm_up(resources, update_index)
+    print_success("System ready! (loading data and the index in the background)")
 
     print_header("Interactive Session Started")
     print_info("You can ask questions about TIF expenditures and reports.")
@@ -93,25 +198,32 @@ def main():
 
         try:
             print_step("Processing your question...")
-            spinner = spinning_cursor()
-            
-            # Start time for response
-            start_time = time.time()
-            
-            # Process the query using our agent
-            response = agent.process_query(nl_query)
-            
-            # Calculate response time
-            response_time = time.time() - start_time
-            
-            # Clear the spinner
-            sys.stdout.write("\r" + " " * 100 + "\r")
+            spinner = Spinner("Thinking...").start()
+            tool_tokens = 0
+            answer_started = False
             
-            print_header("Response")
-            print(response)
-            print_info(f"Response generated in {response_time:.2f} seconds")
+            # Process the query using our agent, rendering the answer as it streams in
+            for event in agent.stream_query(nl_query):
+                if event["type"] == "status":
+                    spinner.text = event["text"]
+                elif event["type"] == "tool_delta":
+                    tool_tokens += 1
+                    spinner.text = f"{TOOL_NAMES.get(event['tool'], event['tool'])}: receiving ({tool_tokens} pieces)..."
+                elif event["type"] == "token":
+                    if not answer_started:
+                        spinner.stop()
+                        print_header("Response")
+                        answer_started = True
+                    sys.stdout.write(event["text"])
+                    sys.stdout.flush()
+                elif event["type"] == "done":
+                    spinner.stop()
+                    print()
+                    print_info(f"Response generated in {event['seconds']:.2f} seconds "
+                               f"(first token after {event['ttft']:.2f} seconds)")
             
         except Exception as e:
+            spinner.stop()
             print_error(f"Error processing query: {e}")
             print_warning("Please try rephrasing your question or ask something else.")
 
@@ -0,0 +1,39 @@
+from typing import Dict, List
+
+# Representative questions by kind. `sql` is what the scripted fake LLM answers
+# when asked to translate the question, so the SQL path runs real queries offline.
+QUESTIONS: List[Dict[str, str]] = [
+    # SQL only
+    {"kind": "sql", "question": "How much did Kinzie spend in 2022?"},
+    {"kind": "sql", "question": "What was LaSalle's total spending in 2021?"},
+    {"kind": "sql", "question": "How much did Pilsen spend on Public Works in 2020?"},
+    {"kind": "sql", "question": "Break down Kinzie's 2023 spending by category."},
+    {"kind": "sql", "question": "Which ten districts spent the most in 2022?",
+     "sql": 'SELECT "TIF District", total_spent FROM spend_by_district_year '
+            'WHERE "Report Year" = 2022 ORDER BY total_spent DESC LIMIT 10'},
+    {"kind": "sql", "question": "What is the average yearly spending per district since 2015?",
+     "sql": 'SELECT "TIF District", AVG(total_spent) AS avg_yearly_spent FROM spend_by_district_year '
+            'WHERE "Report Year" >= 2015 GROUP BY 1 ORDER BY avg_yearly_spent DESC'},
+    {"kind": "sql", "question": "How did total spending across all districts change year over year?",
+     "sql": 'SELECT "Report Year", SUM(total_spent) AS total_spent, '
+            'SUM(total_spent) - LAG(SUM(total_spent)) OVER (ORDER BY "Report Year") AS change '
+            'FROM spend_by_district_year GROUP BY 1 ORDER BY 1'},
+    # PDF only
+    {"kind": "pdf", "question": "What were the main goals of the Kinzie plan?"},
+    {"kind": "pdf", "question": "Describe the projects LaSalle funded in 2021."},
+    {"kind": "pdf", "question": "Which reports mention environmental remediation?"},
+    {"kind": "pdf", "question": "What did the Pilsen report say about affordable housing?"},
+    # Mixed
+    {"kind": "mixed", "question": "How much did Kinzie spend in 2023 and what were their main goals?"},
+    {"kind": "mixed", "question": "What was LaSalle's total spending in 2022 and which projects did the report describe?"},
+    {"kind": "mixed", "question": "How much did Pilsen spend on Public Works in 2021, and what infrastructure plans did they report?"},
+]
+
+
+def questions_of(kind: str) -> List[Dict[str, str]]:
+    """Questions of one kind, or all of them for "all"."""
+    return [q for q in QUESTIONS if kind == "all" or q["kind"] == kind]
+
+
+def scripted_sql_answers() -> Dict[str, str]:
+    return {q["question"]: q["sql"] for q in QUESTIONS if "sql" in q}
@@ -0,0 +1,257 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+STAGES = ["csv", "index", "pdf", "sql", "agent"]
+
+
+def rss_bytes() -> int:
+    """Current resident set size (falls back to the peak where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakMemory:
+    """
+    Sample the process RSS on a background thread while a stage runs. Unlike
+    tracemalloc this sees DuckDB, numpy and Arrow allocations and adds no
+    overhead to the measured code. Worker processes are not included.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.baseline = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.baseline = self.peak = rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+def measure(stage: str, calls: List[Callable[[], object]], concurrency=1, verbose=False, units=None) -> Dict:
+    """Run `calls`, `concurrency` at a time, and report latency percentiles, throughput and peak memory."""
+    from tracing.summarize import percentile
+
+    latencies = []
+
+    def timed(call):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with PeakMemory() as memory, output:
+        start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(timed, calls))
+        else:
+            for call in calls:
+                timed(call)
+        wall = time.perf_counter() - start
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    result = {
+        "stage": stage,
+        "n": len(calls),
+        "wall_s": wall,
+        "per_second": len(calls) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "max_ms": max(latencies_ms),
+        "peak_rss_mb": memory.peak / 2**20,
+        "rss_growth_mb": (memory.peak - memory.baseline) / 2**20,
+    }
+    if units:
+        # e.g. rows or pages processed, for stages measured as a single call
+        result["units"] = f"{units[1] / wall:,.0f} {units[0]}/s" if wall else ""
+    return result
+
+
+def prepare_data(args):
+    """
+    Generate the synthetic CSV and PDFs, reusing them when the parameters are unchanged.
+
+    Regenerating deletes data/, pdfs/, vectorstore/ and tif.duckdb in the working
+    directory, so only an empty directory or one marked by an earlier run is used.
+    """
+    from bench.synthetic_data import generate_expenditures_csv, generate_pdf_corpus
+
+    params = {"rows": args.rows, "reports": args.reports, "pages": args.pages, "seed": args.seed}
+    marker = "bench_data.json"
+    if not os.path.exists(marker) and os.listdir("."):
+        raise ValueError(f"{os.getcwd()} is not empty and was not created by the benchmarks; "
+                         "pass an empty or new --workdir")
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == params:
+                return
+    for path in ("data", "pdfs", "vectorstore", "tif.duckdb", "tif.duckdb.wal"):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    print(f"Generating {args.rows:,} expenditure rows and {args.reports} PDFs of {args.pages} pages...")
+    generate_expenditures_csv("data/tif_expenditures.csv", rows=args.rows, seed=args.seed)
+    generate_pdf_corpus("pdfs", reports=args.reports, pages=args.pages, seed=args.seed)
+    with open(marker, "w") as f:
+        json.dump(params, f)
+
+
+def run(args) -> List[Dict]:
+    from bench.questions import questions_of, scripted_sql_answers
+    from llm.fake_client import FakeOpenAIClient, FakeSynthesizer, ReplayOpenAIClient
+    from pdf_index.embedders import OpenAIEmbedder
+
+    client_options = {"chat_latency": args.chat_latency, "embedding_latency": args.embedding_latency,
+                      "token_latency": args.token_latency, "sql_answers": scripted_sql_answers()}
+    client = (ReplayOpenAIClient(args.fixtures, strict=args.strict, **client_options) if args.fixtures
+              else FakeOpenAIClient(**client_options))
+    # Real embedding code path, answered offline by the fake client with stub vectors
+    embedder = OpenAIEmbedder(client=client)
+    synthesizer = FakeSynthesizer(latency=args.chat_latency)
+    stages = args.stages
+    results = []
+
+    if "csv" in stages:
+        from db.init_duckdb import sync_expenditures_table
+        if os.path.exists("tif.duckdb"):
+            os.remove("tif.duckdb")
+        results.append(measure("csv load (DuckDB)", [sync_expenditures_table], verbose=args.verbose,
+                               units=("rows", args.rows)))
+
+    if "index" in stages:
+        from pdf_index.vector_index import build_pdf_index
+        build = lambda: build_pdf_index("pdfs", "vectorstore", incremental=False, embedder=embedder)
+        results.append(measure("index build", [build], verbose=args.verbose,
+                               units=("pages", args.reports * args.pages)))
+
+    if stages & {"pdf", "sql", "agent"}:
+        from llm.query_planner import get_schema_context
+        from llm.resources import AgentResources
+        from llm.sql_cache import SQLTranslationCache
+
+        def new_resources():
+            return AgentResources(client, persist_dir="vectorstore", embedder=embedder, synthesizer=synthesizer,
+                                  sql_cache=SQLTranslationCache(get_schema_context(), embedder=embedder, path=":memory:"),
+                                  max_parallel_tools=4)
+
+    if "pdf" in stages:
+        from pdf_index.query_pdf import query_pdf_index
+        resources = new_resources()
+        results.append(measure("pdf index load", [resources.pdf_engine.load], verbose=args.verbose))
+        questions = [q["question"] for q in questions_of("pdf") + questions_of("mixed")] * args.repeat
+        calls = [lambda q=q: query_pdf_index(q, engine=resources.pdf_engine) for q in questions]
+        results.append(measure("query_pdf_index", calls, args.concurrency, args.verbose))
+        resources.close()
+
+    if "sql" in stages:
+        from llm.agent import TIFAgent
+        resources = new_resources()
+        agent = TIFAgent(client, resources=resources)
+        questions = [q["question"] for q in questions_of("sql") + questions_of("mixed")] * args.repeat
+        calls = [lambda q=q: agent._execute_function("query_sql_database", json.dumps({"query": q}))
+                 for q in questions]
+        results.append(measure("sql path", calls, args.concurrency, args.verbose))
+        resources.close()
+
+    if "agent" in stages:
+        from llm.agent import TIFAgent
+        resources = new_resources()
+        resources.pdf_engine.load()
+        questions = [q["question"] for q in questions_of("all")]
+        # One session per repeat, asking every question in turn; sessions run side by side with --concurrency
+        sessions = [TIFAgent(client, resources=resources, session_id=f"bench-{i}") for i in range(args.repeat)]
+        calls = [lambda agent=agent: [agent.process_query(q) for q in questions] for agent in sessions]
+        result = measure("agent session", calls, args.concurrency, args.verbose,
+                         units=("turns", len(questions) * len(sessions)))
+        results.append(result)
+        resources.close()
+
+    if isinstance(client, ReplayOpenAIClient):
+        print(f"Replay: {len(client.fixtures.entries)} recorded responses, {client.misses} requests fell back to the fake")
+    return results
+
+
+def format_results(results: List[Dict]) -> str:
+    header = (f"{'stage':<20} {'n':>5} {'wall s':>8} {'per s':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} "
+              f"{'peak RSS MB':>11} {'growth MB':>9}  throughput")
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(f"{r['stage']:<20} {r['n']:>5} {r['wall_s']:>8.2f} {r['per_second']:>8.2f} {r['p50_ms']:>9.1f} "
+                     f"{r['p95_ms']:>9.1f} {r['max_ms']:>9.1f} {r['peak_rss_mb']:>11.1f} {r['rss_growth_mb']:>9.1f}  "
+                     f"{r.get('units', '')}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks for index build, PDF queries, the SQL path and full agent turns. "
+                    "Runs on synthetic data with a fake (or replayed) LLM: no network, no API key.")
+    parser.add_argument("--workdir", default="bench_workdir", help="Where synthetic data, index and DB are kept")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of {STAGES}")
+    parser.add_argument("--rows", type=int, default=100_000, help="Synthetic expenditure rows")
+    parser.add_argument("--reports", type=int, default=20, help="Synthetic PDF reports")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per report")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the question set")
+    parser.add_argument("--concurrency", type=int, default=1, help="Queries or sessions run side by side")
+    parser.add_argument("--chat-latency", type=float, default=0.0, help="Simulated seconds per chat completion")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Simulated seconds per streamed word")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Simulated seconds per embeddings call")
+    parser.add_argument("--fixtures", help="Replay chat/embedding responses recorded with RecordingOpenAIClient")
+    parser.add_argument("--strict", action="store_true", help="Fail on requests missing from --fixtures")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--trace", action="store_true", help="Write tracing spans to traces.jsonl in the workdir")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own logging")
+    args = parser.parse_args()
+    args.stages = set(args.stages.split(","))
+    if args.fixtures:
+        args.fixtures = os.path.abspath(args.fixtures)
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    # Modules resolve data/, pdfs/, tif.duckdb and vectorstore/ relative to the working directory
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir)
+    os.environ["TIF_TRACE_EXPORTER"] = "jsonl" if args.trace else "none"
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+    try:
+        prepare_data(args)
+    except ValueError as e:
+        parser.error(str(e))
+    results = run(args)
+    print(format_results(results))
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"args": {k: (sorted(v) if isinstance(v, set) else v) for k, v in vars(args).items()},
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
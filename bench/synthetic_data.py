@@ -0,0 +1,164 @@
+import argparse
+import csv
+import os
+import random
+import zlib
+from typing import List, Sequence
+
+import numpy as np
+
+from db.rollups import CATEGORY_COLUMNS
+
+NAMED_DISTRICTS = [
+    "Kinzie", "LaSalle", "Pilsen", "Bronzeville", "Englewood", "Midway", "Austin", "Calumet",
+    "Lakeside", "Humboldt", "Belmont", "Galewood", "Roosevelt", "Ogden", "Stockyards", "Woodlawn",
+]
+FIRST_YEAR = 2000
+LAST_YEAR = 2023
+CSV_BLOCK_ROWS = 100_000
+
+PROJECTS = [
+    "streetscape improvements along the main commercial corridor",
+    "environmental remediation of a former industrial site",
+    "a new branch library and community center",
+    "affordable housing with 120 rental units",
+    "replacement of aging water mains and sewers",
+    "job training partnerships with the community college",
+    "a transit station renovation and new bus shelters",
+    "school roof and window replacements",
+    "land assembly for a light manufacturing campus",
+    "park renovations and new playgrounds",
+]
+GOALS = [
+    "attract private investment and create permanent jobs",
+    "reduce vacancy along commercial streets",
+    "improve public infrastructure to support redevelopment",
+    "preserve affordable housing for existing residents",
+    "return contaminated land to productive use",
+]
+
+
+def district_names(count: int) -> List[str]:
+    """`count` district names: the named ones first, then numbered ones."""
+    names = NAMED_DISTRICTS[:count]
+    names += [f"District {i:05d}" for i in range(len(names) + 1, count + 1)]
+    return names
+
+
+def generate_expenditures_csv(path: str, rows=10_000, seed=0, years: Sequence[int] = range(FIRST_YEAR, LAST_YEAR + 1)) -> str:
+    """
+    Write a synthetic expenditures CSV with the real column layout: one row per
+    district and report year, nineteen category amounts per row.
+
+    Rows are generated in numpy blocks, so millions of rows take seconds and
+    little memory. The same `rows` and `seed` always give the same file.
+    """
+    years = list(years)
+    districts = district_names(max(1, -(-rows // len(years))))
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["TIF District", "Report Year", *CATEGORY_COLUMNS])
+        for block_start in range(0, rows, CSV_BLOCK_ROWS):
+            block_rows = min(CSV_BLOCK_ROWS, rows - block_start)
+            # Most categories are zero in a given year; the rest are log-normally distributed
+            amounts = rng.lognormal(mean=11, sigma=1.5, size=(block_rows, len(CATEGORY_COLUMNS)))
+            amounts[rng.random((block_rows, len(CATEGORY_COLUMNS))) < 0.6] = 0
+            amounts = amounts.round().astype(np.int64)
+            for offset in range(block_rows):
+                i = block_start + offset
+                writer.writerow([districts[i // len(years)], years[i % len(years)], *amounts[offset].tolist()])
+    return path
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(path: str, pages: List[List[str]]):
+    """
+    Write a minimal PDF with one Helvetica text line per entry on each page.
+    Enough for pypdf text extraction without a PDF-writing dependency.
+    """
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    page_ids = []
+    next_id = 4
+    for lines in pages:
+        content = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td"]
+        for line in lines:
+            content.append(f"({_pdf_escape(line)}) Tj T*")
+        content.append("ET")
+        stream = zlib.compress("\n".join(content).encode("latin-1", errors="replace"))
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        objects[content_id] = (b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream)) + stream + b"\nendstream"
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(page_id)
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[2] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for obj_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def _report_pages(district: str, year: int, pages: int, rng: random.Random) -> List[List[str]]:
+    result = []
+    for page in range(pages):
+        lines = [f"CITY OF CHICAGO, ILLINOIS - {district.upper()} REDEVELOPMENT PROJECT", f"Annual Report {year}, page {page + 1}", ""]
+        for _ in range(40):
+            kind = rng.random()
+            if kind < 0.4:
+                lines.append(f"In {year} the {district} district funded {rng.choice(PROJECTS)}.")
+            elif kind < 0.7:
+                lines.append(f"The main goal of the {district} plan is to {rng.choice(GOALS)}.")
+            else:
+                lines.append(f"Expenditures for {rng.choice(CATEGORY_COLUMNS).lower()} totaled "
+                             f"${rng.randint(10_000, 5_000_000):,} during fiscal year {year}.")
+        result.append(lines)
+    return result
+
+
+def generate_pdf_corpus(out_dir: str, reports=20, pages=5, seed=0, years: Sequence[int] = range(2019, 2024)) -> List[str]:
+    """
+    Write `reports` synthetic annual reports named `District_Year.pdf`, matching
+    the districts of `generate_expenditures_csv`. Returns the written paths.
+    """
+    years = list(years)
+    districts = district_names(max(1, -(-reports // len(years))))
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(reports):
+        district, year = districts[i // len(years)], years[i % len(years)]
+        rng = random.Random(f"{seed}-{district}-{year}")
+        path = os.path.join(out_dir, f"{district.replace(' ', '_')}_{year}.pdf")
+        write_text_pdf(path, _report_pages(district, year, pages, rng))
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic expenditures CSV and PDF report corpus.")
+    parser.add_argument("--csv", default="data/tif_expenditures.csv")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--pdf-dir", default="pdfs")
+    parser.add_argument("--reports", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_expenditures_csv(args.csv, rows=args.rows, seed=args.seed)
+    print(f"Wrote {args.rows} rows to {args.csv}")
+    paths = generate_pdf_corpus(args.pdf_dir, reports=args.reports, pages=args.pages, seed=args.seed)
+    print(f"Wrote {len(paths)} PDFs ({args.pages} pages each) to {args.pdf_dir}")
@@ -0,0 +1,31 @@
+import queue
+from contextlib import contextmanager
+
+
+class CursorPool:
+    """
+    Fixed-size pool of DuckDB cursors over one database connection.
+
+    DuckDB connections must not be used from several threads at once, but
+    cursors (duplicated connections to the same database) can. Borrowing from a
+    bounded pool also caps how many queries run against the database at a time.
+    """
+
+    def __init__(self, con, size=8):
+        self.con = con
+        self.size = size
+        self._cursors = queue.Queue()
+        for _ in range(size):
+            self._cursors.put(con.cursor())
+
+    @contextmanager
+    def cursor(self, timeout=None):
+        cursor = self._cursors.get(timeout=timeout)
+        try:
+            yield cursor
+        finally:
+            self._cursors.put(cursor)
+
+    def close(self):
+        while not self._cursors.empty():
+            self._cursors.get_nowait().close()
@@ -1,9 +1,137 @@
+import hashlib
+import os
+import time
+from typing import Optional
+
 import duckdb
-import pandas as pd
-
-def load_expenditures_table(csv_path="data/tif_expenditures.csv"):
-    df = pd.read_csv(csv_path)
-    con = duckdb.connect("tif.duckdb")
-    con.register("raw_df", df)
-    con.execute("CREATE OR REPLACE TABLE expenditures AS SELECT * FROM raw_df")
-    return con
+
+from db.rollups import DISTRICT_YEAR_ROLLUP, refresh_rollups, rollups_exist
+
+DEFAULT_CSV_PATH = "data/tif_expenditures.csv"
+DEFAULT_DB_PATH = "tif.duckdb"
+TABLE_NAME = "expenditures"
+
+
+def _file_sha256(path: str, block_size=1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ensure_sources_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS _sources (
+            table_name VARCHAR PRIMARY KEY,
+            path VARCHAR,
+            mtime_ns BIGINT,
+            size BIGINT,
+            sha256 VARCHAR,
+            loaded_at TIMESTAMP
+        )
+    """)
+
+
+def _table_exists(con, table_name: str) -> bool:
+    return con.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table_name]
+    ).fetchone()[0] > 0
+
+
+def _rollups_current(con, sha256) -> bool:
+    row = con.execute("SELECT sha256 FROM _sources WHERE table_name = ?", [DISTRICT_YEAR_ROLLUP]).fetchone()
+    return row is not None and row[0] == sha256 and rollups_exist(con)
+
+
+def _refresh_rollups(con, sha256):
+    """Refresh the rollups and record which data version they reflect. Run inside a transaction."""
+    start_time = time.time()
+    refresh_rollups(con, TABLE_NAME)
+    con.execute("INSERT OR REPLACE INTO _sources VALUES (?, ?, NULL, NULL, ?, now())",
+                [DISTRICT_YEAR_ROLLUP, TABLE_NAME, sha256])
+    print(f"Rollups up to date in {time.time() - start_time:.2f} seconds")
+
+
+def _ensure_rollups(con):
+    """Build or refresh the rollups if they lag the `expenditures` table, e.g. in a database from before rollups."""
+    if not _table_exists(con, TABLE_NAME):
+        return
+    sha256 = get_data_version(con)
+    if _rollups_current(con, sha256):
+        return
+    con.execute("BEGIN TRANSACTION")
+    _refresh_rollups(con, sha256)
+    con.execute("COMMIT")
+
+
+def sync_expenditures_table(csv_path=DEFAULT_CSV_PATH, db_path=DEFAULT_DB_PATH) -> bool:
+    """
+    Make sure the `expenditures` table in `db_path` reflects `csv_path`.
+
+    The CSV is only (re)loaded, with DuckDB's native `read_csv_auto`, when its
+    size/mtime changed and its content hash no longer matches the one recorded
+    at the last load. The district/year rollups (see `db.rollups`) are refreshed
+    in the same transaction. Returns True if the table was reloaded.
+    """
+    con = duckdb.connect(db_path)
+    try:
+        _ensure_sources_table(con)
+        reloaded = _sync_csv(con, csv_path, db_path)
+        _ensure_rollups(con)
+        return reloaded
+    finally:
+        con.close()
+
+
+def _sync_csv(con, csv_path: str, db_path: str) -> bool:
+    loaded = con.execute(
+        "SELECT mtime_ns, size, sha256 FROM _sources WHERE table_name = ?", [TABLE_NAME]
+    ).fetchone()
+    has_table = _table_exists(con, TABLE_NAME)
+
+    if not os.path.exists(csv_path):
+        if has_table:
+            print(f"{csv_path} not found, using the existing {TABLE_NAME} table in {db_path}")
+            return False
+        raise FileNotFoundError(f"No expenditures CSV at {csv_path} and no {TABLE_NAME} table in {db_path}")
+
+    stat = os.stat(csv_path)
+    if has_table and loaded and loaded[0] == stat.st_mtime_ns and loaded[1] == stat.st_size:
+        return False
+
+    sha256 = _file_sha256(csv_path)
+    if has_table and loaded and loaded[2] == sha256:
+        # Touched but not modified; remember the new mtime so we don't hash again
+        con.execute("UPDATE _sources SET mtime_ns = ?, size = ? WHERE table_name = ?",
+                    [stat.st_mtime_ns, stat.st_size, TABLE_NAME])
+        return False
+
+    start_time = time.time()
+    con.execute("BEGIN TRANSACTION")
+    con.execute(f"CREATE OR REPLACE TABLE {TABLE_NAME} AS SELECT * FROM read_csv_auto(?)", [csv_path])
+    con.execute("INSERT OR REPLACE INTO _sources VALUES (?, ?, ?, ?, ?, now())",
+                [TABLE_NAME, csv_path, stat.st_mtime_ns, stat.st_size, sha256])
+    _refresh_rollups(con, sha256)
+    con.execute("COMMIT")
+    print(f"Loaded {csv_path} into {db_path} in {time.time() - start_time:.2f} seconds")
+    return True
+
+
+def get_data_version(con) -> Optional[str]:
+    """Content hash of the CSV the `expenditures` table was loaded from, if recorded."""
+    if not _table_exists(con, "_sources"):
+        return None
+    row = con.execute("SELECT sha256 FROM _sources WHERE table_name = ?", [TABLE_NAME]).fetchone()
+    return row[0] if row else None
+
+
+def connect_read_only(db_path=DEFAULT_DB_PATH):
+    """Open the database read-only, for query workers."""
+    return duckdb.connect(db_path, read_only=True)
+
+
+def load_expenditures_table(csv_path=DEFAULT_CSV_PATH, db_path=DEFAULT_DB_PATH, read_only=True):
+    """Sync the `expenditures` table with its CSV if needed and return a connection to the database."""
+    sync_expenditures_table(csv_path, db_path)
+    return duckdb.connect(db_path, read_only=read_only)
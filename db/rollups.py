@@ -0,0 +1,164 @@
+from typing import List
+
+# Spending category columns that add up to a district's total expenditure
+CATEGORY_COLUMNS = [
+    "Cost of Studies", "Administrative Cost", "Marketing Sites", "Site Preparation Costs",
+    "Renovation, Rehab, Etc.", "Public Works", "Removing Contaminants", "Job Training", "Financing Costs",
+    "Capital Costs", "School Districts", "Library Districts", "Relocation Costs", "In Lieu of Taxes",
+    "Job Training/Retraining", "Interest Cost", "New Housing", "Day Care Services", "Other",
+]
+
+DISTRICT_YEAR_ROLLUP = "spend_by_district_year"
+CATEGORY_ROLLUP = "spend_by_category"
+KEY_COLUMNS = ['"TIF District"', '"Report Year"']
+YOY_COLUMNS = ["prev_total", "yoy_change", "yoy_pct"]
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _columns(con, table: str) -> List[str]:
+    return [row[0] for row in con.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+        [table],
+    ).fetchall()]
+
+
+def rollup_categories(con, source_table="expenditures") -> List[str]:
+    """Category columns present in `source_table`, or [] if it can't be rolled up by district and year."""
+    columns = _columns(con, source_table)
+    if "TIF District" not in columns or "Report Year" not in columns:
+        return []
+    return [c for c in CATEGORY_COLUMNS if c in columns]
+
+
+def rollups_exist(con) -> bool:
+    return bool(_columns(con, DISTRICT_YEAR_ROLLUP)) and bool(_columns(con, CATEGORY_ROLLUP))
+
+
+def _drop_temp_tables(con):
+    for table in ("_rollup_fresh", "_rollup_changed", "_rollup_stale", "_rollup_districts", "_rollup_yoy"):
+        con.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def refresh_rollups(con, source_table="expenditures") -> int:
+    """
+    Bring the precomputed spend rollups up to date with `source_table`.
+
+    `spend_by_district_year` holds one row per district and report year: every
+    category amount, `total_spent`, and the change from the previous year
+    (`prev_total`, `yoy_change`, `yoy_pct`). `spend_by_category` is the same
+    data in long form, one row per district, year and category.
+
+    The source is aggregated in one grouped scan and compared with the stored
+    rollup; only district-years whose sums changed (or disappeared) are
+    rewritten, and year-over-year figures are recomputed only for the districts
+    they belong to. Run inside the caller's transaction. Returns the number of
+    district-years rewritten or removed.
+    """
+    categories = rollup_categories(con, source_table)
+    if not categories:
+        return 0
+    keys = ", ".join(KEY_COLUMNS)
+    value_columns = [_quote(c) for c in categories] + ["total_spent", "source_rows"]
+    sums = ",\n".join(f"CAST(SUM({c}) AS DOUBLE) AS {c}" for c in map(_quote, categories))
+    total = " + ".join(f"COALESCE({_quote(c)}, 0)" for c in categories)
+
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _rollup_fresh AS
+        SELECT {keys}, {sums}, CAST(SUM({total}) AS DOUBLE) AS total_spent, COUNT(*) AS source_rows
+        FROM {source_table}
+        WHERE "TIF District" IS NOT NULL AND "Report Year" IS NOT NULL
+        GROUP BY {keys}
+    """)
+
+    # A changed category set (new CSV layout) can't be diffed; start over
+    expected = ["TIF District", "Report Year", *categories, "total_spent", "source_rows", *YOY_COLUMNS]
+    if _columns(con, DISTRICT_YEAR_ROLLUP) != expected or not _columns(con, CATEGORY_ROLLUP):
+        con.execute(f"DROP TABLE IF EXISTS {DISTRICT_YEAR_ROLLUP}")
+        con.execute(f"DROP TABLE IF EXISTS {CATEGORY_ROLLUP}")
+        con.execute(f"""
+            CREATE TABLE {DISTRICT_YEAR_ROLLUP} AS
+            SELECT *, NULL::DOUBLE AS prev_total, NULL::DOUBLE AS yoy_change, NULL::DOUBLE AS yoy_pct
+            FROM _rollup_fresh LIMIT 0
+        """)
+        con.execute(f"""
+            CREATE TABLE {CATEGORY_ROLLUP} AS
+            SELECT {keys}, NULL::VARCHAR AS category, NULL::DOUBLE AS amount, NULL::DOUBLE AS prev_amount,
+                   NULL::DOUBLE AS yoy_change, NULL::DOUBLE AS yoy_pct
+            FROM _rollup_fresh LIMIT 0
+        """)
+
+    projection = ", ".join(KEY_COLUMNS + value_columns)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _rollup_changed AS
+        SELECT {projection} FROM _rollup_fresh
+        EXCEPT SELECT {projection} FROM {DISTRICT_YEAR_ROLLUP}
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _rollup_stale AS
+        SELECT {keys} FROM _rollup_changed
+        UNION (SELECT {keys} FROM {DISTRICT_YEAR_ROLLUP} EXCEPT SELECT {keys} FROM _rollup_fresh)
+    """)
+    stale = con.execute("SELECT COUNT(*) FROM _rollup_stale").fetchone()[0]
+    removed = stale - con.execute("SELECT COUNT(*) FROM _rollup_changed").fetchone()[0]
+    if stale == 0:
+        _drop_temp_tables(con)
+        return 0
+
+    con.execute(f"""
+        DELETE FROM {DISTRICT_YEAR_ROLLUP} r USING _rollup_stale s
+        WHERE r."TIF District" = s."TIF District" AND r."Report Year" = s."Report Year"
+    """)
+    con.execute(f"INSERT INTO {DISTRICT_YEAR_ROLLUP} BY NAME SELECT * FROM _rollup_changed")
+
+    # Year-over-year figures compare with the previous calendar year, so they are
+    # NULL after a gap. A changed year also moves the following year's figures,
+    # hence recomputing whole districts.
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _rollup_districts AS
+        SELECT DISTINCT "TIF District" FROM _rollup_stale
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _rollup_yoy AS
+        SELECT cur."TIF District", cur."Report Year", prev.total_spent AS prev_total
+        FROM {DISTRICT_YEAR_ROLLUP} cur
+        LEFT JOIN {DISTRICT_YEAR_ROLLUP} prev
+          ON prev."TIF District" = cur."TIF District" AND prev."Report Year" = cur."Report Year" - 1
+        WHERE cur."TIF District" IN (SELECT "TIF District" FROM _rollup_districts)
+    """)
+    con.execute(f"""
+        UPDATE {DISTRICT_YEAR_ROLLUP} r SET
+            prev_total = y.prev_total,
+            yoy_change = r.total_spent - y.prev_total,
+            yoy_pct = CASE WHEN y.prev_total <> 0 THEN (r.total_spent - y.prev_total) / y.prev_total * 100 END
+        FROM _rollup_yoy y
+        WHERE r."TIF District" = y."TIF District" AND r."Report Year" = y."Report Year"
+    """)
+
+    con.execute(f"""
+        DELETE FROM {CATEGORY_ROLLUP}
+        WHERE "TIF District" IN (SELECT "TIF District" FROM _rollup_districts)
+    """)
+    con.execute(f"""
+        INSERT INTO {CATEGORY_ROLLUP}
+        WITH long AS (
+            UNPIVOT (
+                SELECT {keys}, {", ".join(map(_quote, categories))} FROM {DISTRICT_YEAR_ROLLUP}
+                WHERE "TIF District" IN (SELECT "TIF District" FROM _rollup_districts)
+            )
+            ON {", ".join(map(_quote, categories))}
+            INTO NAME category VALUE amount
+        )
+        SELECT cur."TIF District", cur."Report Year", cur.category, cur.amount, prev.amount,
+               cur.amount - prev.amount,
+               CASE WHEN prev.amount <> 0 THEN (cur.amount - prev.amount) / prev.amount * 100 END
+        FROM long cur
+        LEFT JOIN long prev
+          ON prev."TIF District" = cur."TIF District" AND prev.category = cur.category
+         AND prev."Report Year" = cur."Report Year" - 1
+    """)
+    _drop_temp_tables(con)
+    print(f"Refreshed rollups: {stale - removed} district-years rewritten, {removed} removed")
+    return stale
@@ -1,30 +1,95 @@
-import pandas as pd
+from functools import lru_cache
 
-def get_prompt_context(csv_path="data/tif_expenditures.csv") -> str:
+from db.init_duckdb import DEFAULT_CSV_PATH, DEFAULT_DB_PATH, TABLE_NAME, connect_read_only, get_data_version, \
+    sync_expenditures_table
+from db.rollups import CATEGORY_COLUMNS, CATEGORY_ROLLUP, DISTRICT_YEAR_ROLLUP, rollups_exist
+
+# `get_prompt_context` returns this, plus the reason, instead of raising
+SCHEMA_ERROR_PREFIX = "-- Failed to read schema"
+
+
+def get_prompt_context(csv_path=DEFAULT_CSV_PATH, db_path=DEFAULT_DB_PATH) -> str:
+    """
+    Build the NL-to-SQL system prompt from the DuckDB catalog.
+
+    The table is synced with its CSV first (a no-op unless the file changed), and
+    the prompt is memoized per data version, so repeated calls cost one stat.
+    """
     try:
-        df = pd.read_csv(csv_path)
+        sync_expenditures_table(csv_path, db_path)
+        con = connect_read_only(db_path)
+        try:
+            version = get_data_version(con)
+        finally:
+            con.close()
+        return _build_prompt_context(db_path, version)
     except Exception as e:
-        return f"-- Failed to read CSV: {e}"
+        return f"{SCHEMA_ERROR_PREFIX}: {e}"
+
+
+def schema_available(prompt_context: str) -> bool:
+    """False for the error text `get_prompt_context` returns when the schema couldn't be read."""
+    return not prompt_context.startswith(SCHEMA_ERROR_PREFIX)
+
+
+@lru_cache(maxsize=8)
+def _build_prompt_context(db_path: str, data_version) -> str:
+    con = connect_read_only(db_path)
+    try:
+        columns = [row[0] for row in con.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [TABLE_NAME],
+        ).fetchall()]
+        districts = []
+        years = []
+        if "TIF District" in columns:
+            districts = [row[0] for row in con.execute(
+                f'SELECT DISTINCT "TIF District" FROM {TABLE_NAME} WHERE "TIF District" IS NOT NULL ORDER BY 1 LIMIT 5'
+            ).fetchall()]
+        if "Report Year" in columns:
+            years = [row[0] for row in con.execute(
+                f'SELECT DISTINCT "Report Year" FROM {TABLE_NAME} WHERE "Report Year" IS NOT NULL ORDER BY 1 DESC LIMIT 5'
+            ).fetchall()]
+        has_rollups = rollups_exist(con)
+    finally:
+        con.close()
+
+    columns_list = "\n".join([f"- `{col}`" for col in columns])
 
-    columns_list = "\n".join([f"- `{col}`" for col in df.columns])
-    districts = df['TIF District'].dropna().unique() if 'TIF District' in df.columns else []
-    years = df['Report Year'].dropna().unique() if 'Report Year' in df.columns else []
-    
     sample_query = ""
     if len(districts) > 0 and len(years) > 0:
-        sample_query = f'''Example: SELECT SUM("Cost of Studies" + "Administrative Cost" + "Marketing Sites" + "Site Preparation Costs" + "Renovation, Rehab, Etc." + "Public Works" + "Removing Contaminants" + "Job Training" + "Financing Costs" + "Capital Costs" + "School Districts" + "Library Districts" + "Relocation Costs" + "In Lieu of Taxes" + "Job Training/Retraining" + "Interest Cost" + "New Housing" + "Day Care Services" + "Other") AS total_spent 
-FROM expenditures 
+        if has_rollups:
+            sample_query = f'''Example: SELECT total_spent
+FROM {DISTRICT_YEAR_ROLLUP}
+WHERE "TIF District" = '{districts[0]}' AND "Report Year" = {years[0]}'''
+        else:
+            total_expr = " + ".join(f'"{col}"' for col in CATEGORY_COLUMNS)
+            sample_query = f'''Example: SELECT SUM({total_expr}) AS total_spent
+FROM expenditures
 WHERE "TIF District" = '{districts[0]}' AND "Report Year" = {years[0]}'''
-    
+
+    rollups = ""
+    if has_rollups:
+        rollups = (
+            "Precomputed rollups of the same data. Prefer them over summing `expenditures` for totals, "
+            "category amounts and year-over-year changes; they are much smaller and already aggregated:\n"
+            f"- `{DISTRICT_YEAR_ROLLUP}`: one row per district and year with `TIF District`, `Report Year`, "
+            "one column per spending category (same names as above), `total_spent`, and the change from the "
+            "previous year: `prev_total`, `yoy_change`, `yoy_pct` (percent; NULL when the previous year is missing)\n"
+            f"- `{CATEGORY_ROLLUP}`: one row per district, year and category with `TIF District`, `Report Year`, "
+            "`category` (a spending column name, e.g. 'Public Works'), `amount`, `prev_amount`, `yoy_change`, `yoy_pct`\n\n"
+        )
+
     prompt = (
         "You are a SQL expert. You will be given a natural language query about TIF (Tax Increment Financing) expenditures.\n\n"
         "The data is stored in a table called 'expenditures' with the following columns:\n"
         f"{columns_list}\n\n"
-        f"Sample districts: {', '.join(map(str, districts[:5]))}\n"
-        f"Sample years: {', '.join(map(str, years[:5]))}\n\n"
+        f"{rollups}"
+        f"Sample districts: {', '.join(map(str, districts))}\n"
+        f"Sample years: {', '.join(map(str, years))}\n\n"
         f"{sample_query}\n\n"
         "Convert the natural language query to SQL. Return ONLY the SQL query without any explanation.\n\n"
         "IMPORTANT: Column names must be quoted with double quotes since they contain spaces."
     )
-    
+
     return prompt
@@ -1,19 +1,21 @@
-from typing import List, Dict, Any, Optional
-import openai
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Callable, TYPE_CHECKING
+import asyncio
+import contextvars
 import json
-import pandas as pd
-from openai.types.chat import ChatCompletionMessageParam
-from db.init_duckdb import load_expenditures_table
-from runner.executor import run_query
-from llm.query_planner import generate_sql_from_nl
-from llm.result_humanizer import humanize_query_result
-from pdf_index.query_pdf import query_pdf_index
-from db.schema_discovery import get_prompt_context
+import queue
+import uuid
+from concurrent.futures import Future
+from llm.resources import AgentResources
+from llm.history import ConversationHistory, HISTORY_TOKEN_BUDGET
+from tracing.tracer import current_span, record_usage, span
 import time
-from io import StringIO
 
-# Get schema context for function descriptions
-SCHEMA_CONTEXT = get_prompt_context()
+# The OpenAI SDK, pyarrow and llama-index take seconds to import; tools import
+# what they need on first use (see AgentResources for the shared state)
+if TYPE_CHECKING:
+    import openai
+    from openai.types.chat import ChatCompletionMessageParam
+    from llm.sql_cache import SQLTranslationCache
 
 # Define our available functions
 FUNCTIONS = [
@@ -79,14 +81,40 @@ FUNCTIONS = [
     }
 ]
 
+# The same functions in the tools format, which allows several calls per model turn
+TOOLS = [{"type": "function", "function": function} for function in FUNCTIONS]
+
+# Tools whose results are shared across sessions through AgentResources.tool_cache
+CACHED_TOOLS = {"query_sql_database", "search_pdf_documents"}
+
+
+class ToolError(Exception):
+    """A tool call failed; the message is what the model is told. Failed results are never cached."""
+
+
+# Status lines shown to streaming callers while a tool runs
+TOOL_STATUS = {
+    "get_schema_info": "Reading the database schema...",
+    "query_sql_database": "Querying the expenditures database...",
+    "search_pdf_documents": "Searching the PDF reports...",
+    "humanize_result": "Formatting the result...",
+}
+
 class TIFAgent:
-    def __init__(self, client: openai.OpenAI):
-        self.client = client
-        self.con = load_expenditures_table()  # Initialize database connection
-        self.conversation_history: List[ChatCompletionMessageParam] = [
-            {
-                "role": "system",
-                "content": """You are an AI assistant specialized in helping users understand Tax Increment Financing (TIF) data.
+    def __init__(self, client: Optional["openai.OpenAI"] = None, persist_dir: str = "vectorstore",
+                 sql_cache: Optional["SQLTranslationCache"] = None, max_parallel_tools: int = 4,
+                 resources: Optional[AgentResources] = None, history_token_budget: int = HISTORY_TOKEN_BUDGET,
+                 llm_humanizer: bool = False, session_id: Optional[str] = None):
+        # Sessions served side by side share one set of resources; a standalone agent builds its own
+        self.resources = resources or AgentResources(client, persist_dir=persist_dir, sql_cache=sql_cache,
+                                                     max_parallel_tools=max_parallel_tools)
+        self.tool_pool = self.resources.tool_pool  # Runs SQL and PDF tools concurrently
+        self.session_id = session_id or uuid.uuid4().hex[:12]  # Groups this conversation's traces
+        # SQL results are formatted locally unless the (slower, inexact) LLM humanizer is asked for
+        self.llm_humanizer = llm_humanizer
+        # Older tool results and turns are compacted so each request stays within the token budget
+        self.history = ConversationHistory(
+            """You are an AI assistant specialized in helping users understand Tax Increment Financing (TIF) data.
                 You can query a SQL database of TIF expenditures and search through PDF documents and reports.
                 Always try to provide comprehensive answers by combining information from both sources when relevant.
                 Be precise with numbers and dates, and always cite your sources.
@@ -97,123 +125,385 @@ class TIFAgent:
                 3. Combine both sources when a question requires both types of information
                 4. Always provide context and cite your sources.
                 
-                IMPORTANT: Always use function calling to interact with the system. Do not try to generate SQL queries directly."""
-            }
-        ]
+                IMPORTANT: Always use function calling to interact with the system. Do not try to generate SQL queries directly.
+                When a question needs several independent lookups (e.g. spending from SQL and goals from PDFs), request them together in one turn.""",
+            token_budget=history_token_budget,
+        )
+
+    # The client, database and engines are built by the resources on first use
+    @property
+    def client(self) -> "openai.OpenAI":
+        return self.resources.client
+
+    @property
+    def con(self):
+        return self.resources.con
+
+    @property
+    def pdf_engine(self):
+        return self.resources.pdf_engine  # Index loaded once, on first PDF search
+
+    @property
+    def sql_cache(self) -> "SQLTranslationCache":
+        return self.resources.sql_cache
+
+    @property
+    def template_planner(self):
+        return self.resources.template_planner
+
+    @property
+    def conversation_history(self) -> List["ChatCompletionMessageParam"]:
+        return self.history.messages
 
     def add_message(self, role: str, content: str, name: Optional[str] = None):
         """Add a message to the conversation history."""
         message = {"role": role, "content": content}
         if name:
             message["name"] = name
-        self.conversation_history.append(message)
+        self.history.append(message)
+
+    def reload_pdf_index(self):
+        """Reload the resident PDF index after it has been rebuilt on disk."""
+        self.pdf_engine.reload()
 
     def process_query(self, query: str) -> str:
-        """Process a user query using function calling."""
+        """Process a user query using tool calling, running a turn's tool calls concurrently."""
+        answer = ""
+        for event in self.stream_query(query):
+            if event["type"] == "done":
+                answer = event["answer"]
+        return answer
+
+    def stream_query(self, query: str) -> Iterator[Dict[str, Any]]:
+        """
+        Process a user query like `process_query`, yielding events as they happen:
+
+            {"type": "status", "text": ...}            a tool call started
+            {"type": "tool_delta", "tool": ..., "text": ...}  partial output of a running tool
+            {"type": "token", "text": ...}             a piece of the final answer
+            {"type": "done", "answer": ..., "ttft": ..., "seconds": ...}
+
+        `ttft` is the time to the first answer token, `seconds` the total time.
+        """
+        with span("agent.query", session_id=self.session_id) as s:
+            for event in self._stream_query(query, s):
+                yield event
+
+    def _stream_query(self, query: str, query_span) -> Iterator[Dict[str, Any]]:
         self.add_message("user", query)
         sources_used = set()
         start_time = time.time()
-        executed_queries = set()  # Track executed queries to prevent duplicates
+        first_token_time = None
+        prompt_tokens = []  # (estimated, reported by the API) for each model call this turn
+
+        def finish(answer: str) -> Iterator[Dict[str, Any]]:
+            total_time = time.time() - start_time
+            ttft = (first_token_time or time.time()) - start_time
+            query_span.set(ttft_ms=round(ttft * 1000, 3), model_calls=len(prompt_tokens),
+                           prompt_tokens=sum(reported or estimated for estimated, reported in prompt_tokens))
+            yield {"type": "done", "answer": answer, "ttft": ttft, "seconds": total_time}
+            # Logged once the caller has rendered the answer, so it doesn't interleave with it
+            print(f"Answer: first token after {ttft:.2f} seconds, complete after {total_time:.2f} seconds")
+            self._report_prompt_tokens(prompt_tokens)
 
         while True:
             try:
-                # Get the response with potential function calls
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=self.conversation_history,
-                    functions=FUNCTIONS,
-                    function_call="auto"
-                )
-
-                message = response.choices[0].message
-                if message.content:
-                    print(f"\nAssistant message: {message.content}\n")  # Only log non-empty messages
-                
-                # If there's no function call, we're done
-                if not message.function_call:
-                    # Add source attribution to the final response
-                    if sources_used:
-                        sources_text = " and ".join(sorted(sources_used))
-                        if not message.content:
-                            return "I apologize, but I couldn't generate a meaningful response. Please try rephrasing your question."
-                        return f"{message.content}\n\n[Source: {sources_text}]"
-                    return message.content or "I apologize, but I couldn't generate a response. Please try rephrasing your question."
-
-                # Add the assistant's message to the conversation
-                self.add_message("assistant", message.content or "")
-
-                # Execute the function
-                function_name = message.function_call.name
-                function_args = message.function_call.arguments
-                print(f"\nFunction call: {function_name} with args: {function_args}\n")  # Log the function call
-                
-                # Skip if we've already executed this exact query
-                if function_name == "query_sql_database":
-                    query_hash = hash(function_args)
-                    if query_hash in executed_queries:
-                        print(f"Skipping duplicate SQL query")
-                        continue
-                    executed_queries.add(query_hash)
-                
-                function_start_time = time.time()
-                function_result = self._execute_function(function_name, function_args)
-                function_time = time.time() - function_start_time
-                print(f"Function {function_name} took {function_time:.2f} seconds")
-                
-                # Track which sources we've used
-                if function_name == "query_sql_database":
-                    sources_used.add("SQL Database")
-                elif function_name == "search_pdf_documents":
-                    sources_used.add("PDF Documents")
+                estimated_tokens = self.history.compact()
+                with span("agent.llm_turn", model="gpt-4o-mini", history_tokens=estimated_tokens) as turn:
+                    turn_start = time.time()
+                    # Stream the response with potential tool calls; the model may request several at once
+                    stream = self.client.chat.completions.create(
+                        model="gpt-4o-mini",
+                        messages=self.conversation_history,
+                        tools=TOOLS,
+                        tool_choice="auto",
+                        parallel_tool_calls=True,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
+
+                    content_parts = []
+                    tool_calls: Dict[int, Dict[str, Any]] = {}
+                    usage = None
+                    for chunk in stream:
+                        usage = getattr(chunk, "usage", None) or usage
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        if delta.content:
+                            if first_token_time is None:
+                                first_token_time = time.time()
+                            if not content_parts:
+                                turn.set(first_token_ms=round((time.time() - turn_start) * 1000, 3))
+                            content_parts.append(delta.content)
+                            yield {"type": "token", "text": delta.content}
+                        # Tool calls arrive in fragments, keyed by their index in the turn
+                        for fragment in delta.tool_calls or []:
+                            call = tool_calls.setdefault(fragment.index, {
+                                "id": "", "type": "function", "function": {"name": "", "arguments": ""}
+                            })
+                            call["id"] = fragment.id or call["id"]
+                            if fragment.function is not None:
+                                call["function"]["name"] += fragment.function.name or ""
+                                call["function"]["arguments"] += fragment.function.arguments or ""
+
+                    record_usage(turn, usage)
+                    turn.set(tool_calls=len(tool_calls))
+
+                prompt_tokens.append((estimated_tokens, getattr(usage, "prompt_tokens", None)))
+                content = "".join(content_parts)
                 
-                # Add the function result to the conversation
-                self.add_message("function", function_result, name=function_name)
+                # If there are no tool calls, we're done
+                if not tool_calls:
+                    self.add_message("assistant", content)
+                    if not content:
+                        if sources_used:
+                            answer = "I apologize, but I couldn't generate a meaningful response. Please try rephrasing your question."
+                        else:
+                            answer = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+                        yield {"type": "token", "text": answer}
+                    elif sources_used:
+                        # Add source attribution to the final response
+                        attribution = f"\n\n[Source: {' and '.join(sorted(sources_used))}]"
+                        answer = content + attribution
+                        yield {"type": "token", "text": attribution}
+                    else:
+                        answer = content
+                    yield from finish(answer)
+                    return
+
+                if content:
+                    print(f"\nAssistant message: {content}\n")  # Only log non-empty messages
+
+                calls = [tool_calls[index] for index in sorted(tool_calls)]
+                results = yield from self._execute_tool_calls(calls)
+
+                # The assistant's message and its tool results join the conversation together,
+                # so a caller that stops reading mid-turn can't leave a tool call unanswered
+                self.history.append({"role": "assistant", "content": content, "tool_calls": calls})
+                for call, result in zip(calls, results):
+                    # Track which sources we've used
+                    if call["function"]["name"] == "query_sql_database":
+                        sources_used.add("SQL Database")
+                    elif call["function"]["name"] == "search_pdf_documents":
+                        sources_used.add("PDF Documents")
+                    
+                    # Every tool call needs a matching tool message before the next model turn
+                    self.history.append({"role": "tool", "tool_call_id": call["id"], "content": result})
                 
             except Exception as e:
                 print(f"Error in process_query: {str(e)}")
-                return f"I encountered an error while processing your question: {str(e)}. Please try again."
+                answer = f"I encountered an error while processing your question: {str(e)}. Please try again."
+                yield {"type": "token", "text": answer}
+                yield from finish(answer)
+                return
+
+    async def astream_query(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Async version of `stream_query`; the agent loop runs on a worker thread."""
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        finished = object()
+
+        def produce():
+            try:
+                for event in self.stream_query(query):
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, finished)
+
+        producer = loop.run_in_executor(None, produce)
+        while True:
+            event = await events.get()
+            if event is finished:
+                break
+            yield event
+        await producer
+
+    def _report_prompt_tokens(self, prompt_tokens: List):
+        """Print the prompt tokens sent for each model call of this turn, and the history's compaction stats."""
+        calls = ", ".join(
+            f"~{estimated}" + (f" (API: {reported})" if reported is not None else "")
+            for estimated, reported in prompt_tokens
+        )
+        total = sum(reported if reported is not None else estimated for estimated, reported in prompt_tokens)
+        stats = self.history.summary()
+        print(f"Prompt tokens this turn: {total} over {len(prompt_tokens)} model calls [{calls}]; "
+              f"history {stats['messages']} messages / ~{stats['tokens']} tokens, "
+              f"{stats['compacted']} compacted, {stats['dropped_turns']} turns dropped, "
+              f"~{stats['tokens_saved']} tokens saved")
+
+    def _execute_tool_calls(self, tool_calls: List[Dict[str, Any]]):
+        """
+        Run one model turn's tool calls on the agent's thread pool, yielding
+        status and partial-output events while they run. Returns (as the
+        generator's value) their results in call order once all have finished.
+        There is one result per call even when a call fails, since the model
+        API rejects a history with an unanswered tool call.
+        """
+        events: queue.Queue = queue.Queue()
+        finished = object()
+        futures = []
+        for call in tool_calls:
+            function_name = call["function"]["name"]
+            function_args = call["function"]["arguments"]
+            print(f"\nFunction call: {function_name} with args: {function_args}\n")  # Log the function call
+            yield {"type": "status", "text": TOOL_STATUS.get(function_name, f"Running {function_name}...")}
+            emit = lambda text, name=function_name: events.put({"type": "tool_delta", "tool": name, "text": text})
+            # Each call gets its own copy of the context, so its spans nest under this query
+            context = contextvars.copy_context()
+            try:
+                future = self.tool_pool.submit(context.run, self._timed_execute, function_name, function_args, emit)
+            except Exception as e:
+                future = Future()
+                future.set_result(f"Error running {function_name}: {e}")
+            # Queued after the call's last tool_delta, so no output is left behind
+            future.add_done_callback(lambda _: events.put(finished))
+            futures.append(future)
+
+        remaining = len(futures)
+        while remaining:
+            event = events.get()
+            if event is finished:
+                remaining -= 1
+            else:
+                yield event
+
+        return [future.result() for future in futures]
+
+    def _timed_execute(self, function_name: str, function_args: str, emit: Optional[Callable[[str], None]] = None) -> str:
+        function_start_time = time.time()
+        with span("agent.tool", tool=function_name):
+            try:
+                function_result = self._execute_cached(function_name, function_args, emit)
+            except ToolError as e:
+                function_result = str(e)
+            except Exception as e:
+                # e.g. malformed arguments from the model; reported back to it like any tool error
+                print(f"Function {function_name} failed: {e}")
+                function_result = f"Error running {function_name}: {e}"
+        function_time = time.time() - function_start_time
+        print(f"Function {function_name} took {function_time:.2f} seconds")
+        return function_result
+
+    def _execute_cached(self, function_name: str, function_args: str,
+                        emit: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Run SQL and PDF tool calls through the result cache shared by all
+        sessions. A call whose normalized arguments match a fresh result for the
+        current data (or index) version gets that result; one matching a call
+        still running waits for it instead of repeating the LLM and retrieval work.
+        A call that raises `ToolError` is not cached, and callers waiting on it
+        get the same error.
+        """
+        if function_name not in CACHED_TOOLS:
+            return self._execute_function(function_name, function_args, emit)
+        from llm.tool_cache import tool_cache_key
 
-    def _execute_function(self, function_name: str, function_args: str) -> str:
-        """Execute a function and return its result."""
+        args = json.loads(function_args)
+        if function_name == "query_sql_database":
+            # LLM-humanized and locally formatted results differ for the same query
+            versions = (self.resources.data_version, "llm" if self.llm_humanizer else "local")
+        else:
+            versions = (self.pdf_engine.index_version,)
+        cache = self.resources.tool_cache
+        result, outcome = cache.get_or_compute(
+            tool_cache_key(function_name, args, *versions),
+            lambda: self._execute_function(function_name, function_args, emit),
+        )
+        current_span().set(tool_cache=outcome)
+        if outcome != "miss":
+            # The output wasn't streamed to this caller while it was produced
+            if emit is not None:
+                emit(result)
+            stats = cache.summary()
+            print(f"Tool result cache {outcome} for {function_name}: {stats['hits']} hits, "
+                  f"{stats['coalesced']} coalesced, {stats['misses']} misses")
+        return result
+
+    @staticmethod
+    def _collect(pieces: Iterator[str], emit: Optional[Callable[[str], None]]) -> str:
+        """Join a streamed tool output, passing each piece on as it arrives."""
+        parts = []
+        for piece in pieces:
+            parts.append(piece)
+            if emit is not None:
+                emit(piece)
+        return "".join(parts).strip()
+
+    def _execute_function(self, function_name: str, function_args: str,
+                          emit: Optional[Callable[[str], None]] = None) -> str:
+        """Execute a function and return its result, raising `ToolError` if it fails."""
         args = json.loads(function_args)
         
         if function_name == "get_schema_info":
-            return SCHEMA_CONTEXT
+            return self.resources.schema_context
             
         elif function_name == "query_sql_database":
+            from llm.query_planner import generate_sql_from_nl
+            from runner.executor import run_query
+            from runner.result_formatter import format_query_result
             try:
                 # Generate SQL from natural language
                 nl_query = args["query"]
-                sql_query = generate_sql_from_nl(nl_query)
-                print(f"\nGenerated SQL query: {sql_query}\n")
-                if sql_query.startswith("--"):
-                    return f"Error generating SQL: {sql_query}"
+                params = None
+                # Common aggregate questions are answered from templates without the LLM
+                plan = self.template_planner.plan(nl_query)
+                cached = None if plan else self.sql_cache.lookup(nl_query)
+                current_span().set(sql_source="template" if plan else "cache" if cached else "llm",
+                                   cache_hit=bool(plan or cached))
+                if plan:
+                    sql_query, params = plan.sql, plan.params
+                    print(f"\nTemplate SQL ({plan.template}): {sql_query} with params {params}\n")
+                elif cached:
+                    sql_query, match, similarity = cached
+                    print(f"\nSQL cache hit ({match}, similarity {similarity:.3f}): {sql_query}\n")
+                else:
+                    generation_start = time.time()
+                    sql_query = generate_sql_from_nl(nl_query, client=self.client)
+                    generation_time = time.time() - generation_start
+                    print(f"\nGenerated SQL query: {sql_query}\n")
+                    if sql_query.startswith("--"):
+                        raise ToolError(f"Error generating SQL: {sql_query}")
                 
-                # Execute the query
-                result = run_query(self.con, sql_query)
-                if not result or len(result) == 0:
+                # Execute the query once; rows come back as an Arrow table. Each call borrows
+                # its own cursor since tool calls (and sessions) run concurrently.
+                with self.resources.cursors.cursor() as cursor:
+                    result = run_query(cursor, sql_query, params=params)
+                if not result.ok:
+                    raise ToolError(result.error)
+                if not plan and not cached:
+                    # Only SQL that actually ran is worth reusing
+                    self.sql_cache.store(nl_query, sql_query, generation_time)
+                stats = self.sql_cache.summary()
+                print(f"SQL cache: {stats['exact_hits']} exact / {stats['semantic_hits']} semantic hits, "
+                      f"{stats['misses']} misses, ~{stats['saved_seconds']:.2f}s of LLM time saved")
+                if result.row_count == 0:
                     return "No results found in the database."
                 
-                # Convert the result to a DataFrame for better handling
-                if isinstance(result, str) and result.startswith("SQL Error"):
-                    return result
-                
-                # Get column names from the SQL query
-                col_names = [desc[0] for desc in self.con.execute(sql_query).description]
-                df = pd.DataFrame(result, columns=col_names)
-                
-                # Use humanize_query_result to format the response
-                return humanize_query_result(nl_query, sql_query, df)
+                if self.llm_humanizer:
+                    from llm.result_humanizer import humanize_query_result
+                    # Use humanize_query_result to format the response (it only sees a bounded preview)
+                    pieces = humanize_query_result(nl_query, sql_query, result, client=self.client, stream=True,
+                                                   raise_errors=True)
+                    try:
+                        return self._collect(pieces, emit)
+                    except Exception as e:
+                        # Possibly after part of the answer was streamed; the partial text isn't a result
+                        raise ToolError(f"Error generating humanized response: {e}") from e
+                # Exact numbers as a value, list or markdown table, without another model call
+                return format_query_result(result)
+            except ToolError:
+                raise
             except Exception as e:
-                return f"Error executing SQL query: {str(e)}"
+                raise ToolError(f"Error executing SQL query: {str(e)}") from e
                 
         elif function_name == "search_pdf_documents":
+            from pdf_index.query_pdf import query_pdf_index
             try:
                 query = args["query"]
-                result = query_pdf_index(query)
-                return result
+                return self._collect(query_pdf_index(query, engine=self.pdf_engine, stream=True), emit)
             except Exception as e:
-                return f"Error searching PDF documents: {str(e)}"
+                raise ToolError(f"Error searching PDF documents: {str(e)}") from e
                 
         elif function_name == "humanize_result":
             try:
@@ -224,7 +514,7 @@ class TIFAgent:
                 if source == "sql":
                     try:
                         # For SQL results, we can use the technical_result directly
-                        # since it's already formatted by humanize_query_result
+                        # since it's already formatted by format_query_result or humanize_query_result
                         return technical_result
                     except Exception as e:
                         print(f"Error handling SQL result: {str(e)}")
@@ -234,7 +524,7 @@ class TIFAgent:
                     return technical_result
             except Exception as e:
                 print(f"Error in humanize_result: {str(e)}")
-                return f"Error humanizing result: {str(e)}"
+                raise ToolError(f"Error humanizing result: {str(e)}") from e
                 
         else:
-            return f"Unknown function: {function_name}"
\ No newline at end of file
+            raise ToolError(f"Unknown function: {function_name}")
\ No newline at end of file
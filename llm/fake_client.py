@@ -0,0 +1,344 @@
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from pdf_index.embedders import StubEmbedder
+
+SQL_WORDS = re.compile(r"\b(spend|spent|spending|much|total|cost|costs|expenditures?|budget)\b", re.I)
+PDF_WORDS = re.compile(r"\b(goals?|objectives?|projects?|plans?|report|reports|why|describe|stations?)\b", re.I)
+
+
+def _content(message) -> str:
+    return (message.get("content") if isinstance(message, dict) else getattr(message, "content", "")) or ""
+
+
+def _role(message) -> str:
+    return message.get("role") if isinstance(message, dict) else getattr(message, "role", "")
+
+
+def _usage(messages: List, completion: str) -> SimpleNamespace:
+    prompt_tokens = sum(len(_content(m)) for m in messages) // 4 + 1
+    completion_tokens = len(completion) // 4 + 1
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+
+class _FakeChatCompletions:
+    def __init__(self, owner: "FakeOpenAIClient"):
+        self._owner = owner
+
+    def create(self, model: str = "", messages: List = (), tools=None, stream=False, **kwargs):
+        messages = list(messages)
+        self._owner._wait(self._owner.chat_latency)
+        self._owner._count("chat")
+        response = self._owner._replay_chat(model, messages, tools) or self._create(messages, tools)
+        return self._stream(response, self._owner.token_latency) if stream else response
+
+    def _create(self, messages: List, tools):
+        last = messages[-1] if messages else {}
+
+        if tools is not None and _role(last) == "user":
+            calls = self._plan_tool_calls(_content(last))
+            if calls:
+                return self._response("", messages, tool_calls=calls)
+            return self._response(f"(fake) I can answer questions about TIF data. You asked: {_content(last)}", messages)
+
+        if tools is not None:
+            tool_results = []
+            for message in reversed(messages):
+                if _role(message) != "tool":
+                    break
+                tool_results.append(_content(message)[:300])
+            answer = "(fake) Based on the tools: " + " | ".join(reversed(tool_results))
+            return self._response(answer, messages)
+
+        system = _content(messages[0]) if messages else ""
+        if "SQL expert" in system:
+            sql = self._owner.sql_answers.get(_content(last).strip(), "SELECT COUNT(*) AS row_count FROM expenditures")
+            return self._response(sql, messages)
+        return self._response(f"(fake) {_content(last)[:300]}", messages)
+
+    @staticmethod
+    def _stream(response, token_latency=0.0):
+        """Replay a finished response as stream chunks: content word by word, tool call arguments in two pieces."""
+        message = response.choices[0].message
+
+        def chunk(**delta):
+            fields = {"content": None, "tool_calls": None, **delta}
+            return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(**fields), finish_reason=None)],
+                                   usage=None)
+
+        for word in re.findall(r"\S+\s*", message.content or ""):
+            if token_latency > 0:
+                time.sleep(token_latency)
+            yield chunk(content=word)
+        for index, call in enumerate(message.tool_calls or []):
+            arguments = call.function.arguments
+            half = len(arguments) // 2
+            yield chunk(tool_calls=[SimpleNamespace(index=index, id=call.id, type="function",
+                                                    function=SimpleNamespace(name=call.function.name,
+                                                                             arguments=arguments[:half]))])
+            yield chunk(tool_calls=[SimpleNamespace(index=index, id=None, type=None,
+                                                    function=SimpleNamespace(name=None, arguments=arguments[half:]))])
+        yield SimpleNamespace(choices=[], usage=response.usage)
+
+    def _plan_tool_calls(self, question: str) -> List[SimpleNamespace]:
+        calls = []
+        if SQL_WORDS.search(question):
+            calls.append(("query_sql_database", question))
+        if PDF_WORDS.search(question) or not calls:
+            calls.append(("search_pdf_documents", question))
+        return [
+            SimpleNamespace(
+                id=f"call_{next(self._owner._ids)}",
+                type="function",
+                function=SimpleNamespace(name=name, arguments=json.dumps({"query": query})),
+            )
+            for name, query in calls
+        ]
+
+    @staticmethod
+    def _response(content: str, messages: List, tool_calls=None) -> SimpleNamespace:
+        message = SimpleNamespace(role="assistant", content=content or None, tool_calls=tool_calls)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")],
+                               usage=_usage(messages, content))
+
+
+class _FakeEmbeddings:
+    def __init__(self, owner: "FakeOpenAIClient"):
+        self._owner = owner
+
+    def create(self, model: str = "", input=()):
+        self._owner._wait(self._owner.embedding_latency)
+        self._owner._count("embeddings")
+        texts = [input] if isinstance(input, str) else list(input)
+        vectors = [self._owner._replay_embedding(model, text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            for i, vector in zip(missing, self._owner.embedder.embed([texts[i] for i in missing])):
+                vectors[i] = vector
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=v) for i, v in enumerate(vectors)])
+
+
+class FakeOpenAIClient:
+    """
+    Offline stand-in for `openai.OpenAI` with deterministic answers.
+
+    Supports the parts of the API the agent uses: `chat.completions.create`
+    (choosing SQL/PDF tool calls from keywords, then summarizing tool results;
+    `sql_answers` maps exact questions to the SQL to "generate") and
+    `embeddings.create` (backed by the stub embedder). Each call sleeps for a
+    configurable simulated latency, and streamed answers for `token_latency`
+    per word, so throughput can be load-tested without the network.
+    """
+
+    def __init__(self, chat_latency=0.0, embedding_latency=0.0, embedder=None, token_latency=0.0,
+                 sql_answers: Optional[Dict[str, str]] = None):
+        self.chat_latency = chat_latency
+        self.embedding_latency = embedding_latency
+        self.token_latency = token_latency
+        self.embedder = embedder or StubEmbedder()
+        self.sql_answers = dict(sql_answers or {})
+        self.calls: Dict[str, int] = {"chat": 0, "embeddings": 0}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_FakeChatCompletions(self))
+        self.embeddings = _FakeEmbeddings(self)
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+
+    @staticmethod
+    def _wait(seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _replay_chat(self, model: str, messages: List, tools) -> Optional[SimpleNamespace]:
+        """Recorded response for this exact request, if any; the plain fake has none."""
+        return None
+
+    def _replay_embedding(self, model: str, text: str) -> Optional[List[float]]:
+        return None
+
+
+def _message_for_key(message) -> Dict:
+    if isinstance(message, dict):
+        fields = {k: message.get(k) for k in ("role", "content", "tool_call_id", "tool_calls") if message.get(k)}
+    else:
+        fields = {"role": _role(message), "content": _content(message)}
+    return fields
+
+
+def chat_fixture_key(model: str, messages: List, tools) -> str:
+    """Stable key for a chat request: the model, whether tools were offered, and every message."""
+    payload = {"model": model, "tools": bool(tools), "messages": [_message_for_key(m) for m in messages]}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def embedding_fixture_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _serialize_message(content: Optional[str], tool_calls, usage) -> Dict:
+    return {
+        "content": content,
+        "tool_calls": [
+            {"id": call["id"], "name": call["function"]["name"], "arguments": call["function"]["arguments"]}
+            if isinstance(call, dict) else
+            {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+            for call in tool_calls or []
+        ],
+        "usage": {"prompt_tokens": getattr(usage, "prompt_tokens", 0), "completion_tokens": getattr(usage, "completion_tokens", 0)}
+        if usage is not None else None,
+    }
+
+
+def _assemble_stream(chunks: List) -> Dict:
+    """Rebuild the final message of a streamed chat completion from its chunks."""
+    content, calls, usage = [], {}, None
+    for chunk in chunks:
+        usage = getattr(chunk, "usage", None) or usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        content.append(delta.content or "")
+        for fragment in delta.tool_calls or []:
+            call = calls.setdefault(fragment.index, {"id": "", "function": {"name": "", "arguments": ""}})
+            call["id"] = fragment.id or call["id"]
+            if fragment.function is not None:
+                call["function"]["name"] += fragment.function.name or ""
+                call["function"]["arguments"] += fragment.function.arguments or ""
+    return _serialize_message("".join(content) or None, [calls[i] for i in sorted(calls)], usage)
+
+
+class _FixtureFile:
+    """Append-only JSONL file of recorded responses, keyed by request."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry["response"]
+
+    def add(self, kind: str, key: str, response: Dict):
+        with self._lock:
+            if key in self.entries:
+                return
+            self.entries[key] = response
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"kind": kind, "key": key, "response": response}) + "\n")
+
+
+class _RecordingChatCompletions:
+    def __init__(self, owner: "RecordingOpenAIClient"):
+        self._owner = owner
+
+    def create(self, **kwargs):
+        key = chat_fixture_key(kwargs.get("model", ""), list(kwargs.get("messages", [])), kwargs.get("tools"))
+        response = self._owner.client.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            # Buffered so the whole answer can be recorded; timing is not representative while recording
+            chunks = list(response)
+            self._owner.fixtures.add("chat", key, _assemble_stream(chunks))
+            return iter(chunks)
+        message = response.choices[0].message
+        self._owner.fixtures.add("chat", key, _serialize_message(message.content, message.tool_calls,
+                                                                 getattr(response, "usage", None)))
+        return response
+
+
+class _RecordingEmbeddings:
+    def __init__(self, owner: "RecordingOpenAIClient"):
+        self._owner = owner
+
+    def create(self, model: str = "", input=(), **kwargs):
+        response = self._owner.client.embeddings.create(model=model, input=input, **kwargs)
+        texts = [input] if isinstance(input, str) else list(input)
+        for item in response.data:
+            self._owner.fixtures.add("embedding", embedding_fixture_key(model, texts[item.index]),
+                                     {"embedding": list(item.embedding)})
+        return response
+
+
+class RecordingOpenAIClient:
+    """
+    Wraps a real `openai.OpenAI` client and records every chat and embedding
+    response to a JSONL fixture file, for `ReplayOpenAIClient` to play back
+    offline.
+    """
+
+    def __init__(self, client, path: str):
+        self.client = client
+        self.fixtures = _FixtureFile(path)
+        self.chat = SimpleNamespace(completions=_RecordingChatCompletions(self))
+        self.embeddings = _RecordingEmbeddings(self)
+
+
+class ReplayOpenAIClient(FakeOpenAIClient):
+    """
+    Plays back responses recorded by `RecordingOpenAIClient`, with simulated
+    latency. Requests that were never recorded fall back to the deterministic
+    fake, or raise with `strict=True`. `misses` counts the fallbacks.
+    """
+
+    def __init__(self, path: str, strict=False, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures = _FixtureFile(path)
+        self.strict = strict
+        self.misses = 0
+
+    def _miss(self, what: str):
+        if self.strict:
+            raise KeyError(f"No recorded response for this {what} request in {self.fixtures.path}")
+        with self._lock:
+            self.misses += 1
+
+    def _replay_chat(self, model: str, messages: List, tools) -> Optional[SimpleNamespace]:
+        recorded = self.fixtures.entries.get(chat_fixture_key(model, messages, tools))
+        if recorded is None:
+            self._miss("chat")
+            return None
+        tool_calls = [
+            SimpleNamespace(id=call["id"], type="function",
+                            function=SimpleNamespace(name=call["name"], arguments=call["arguments"]))
+            for call in recorded["tool_calls"]
+        ] or None
+        message = SimpleNamespace(role="assistant", content=recorded["content"], tool_calls=tool_calls)
+        usage = SimpleNamespace(**recorded["usage"]) if recorded.get("usage") else _usage(messages, recorded["content"] or "")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage)
+
+    def _replay_embedding(self, model: str, text: str) -> Optional[List[float]]:
+        recorded = self.fixtures.entries.get(embedding_fixture_key(model, text))
+        if recorded is None:
+            self._miss("embedding")
+            return None
+        return recorded["embedding"]
+
+
+class FakeSynthesizer:
+    """Response synthesizer stand-in that quotes the top chunk instead of calling an LLM."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def synthesize(self, question: str, nodes=()):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if not nodes:
+            return "(fake) No relevant passages found."
+        top = nodes[0].node
+        source = f"{top.metadata.get('file_name', 'unknown')} p.{top.metadata.get('page_label', '?')}"
+        return f"(fake) From {source}: {top.get_content()[:300]}"
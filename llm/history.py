@@ -0,0 +1,158 @@
+import re
+from typing import Dict, List
+
+from common.tokens import count_tokens
+
+# Token budget for everything resent to the model each call (system prompt included)
+HISTORY_TOKEN_BUDGET = 8000
+# The most recent user turns are always kept verbatim
+KEEP_RECENT_TURNS = 2
+# Compacted tool results and answers keep roughly this many tokens of their opening text
+SUMMARY_TOKENS = 80
+# Chat formatting overhead per message
+MESSAGE_OVERHEAD_TOKENS = 4
+# Questions from dropped turns listed in the "earlier in this conversation" note
+MAX_EARLIER_QUESTIONS = 10
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def message_tokens(message: Dict) -> int:
+    """Estimate the prompt tokens one chat message costs, tool call arguments included."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "")
+    for call in message.get("tool_calls") or []:
+        tokens += count_tokens(call["function"]["name"]) + count_tokens(call["function"]["arguments"])
+    return tokens
+
+
+def summarize_text(text: str, max_tokens=SUMMARY_TOKENS) -> str:
+    """Keep the leading sentences of `text` that fit in `max_tokens`, noting how much was dropped."""
+    original_tokens = count_tokens(text)
+    if original_tokens <= max_tokens:
+        return text
+    kept, used = [], 0
+    for sentence in SENTENCE_END.split(text.strip()):
+        sentence_tokens = count_tokens(sentence)
+        if used + sentence_tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += sentence_tokens
+    summary = " ".join(kept) if kept else text[:max_tokens * 4]
+    return f"{summary} [... compacted, originally {original_tokens} tokens]"
+
+
+class ConversationHistory:
+    """
+    Chat history that stays within a token budget.
+
+    Every message is stored with its token count. The last `keep_recent_turns`
+    user turns are always sent verbatim. When the history exceeds
+    `token_budget`, older content is compacted, oldest first:
+
+    1. Old tool results are cut down to their opening sentences.
+    2. Old assistant answers are cut down the same way.
+    3. Whole old turns are dropped. A short note listing the questions they
+       asked is kept after the system prompt, so the model still knows what
+       was discussed.
+
+    Turns are only ever dropped whole, so every tool message still follows the
+    assistant message that requested it.
+    """
+
+    def __init__(self, system_prompt: str, token_budget=HISTORY_TOKEN_BUDGET, keep_recent_turns=KEEP_RECENT_TURNS,
+                 summary_tokens=SUMMARY_TOKENS):
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.summary_tokens = summary_tokens
+        self.messages: List[Dict] = []
+        self._tokens: List[int] = []
+        self._compacted: List[bool] = []
+        self._earlier_questions: List[str] = []
+        self.stats = {"compacted": 0, "dropped_turns": 0, "tokens_saved": 0}
+        self.append({"role": "system", "content": system_prompt})
+
+    def append(self, message: Dict):
+        self.messages.append(message)
+        self._tokens.append(message_tokens(message))
+        self._compacted.append(False)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self._tokens)
+
+    def _turn_starts(self) -> List[int]:
+        return [i for i, message in enumerate(self.messages) if message["role"] == "user"]
+
+    def _protected_from(self) -> int:
+        """Index of the first message that must be kept verbatim."""
+        starts = self._turn_starts()
+        if len(starts) <= self.keep_recent_turns:
+            return starts[0] if starts else len(self.messages)
+        return starts[-self.keep_recent_turns]
+
+    def _replace(self, index: int, content: str, compacted=True):
+        message = dict(self.messages[index], content=content)
+        new_tokens = message_tokens(message)
+        self.stats["tokens_saved"] += self._tokens[index] - new_tokens
+        self.messages[index] = message
+        self._tokens[index] = new_tokens
+        self._compacted[index] = compacted
+
+    def _compact_role(self, role: str, protected_from: int) -> bool:
+        """Compact old messages of one role, oldest first; True once within budget."""
+        for index in range(protected_from):
+            if self.total_tokens <= self.token_budget:
+                return True
+            message = self.messages[index]
+            if message["role"] != role or self._compacted[index] or not message.get("content"):
+                continue
+            if self._tokens[index] > self.summary_tokens + MESSAGE_OVERHEAD_TOKENS:
+                self._replace(index, summarize_text(message["content"], self.summary_tokens))
+                self.stats["compacted"] += 1
+        return self.total_tokens <= self.token_budget
+
+    def _drop_oldest_turn(self) -> bool:
+        starts = self._turn_starts()
+        if len(starts) <= self.keep_recent_turns:
+            return False
+        first, end = starts[0], starts[1]
+        self._earlier_questions.append(self.messages[first]["content"])
+        self._earlier_questions = self._earlier_questions[-MAX_EARLIER_QUESTIONS:]
+        self.stats["tokens_saved"] += sum(self._tokens[first:end])
+        del self.messages[first:end], self._tokens[first:end], self._compacted[first:end]
+        self.stats["dropped_turns"] += 1
+        self._update_earlier_note()
+        return True
+
+    def _update_earlier_note(self):
+        questions = "\n".join(f"- {q}" for q in self._earlier_questions)
+        content = ("Earlier in this conversation (details dropped to save context) the user asked:\n"
+                   f"{questions}")
+        note = {"role": "system", "content": content}
+        note_tokens = message_tokens(note)
+        # The note sits right after the system prompt and is rewritten as more turns are
+        # dropped. It is resent with every call, so its cost comes off the tokens saved.
+        if len(self.messages) > 1 and self.messages[1]["role"] == "system":
+            self.stats["tokens_saved"] += self._tokens[1] - note_tokens
+            self.messages[1] = note
+            self._tokens[1] = note_tokens
+        else:
+            self.stats["tokens_saved"] -= note_tokens
+            self.messages.insert(1, note)
+            self._tokens.insert(1, note_tokens)
+            self._compacted.insert(1, True)
+
+    def compact(self) -> int:
+        """Bring the history within budget where possible; returns the resulting token count."""
+        if self.total_tokens <= self.token_budget:
+            return self.total_tokens
+        if self._compact_role("tool", self._protected_from()):
+            return self.total_tokens
+        if self._compact_role("assistant", self._protected_from()):
+            return self.total_tokens
+        while self.total_tokens > self.token_budget and self._drop_oldest_turn():
+            pass
+        return self.total_tokens
+
+    def summary(self) -> Dict[str, int]:
+        return {"messages": len(self.messages), "tokens": self.total_tokens, **self.stats}
@@ -1,24 +1,54 @@
-import openai
+import threading
 from dotenv import load_dotenv
 import os
-from db.schema_discovery import get_prompt_context
+from db.schema_discovery import get_prompt_context, schema_available
+from tracing.tracer import record_usage, span
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+api_key = os.getenv("OPENAI_API_KEY")
 
-SCHEMA_CONTEXT = get_prompt_context()
+_schema_context = None
+_schema_lock = threading.Lock()
 
-def generate_sql_from_nl(nl_query: str) -> str:
+
+def get_schema_context() -> str:
+    """
+    The NL-to-SQL system prompt, built on first use rather than at import time
+    and then kept for the life of the process. A failure to read the schema is
+    returned but not kept, so the next call tries again.
+    """
+    global _schema_context
+    with _schema_lock:
+        if _schema_context is not None:
+            return _schema_context
+        context = get_prompt_context()
+        if schema_available(context):
+            _schema_context = context
+        return context
+
+
+def __getattr__(name):
+    # SCHEMA_CONTEXT used to be a module constant computed on import
+    if name == "SCHEMA_CONTEXT":
+        return get_schema_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def generate_sql_from_nl(nl_query: str, client=None) -> str:
     try:
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": SCHEMA_CONTEXT},
-                {"role": "user", "content": nl_query}
-            ],
-            temperature=0,
-        )
+        if client is None:
+            import openai
+            client = openai.OpenAI(api_key=api_key)
+        with span("sql.generate", model="gpt-4o-mini") as s:
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": get_schema_context()},
+                    {"role": "user", "content": nl_query}
+                ],
+                temperature=0,
+            )
+            record_usage(s, getattr(response, "usage", None))
         sql = response.choices[0].message.content.strip()
         
         if sql.startswith("```sql"):
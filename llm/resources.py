@@ -0,0 +1,180 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Sequence
+
+# Components in the order `warm_up` initializes them, cheapest first. The schema
+# prompt comes before the database: building it syncs the CSV through a
+# read-write connection, which DuckDB refuses once the shared read-only one is open.
+WARM_UP_COMPONENTS = ("schema context", "database", "template planner", "llm client", "sql cache", "pdf index")
+
+
+class AgentResources:
+    """
+    The heavy, shareable state behind a TIFAgent: the LLM client, the DuckDB
+    database (through a cursor pool), the PDF retrieval engine, the SQL
+    translation cache, the template planner, the tool result cache and the
+    tool thread pool.
+
+    One instance can back many agent sessions; each session keeps only its own
+    conversation history.
+
+    Everything except the thread pool is built on first use, imports included,
+    and memoized, so constructing resources is instant and a session that never
+    searches the PDFs never loads llama-index. Call `start_warm_up()` to build
+    them on a background thread ahead of the first question.
+    """
+
+    def __init__(self, client=None, persist_dir="vectorstore", embedder=None, synthesizer=None,
+                 sql_cache=None, max_db_cursors=8, max_parallel_tools=4, tool_cache=None, http_client=None):
+        self.persist_dir = persist_dir
+        self.embedder = embedder
+        self.synthesizer = synthesizer
+        # The httpx pool behind `client`, for OpenAI calls made through other SDKs (llama-index)
+        self.http_client = http_client
+        self.max_db_cursors = max_db_cursors
+        self.tool_pool = ThreadPoolExecutor(max_workers=max_parallel_tools)
+        self._values = {"client": client, "sql_cache": sql_cache, "tool_cache": tool_cache}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._warm_up_thread: Optional[threading.Thread] = None
+
+    def _memoized(self, name: str, build):
+        value = self._values.get(name)
+        if value is not None:
+            return value
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        # Callers racing the warm-up thread wait here for the one build
+        with lock:
+            value = self._values.get(name)
+            if value is None:
+                value = self._values[name] = build()
+        return value
+
+    @property
+    def client(self):
+        def build():
+            import openai
+            return openai.OpenAI()
+        return self._memoized("client", build)
+
+    @property
+    def schema_context(self) -> str:
+        from llm.query_planner import get_schema_context
+        return get_schema_context()
+
+    @property
+    def con(self):
+        def build():
+            from db.init_duckdb import load_expenditures_table
+            self.schema_context  # See WARM_UP_COMPONENTS
+            return load_expenditures_table()
+        return self._memoized("con", build)
+
+    @property
+    def cursors(self):
+        def build():
+            from db.connection_pool import CursorPool
+            return CursorPool(self.con, size=self.max_db_cursors)
+        return self._memoized("cursors", build)
+
+    @property
+    def pdf_engine(self):
+        """
+        The PDF retrieval engine; its index is opened separately, by `load()` or the
+        first search. Unless custom backends or an HTTP pool were given this is the
+        process-wide engine from `get_engine`, so `query_pdf` and the agent share
+        one index in memory.
+        """
+        def build():
+            from pdf_index.retrieval_engine import PDFRetrievalEngine, get_engine
+            if self.embedder is None and self.synthesizer is None and self.http_client is None:
+                return get_engine(self.persist_dir)
+            return PDFRetrievalEngine(persist_dir=self.persist_dir, embedder=self.embedder,
+                                      synthesizer=self.synthesizer, http_client=self.http_client)
+        return self._memoized("pdf_engine", build)
+
+    @property
+    def sql_cache(self):
+        from llm.sql_cache import SQLTranslationCache
+
+        def build():
+            from pdf_index.embedders import get_embedder
+            planner = self.template_planner
+            embedder = self.embedder or get_embedder("openai", client=self.client)
+            return SQLTranslationCache(self.schema_context, embedder=embedder,
+                                       vocabulary=planner.districts + planner.categories)
+
+        if self._values.get("sql_cache") is None:
+            from db.schema_discovery import schema_available
+            schema_context = self.schema_context
+            if not schema_available(schema_context):
+                # A disabled stand-in, not memoized: the real cache is built once the schema reads again
+                return SQLTranslationCache(schema_context)
+        return self._memoized("sql_cache", build)
+
+    @property
+    def template_planner(self):
+        def build():
+            from llm.template_planner import TemplatePlanner
+            return TemplatePlanner(self.con)
+        return self._memoized("template_planner", build)
+
+    @property
+    def tool_cache(self):
+        """SQL and PDF tool results shared by all sessions (see `llm.tool_cache`)."""
+        def build():
+            from llm.tool_cache import ToolResultCache
+            return ToolResultCache()
+        return self._memoized("tool_cache", build)
+
+    @property
+    def data_version(self):
+        """Content hash of the CSV behind the `expenditures` table."""
+        from db.init_duckdb import get_data_version
+        with self.cursors.cursor() as cursor:
+            return get_data_version(cursor)
+
+    def warm_up(self, components: Sequence[str] = WARM_UP_COMPONENTS) -> Dict[str, float]:
+        """
+        Build `components` now rather than on first use. Returns the seconds each
+        took (imports included). A failing component is reported and skipped; the
+        error surfaces again when a tool uses it.
+        """
+        steps = {
+            "llm client": lambda: self.client,
+            "schema context": lambda: self.schema_context,
+            "database": lambda: self.cursors,
+            "template planner": lambda: self.template_planner,
+            "sql cache": lambda: self.sql_cache,
+            "pdf index": lambda: self.pdf_engine.load(),
+        }
+        timings = {}
+        for component in components:
+            start_time = time.perf_counter()
+            try:
+                steps[component]()
+            except Exception as e:
+                print(f"Warm-up of the {component} failed: {e}")
+            timings[component] = time.perf_counter() - start_time
+        return timings
+
+    def start_warm_up(self, components: Sequence[str] = WARM_UP_COMPONENTS) -> threading.Thread:
+        """Run `warm_up` on a background thread; queries arriving meanwhile wait only for what they need."""
+        self._warm_up_thread = threading.Thread(target=self.warm_up, args=(components,), daemon=True,
+                                                name="resources-warm-up")
+        self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def close(self):
+        if self._warm_up_thread is not None:
+            self._warm_up_thread.join()
+        self.tool_pool.shutdown(wait=True)
+        # Only what was actually built needs closing
+        if self._values.get("pdf_engine") is not None:
+            self.pdf_engine.invalidate()
+        if self._values.get("cursors") is not None:
+            self.cursors.close()
+        if self._values.get("con") is not None:
+            self.con.close()
@@ -1,52 +1,107 @@
 import openai
 from dotenv import load_dotenv
 import os
+from typing import Iterator
+from runner.executor import PREVIEW_ROWS, QueryResult
+from tracing.tracer import record_usage, span
 
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def humanize_query_result(nl_query: str, sql_query: str, query_result) -> str:
+def format_result_for_prompt(query_result, max_rows=PREVIEW_ROWS) -> str:
+    """Render at most `max_rows` rows of a result, noting how many were left out."""
+    if isinstance(query_result, QueryResult):
+        text = query_result.preview(max_rows).to_string(index=False)
+        if query_result.row_count > max_rows or query_result.truncated:
+            total = f"{query_result.row_count}+" if query_result.truncated else str(query_result.row_count)
+            text += f"\n... (showing {min(max_rows, query_result.row_count)} of {total} rows)"
+        return text
+    if hasattr(query_result, "head") and hasattr(query_result, "to_string"):
+        text = query_result.head(max_rows).to_string(index=False)
+        if len(query_result) > max_rows:
+            text += f"\n... (showing {max_rows} of {len(query_result)} rows)"
+        return text
+    return str(query_result)
+
+def _humanizer_messages(nl_query: str, sql_query: str, result_str: str):
+    return [
+        {"role": "system", "content": """
+        You are a helpful assistant that converts SQL query results into natural language responses.
+        Your task is to take a SQL query, its result, and the original question, and provide a clear,
+        concise, and natural language answer that directly addresses the user's question.
+        
+        Format currency values with dollar signs and commas (e.g., $1,234,567).
+        Round large numbers to make them more readable.
+        Use natural language that a non-technical person would understand.
+        """},
+        {"role": "user", "content": f"""
+        Original question: {nl_query}
+        
+        SQL query executed: {sql_query}
+        
+        Query result: {result_str}
+        
+        Please provide a natural language answer to the original question based on this data.
+        """}
+    ]
+
+def _stream_humanized(client, messages, raise_errors=False) -> Iterator[str]:
+    with span("sql.humanize", model="gpt-4o-mini", stream=True) as s:
+        try:
+            stream = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            for chunk in stream:
+                record_usage(s, getattr(chunk, "usage", None))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            s.set(llm_error=str(e))
+            if raise_errors:
+                raise
+            yield f"Error generating humanized response: {e}"
+
+def humanize_query_result(nl_query: str, sql_query: str, query_result, client=None, stream=False,
+                          raise_errors=False):
     """
     Convert a SQL query result into a human-readable response based on the original natural language query.
     
     Args:
         nl_query: The original natural language query
         sql_query: The SQL query that was executed
-        query_result: The result of the SQL query
+        query_result: The result of the SQL query (a QueryResult, DataFrame or plain value);
+            only a bounded preview of it is sent to the model
+        client: OpenAI-compatible client to use; a new one is created if omitted
+        stream: If True, return an iterator over pieces of the response as they are generated
+        raise_errors: If True, raise model errors instead of returning (or, when streaming,
+            appending) an error message, so callers can tell a failed answer from a real one
         
     Returns:
-        A human-readable response
+        A human-readable response, or an iterator over its pieces when streaming
     """
     try:
         # Format the query result for the LLM
-        result_str = str(query_result)
+        result_str = format_result_for_prompt(query_result)
+        messages = _humanizer_messages(nl_query, sql_query, result_str)
         
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": """
-                You are a helpful assistant that converts SQL query results into natural language responses.
-                Your task is to take a SQL query, its result, and the original question, and provide a clear,
-                concise, and natural language answer that directly addresses the user's question.
-                
-                Format currency values with dollar signs and commas (e.g., $1,234,567).
-                Round large numbers to make them more readable.
-                Use natural language that a non-technical person would understand.
-                """},
-                {"role": "user", "content": f"""
-                Original question: {nl_query}
-                
-                SQL query executed: {sql_query}
-                
-                Query result: {result_str}
-                
-                Please provide a natural language answer to the original question based on this data.
-                """}
-            ],
-            temperature=0.7,
-        )
+        client = client or openai.OpenAI()
+        if stream:
+            return _stream_humanized(client, messages, raise_errors)
+        with span("sql.humanize", model="gpt-4o-mini") as s:
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.7,
+            )
+            record_usage(s, getattr(response, "usage", None))
         
         return response.choices[0].message.content.strip()
     except Exception as e:
-        return f"Error generating humanized response: {e}" 
\ No newline at end of file
+        if raise_errors:
+            raise
+        error = f"Error generating humanized response: {e}"
+        return iter([error]) if stream else error
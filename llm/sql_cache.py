@@ -0,0 +1,187 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from db.schema_discovery import schema_available
+
+DEFAULT_CACHE_PATH = "sql_cache.sqlite"
+SIMILARITY_THRESHOLD = 0.93
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?.! ")
+
+
+# Words that change what SQL a question needs, mapped to one anchor per meaning
+OPERATOR_ANCHORS = {
+    "most": "most", "highest": "most", "largest": "most", "biggest": "most", "top": "most", "max": "most",
+    "maximum": "most", "least": "least", "lowest": "least", "smallest": "least", "fewest": "least",
+    "bottom": "least", "min": "least", "minimum": "least", "average": "avg", "avg": "avg", "mean": "avg",
+    "median": "median", "sum": "sum", "count": "count", "before": "before", "prior": "before",
+    "after": "after", "since": "since", "until": "until", "through": "through", "between": "between",
+    "not": "not", "excluding": "not", "except": "not", "without": "not", "increase": "increase",
+    "growth": "increase", "decrease": "decrease", "decline": "decrease", "change": "change",
+}
+POSSESSIVE = re.compile(r"(?<=\w)['\u2019]s?\b")
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def _anchors(question: str, vocabulary: Sequence[str] = ()) -> frozenset:
+    """
+    Tokens a cached translation must agree on to be reused semantically:
+    numbers (years, amounts), the known district and category names in
+    `vocabulary`, and ordering/aggregate words such as most/least or
+    before/after. "Kinzie 2022" and "Kinzie 2023" embed almost identically but
+    need different SQL. Matching ignores case and possessives ("Kinzie's").
+    Without a vocabulary, capitalized words past the first stand in for names.
+    """
+    question = POSSESSIVE.sub("", question)
+    words = re.findall(r"[A-Za-z][\w-]*|\d+", question)
+    anchors = {w for w in words if w.isdigit()}
+    anchors.update(OPERATOR_ANCHORS[w.lower()] for w in words if w.lower() in OPERATOR_ANCHORS)
+    if vocabulary:
+        squashed = _squash(question)
+        lowered = {w.lower() for w in words}
+        for name in vocabulary:
+            term = _squash(name)
+            # Short names must be whole words so "art" doesn't match "start"
+            if term and (term in squashed if len(term) >= 5 else term in lowered):
+                anchors.add(term)
+    else:
+        anchors.update(w.lower() for w in words[1:] if w[0].isupper() and w.lower() not in OPERATOR_ANCHORS)
+    return frozenset(anchors)
+
+
+def schema_fingerprint(schema_context: str) -> str:
+    return hashlib.sha256(schema_context.encode("utf-8")).hexdigest()
+
+
+class SQLTranslationCache:
+    """
+    Cache of validated NL-to-SQL translations.
+
+    Only SQL that executed without error is stored. Lookups try the normalized
+    question first, then the most similar cached question by embedding cosine
+    similarity above `threshold` whose anchors (numbers, the district and
+    category names in `vocabulary`, ordering words) match. Entries are tied to
+    a fingerprint of the schema prompt and are dropped when it changes. If the
+    schema could not be read, the cache is disabled rather than invalidated.
+    Hits, misses and the LLM latency saved are counted.
+    """
+
+    def __init__(self, schema_context: str, embedder=None, path=DEFAULT_CACHE_PATH,
+                 threshold=SIMILARITY_THRESHOLD, vocabulary: Sequence[str] = ()):
+        self.schema_hash = schema_fingerprint(schema_context)
+        self.embedder = embedder
+        self.threshold = threshold
+        self.vocabulary = list(vocabulary)
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "saved_seconds": 0.0}
+        self._lock = threading.Lock()
+        # An error text is no schema: fingerprinting it would drop every stored translation
+        self.enabled = schema_available(schema_context)
+        self._entries, self._matrix = [], None
+        if not self.enabled:
+            return
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                question TEXT NOT NULL,
+                schema_hash TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                embedding BLOB,
+                anchors TEXT NOT NULL,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (question, schema_hash)
+            )
+        """)
+        # Translations made against an older schema may reference columns that no longer exist
+        self._con.execute("DELETE FROM translations WHERE schema_hash != ?", [self.schema_hash])
+        self._con.commit()
+        self._load_index()
+
+    def _load_index(self):
+        rows = self._con.execute(
+            "SELECT question, sql, embedding, anchors, latency FROM translations "
+            "WHERE schema_hash = ? AND embedding IS NOT NULL",
+            [self.schema_hash],
+        ).fetchall()
+        self._entries = [(q, sql, latency, frozenset(json.loads(anchors))) for q, sql, _, anchors, latency in rows]
+        vectors = [np.frombuffer(blob, dtype=np.float32) for _, _, blob, _, _ in rows]
+        self._matrix = np.vstack(vectors) if vectors else None
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        if self.embedder is None:
+            return None
+        vector = np.asarray(self.embedder.embed([normalize_question(question)])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, question: str) -> Optional[Tuple[str, str, float]]:
+        """Return (sql, match kind, similarity) for a cached translation, or None."""
+        if not self.enabled:
+            return None
+        normalized = normalize_question(question)
+        with self._lock:
+            row = self._con.execute(
+                "SELECT sql, latency FROM translations WHERE question = ? AND schema_hash = ?",
+                [normalized, self.schema_hash],
+            ).fetchone()
+            if row:
+                self.stats["exact_hits"] += 1
+                self.stats["saved_seconds"] += row[1]
+                return row[0], "exact", 1.0
+            matrix, entries = self._matrix, self._entries
+
+        if matrix is not None:
+            vector = self._embed(question)
+            if vector is not None:
+                similarities = matrix @ vector
+                anchors = _anchors(question, self.vocabulary)
+                for i in np.argsort(-similarities):
+                    if similarities[i] < self.threshold:
+                        break
+                    cached_question, sql, latency, cached_anchors = entries[i]
+                    if cached_anchors == anchors:
+                        with self._lock:
+                            self.stats["semantic_hits"] += 1
+                            self.stats["saved_seconds"] += latency
+                        return sql, "semantic", float(similarities[i])
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def store(self, question: str, sql: str, latency: float):
+        """Record a translation whose SQL has executed successfully."""
+        if not self.enabled:
+            return
+        normalized = normalize_question(question)
+        anchors = _anchors(question, self.vocabulary)
+        vector = self._embed(question)
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [normalized, self.schema_hash, sql,
+                 vector.astype(np.float32).tobytes() if vector is not None else None,
+                 json.dumps(sorted(anchors)), latency, time.time()],
+            )
+            self._con.commit()
+            if vector is not None:
+                self._entries = self._entries + [(normalized, sql, latency, anchors)]
+                row = vector.reshape(1, -1)
+                self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.stats)
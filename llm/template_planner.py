@@ -0,0 +1,141 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from db.rollups import CATEGORY_COLUMNS, DISTRICT_YEAR_ROLLUP, rollups_exist
+
+SPEND_WORDS = re.compile(r"\b(spend|spends|spent|spending|expenditures?|expenses?|costs?|outlays?)\b", re.I)
+BREAKDOWN_WORDS = re.compile(r"\b(by category|categories|breakdown|break down|broken down|per category)\b", re.I)
+YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+YEAR_RANGE = re.compile(r"\b(?:from|between)\s+((?:19|20)\d{2})\s+(?:to|and|through|-)\s+((?:19|20)\d{2})\b", re.I)
+# Questions with these shapes need ranking, ratios, open-ended year ranges,
+# exclusions or reasoning; leave them to the LLM. Checked after removing
+# explicit ranges ("from 2019 through 2021"), which are supported.
+UNSUPPORTED = re.compile(
+    r"\b(average|avg|mean|median|per capita|percent|percentage|ratio|share|highest|lowest|most|least|top|rank|"
+    r"largest|smallest|why|goal|goals|project|projects|increase|decrease|change|growth|which|"
+    r"since|before|after|prior to|until|through|excluding|except|not|without|other than)\b", re.I)
+
+
+@dataclass
+class TemplatePlan:
+    """Parameterized SQL produced without the LLM."""
+    template: str
+    sql: str
+    params: List = field(default_factory=list)
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+class TemplatePlanner:
+    """
+    Rule-based planner for the common aggregate questions.
+
+    Handles total spend for one or more districts over one or more years (or
+    every year), per-category breakdowns, and spend in a single named category.
+    District names and years are indexed from the `expenditures` table at
+    construction. Queries read the precomputed `spend_by_district_year` rollup
+    when the database has it, and sum the raw table otherwise. `plan()` returns
+    None for anything else, so the caller can fall back to the LLM.
+    """
+
+    def __init__(self, con, table="expenditures"):
+        self.table = table
+        columns = [row[0] for row in con.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [table],
+        ).fetchall()]
+        self.enabled = "TIF District" in columns and "Report Year" in columns
+        self.categories = [c for c in CATEGORY_COLUMNS if c in columns]
+        self.source = DISTRICT_YEAR_ROLLUP if self.enabled and rollups_exist(con) else table
+        self.districts: List[str] = []
+        self.years: List[int] = []
+        if self.enabled:
+            self.districts = [row[0] for row in con.execute(
+                f'SELECT DISTINCT "TIF District" FROM {self.source} WHERE "TIF District" IS NOT NULL').fetchall()]
+            self.years = [int(row[0]) for row in con.execute(
+                f'SELECT DISTINCT "Report Year" FROM {self.source} WHERE "Report Year" IS NOT NULL').fetchall()]
+        self._aliases = self._build_aliases(self.districts)
+
+    @staticmethod
+    def _build_aliases(districts: List[str]) -> Dict[str, str]:
+        """Map squashed full names, and unambiguous first words, to district names."""
+        aliases = {_squash(d): d for d in districts if _squash(d)}
+        first_words: Dict[str, List[str]] = {}
+        for d in districts:
+            words = re.findall(r"[A-Za-z]+", d)
+            if words and len(words[0]) >= 4:
+                first_words.setdefault(words[0].lower(), []).append(d)
+        for word, names in first_words.items():
+            if len(names) == 1:
+                aliases.setdefault(word, names[0])
+        return aliases
+
+    def _find_districts(self, question: str) -> List[str]:
+        squashed = _squash(question)
+        words = set(re.findall(r"[a-z0-9]+", question.lower()))
+        found = []
+        for alias, district in self._aliases.items():
+            # Short aliases must be whole words so "art" doesn't match "start"
+            matched = alias in squashed if len(alias) >= 5 else alias in words
+            if matched and district not in found:
+                found.append(district)
+        return found
+
+    def _find_years(self, question: str) -> List[int]:
+        years = set()
+        for start, end in YEAR_RANGE.findall(question):
+            low, high = sorted((int(start), int(end)))
+            years.update(range(low, high + 1))
+        years.update(int(y) for y in YEAR.findall(question))
+        return sorted(years)
+
+    def _find_category(self, question: str) -> Optional[str]:
+        squashed = _squash(question)
+        matches = [c for c in self.categories if c != "Other" and _squash(c) in squashed]
+        # Prefer the most specific name, e.g. "Job Training/Retraining" over "Job Training"
+        return max(matches, key=len) if matches else None
+
+    def plan(self, question: str) -> Optional[TemplatePlan]:
+        if not self.enabled or not self.categories:
+            return None
+        if not SPEND_WORDS.search(question) or UNSUPPORTED.search(YEAR_RANGE.sub(" ", question)):
+            return None
+        districts = self._find_districts(question)
+        if not districts:
+            return None
+        years = self._find_years(question)
+
+        where = ['"TIF District" IN (SELECT UNNEST(?))']
+        params: List = [districts]
+        if years:
+            where.append('"Report Year" IN (SELECT UNNEST(?))')
+            params.append(years)
+        where_sql = " AND ".join(where)
+        group_sql = 'GROUP BY "TIF District", "Report Year" ORDER BY "TIF District", "Report Year"'
+
+        category = self._find_category(question)
+        if BREAKDOWN_WORDS.search(question):
+            template = "category_breakdown"
+            select = ", ".join(f"SUM({_quote(c)}) AS {_quote(c)}" for c in self.categories)
+        elif category:
+            template = "category_total"
+            select = f"SUM({_quote(category)}) AS {_quote(category)}"
+        else:
+            template = "total_spent"
+            if self.source == DISTRICT_YEAR_ROLLUP:
+                select = "SUM(total_spent) AS total_spent"
+            else:
+                select = "SUM(" + " + ".join(f"COALESCE({_quote(c)}, 0)" for c in self.categories) + ") AS total_spent"
+
+        sql = (f'SELECT "TIF District", "Report Year", {select}\n'
+               f"FROM {self.source}\n"
+               f"WHERE {where_sql}\n"
+               f"{group_sql}")
+        return TemplatePlan(template=template, sql=sql, params=params)
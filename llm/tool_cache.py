@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from llm.sql_cache import normalize_question
+
+DEFAULT_TTL_SECONDS = 900
+DEFAULT_MAX_ENTRIES = 512
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return normalize_question(value)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def tool_cache_key(tool: str, args: Dict[str, Any], *versions: Any) -> str:
+    """
+    Key a tool call by its name, its arguments with string values normalized like
+    cached SQL questions (case, whitespace, trailing punctuation), and the
+    versions its result depends on, e.g. the data version or index fingerprint.
+    """
+    return json.dumps([tool, _normalize(args), list(versions)], sort_keys=True, default=str)
+
+
+class ToolResultCache:
+    """
+    In-memory cache of tool results shared by every session of the process.
+
+    Entries expire `ttl` seconds after they are stored and the least recently
+    used are evicted beyond `max_entries`. Lookups are single-flight: while a
+    result is being computed, identical calls wait for it instead of running
+    the tool again. A `ttl` of 0 turns storage off but keeps the coalescing.
+    Hits, coalesced calls, misses and evictions are counted.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "coalesced": 0, "misses": 0, "expired": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, str]:
+        """
+        Return (result, outcome): the cached result ("hit"), the result of an
+        identical call already running ("coalesced"), or `compute()` ("miss").
+        Results rejected by `cacheable` (e.g. errors) go to waiting callers but
+        are not stored; an exception from `compute` is raised in all of them.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1], "hit"
+                del self._entries[key]
+                self.stats["expired"] += 1
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            return future.result(), "coalesced"
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if self.ttl > 0 and (cacheable is None or cacheable(result)):
+                self._entries[key] = (time.monotonic() + self.ttl, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats["evicted"] += 1
+        future.set_result(result)
+        return result, "miss"
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
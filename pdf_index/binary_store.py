@@ -0,0 +1,379 @@
+import argparse
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import duckdb
+import numpy as np
+
+from pdf_index.keyword_index import bm25_search, build_keyword_index, has_keyword_index
+from pdf_index.report_metadata import parse_report_filename
+
+if TYPE_CHECKING:
+    # llama-index takes seconds to import; only chunk lookups need it
+    from llama_index.core.schema import TextNode
+
+EMBEDDINGS_FILE = "embeddings.npy"
+NODES_FILE = "nodes.duckdb"
+
+# Rows scored per block when searching, so float16 stores are upcast a slice at a time
+SEARCH_BLOCK_ROWS = 65536
+
+
+class BinaryStoreWriter:
+    """
+    Append-only writer for the binary vector store.
+
+    Embeddings are streamed to a raw scratch file and node rows are inserted into
+    DuckDB as they arrive, so nothing has to hold the whole corpus in memory.
+    `close()` turns the scratch file into `embeddings.npy` and swaps both files
+    into place atomically.
+    """
+
+    def __init__(self, store_dir="vectorstore", dtype="float32"):
+        self.store_dir = store_dir
+        self.dtype = np.dtype(dtype)
+        self.dim: Optional[int] = None
+        self.count = 0
+        os.makedirs(store_dir, exist_ok=True)
+
+        self._raw_path = os.path.join(store_dir, EMBEDDINGS_FILE + ".raw.tmp")
+        self._npy_tmp_path = os.path.join(store_dir, EMBEDDINGS_FILE + ".tmp")
+        self._nodes_tmp_path = os.path.join(store_dir, NODES_FILE + ".tmp")
+        for path in (self._raw_path, self._npy_tmp_path, self._nodes_tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+        self._raw = open(self._raw_path, "wb")
+        self._con = duckdb.connect(self._nodes_tmp_path)
+        self._con.execute("""
+            CREATE TABLE nodes (
+                row_id INTEGER PRIMARY KEY,
+                node_id VARCHAR,
+                text VARCHAR,
+                metadata VARCHAR,
+                excluded_embed_metadata_keys VARCHAR,
+                excluded_llm_metadata_keys VARCHAR,
+                file_name VARCHAR,
+                chunk_hash VARCHAR,
+                district VARCHAR,
+                year INTEGER
+            )
+        """)
+
+    def add(self, nodes: Sequence[Dict], embeddings: Sequence[Sequence[float]]):
+        """
+        Append a batch of nodes and their embeddings.
+
+        Each node is a dict with `node_id`, `text` and optionally `metadata`,
+        `excluded_embed_metadata_keys`, `excluded_llm_metadata_keys` and
+        `chunk_hash`. The file name is taken from the metadata, and the report's
+        district and year are derived from it when the metadata lacks them.
+        """
+        if len(nodes) != len(embeddings):
+            raise ValueError("nodes and embeddings must have the same length")
+        if len(nodes) == 0:
+            return
+
+        matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match store dimension {self.dim}")
+        self._raw.write(matrix.astype(self.dtype).tobytes())
+
+        rows = []
+        for offset, node in enumerate(nodes):
+            metadata = dict(node.get("metadata") or {})
+            if "district" not in metadata:
+                district, year = parse_report_filename(metadata.get("file_name"))
+                if district is not None:
+                    metadata["district"], metadata["year"] = district, year
+            rows.append((
+                self.count + offset,
+                node["node_id"],
+                node.get("text", ""),
+                json.dumps(metadata),
+                json.dumps(node.get("excluded_embed_metadata_keys") or []),
+                json.dumps(node.get("excluded_llm_metadata_keys") or []),
+                metadata.get("file_name"),
+                node.get("chunk_hash"),
+                metadata.get("district"),
+                metadata.get("year"),
+            ))
+        self._con.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.count += len(nodes)
+
+    def close(self):
+        """Finalize the store and atomically replace any previous one."""
+        self._raw.close()
+        build_keyword_index(self._con)
+        self._con.close()
+
+        shape = (self.count, self.dim or 0)
+        out = np.lib.format.open_memmap(self._npy_tmp_path, mode="w+", dtype=self.dtype, shape=shape)
+        if self.count > 0:
+            raw = np.memmap(self._raw_path, dtype=self.dtype, mode="r", shape=shape)
+            for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+                out[start:start + SEARCH_BLOCK_ROWS] = raw[start:start + SEARCH_BLOCK_ROWS]
+            del raw
+        out.flush()
+        del out
+        os.remove(self._raw_path)
+
+        os.replace(self._npy_tmp_path, os.path.join(self.store_dir, EMBEDDINGS_FILE))
+        os.replace(self._nodes_tmp_path, os.path.join(self.store_dir, NODES_FILE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._raw.close()
+            self._con.close()
+            for path in (self._raw_path, self._npy_tmp_path, self._nodes_tmp_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+class BinaryVectorStore:
+    """
+    Read side of the binary vector store.
+
+    `embeddings.npy` holds one L2-normalized row per chunk and is opened with
+    `np.memmap`, so startup cost does not grow with the corpus. Chunk text and
+    metadata live in `nodes.duckdb` and are only fetched for the rows a query
+    actually returns. The same DuckDB file holds per-chunk district/year columns
+    for pre-filtering and BM25 postings for keyword search.
+
+    Lookups are safe to run from several threads at once: each one goes through
+    its own DuckDB cursor, and the memory-mapped matrix is only ever read.
+    """
+
+    def __init__(self, store_dir="vectorstore", mmap=True):
+        self.store_dir = store_dir
+        self.fingerprint = self.store_fingerprint(store_dir)
+        self.embeddings = np.load(os.path.join(store_dir, EMBEDDINGS_FILE), mmap_mode="r" if mmap else None)
+        self._con = duckdb.connect(os.path.join(store_dir, NODES_FILE), read_only=True)
+
+    @staticmethod
+    def exists(store_dir="vectorstore") -> bool:
+        return (os.path.exists(os.path.join(store_dir, EMBEDDINGS_FILE))
+                and os.path.exists(os.path.join(store_dir, NODES_FILE)))
+
+    @staticmethod
+    def store_fingerprint(store_dir="vectorstore") -> str:
+        """Identify a build of the store: writers replace both files, so their mtimes and sizes change."""
+        parts = []
+        for name in (EMBEDDINGS_FILE, NODES_FILE):
+            stat = os.stat(os.path.join(store_dir, name))
+            parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        return "/".join(parts)
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def _cursor(self):
+        return self._con.cursor()
+
+    def search(self, query_vector: Sequence[float], top_k=10,
+               rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the row ids and cosine scores of the `top_k` nearest chunks,
+        optionally restricted to the candidate `rows`.
+        """
+        query = _normalize_rows(np.asarray([query_vector], dtype=np.float32))[0]
+        if rows is not None:
+            candidates = np.asarray(rows, dtype=np.int64)
+            scores = np.empty(len(candidates), dtype=np.float32)
+            for start in range(0, len(candidates), SEARCH_BLOCK_ROWS):
+                part = candidates[start:start + SEARCH_BLOCK_ROWS]
+                scores[start:start + len(part)] = np.asarray(self.embeddings[part], dtype=np.float32) @ query
+        else:
+            candidates = None
+            scores = np.empty(len(self), dtype=np.float32)
+            for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+                block = np.asarray(self.embeddings[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+                scores[start:start + len(block)] = block @ query
+
+        n = len(scores)
+        if n == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        row_ids = candidates[top] if candidates is not None else top
+        return row_ids, scores[top]
+
+    def districts(self) -> List[str]:
+        with self._cursor() as cur:
+            return [r[0] for r in cur.execute(
+                "SELECT DISTINCT district FROM nodes WHERE district IS NOT NULL ORDER BY 1").fetchall()]
+
+    def years(self) -> List[int]:
+        with self._cursor() as cur:
+            return [r[0] for r in cur.execute(
+                "SELECT DISTINCT year FROM nodes WHERE year IS NOT NULL ORDER BY 1").fetchall()]
+
+    @staticmethod
+    def _row_filter(districts: Sequence[str] = (), years: Sequence[int] = ()) -> Optional[Tuple[str, list]]:
+        clauses, params = [], []
+        if districts:
+            clauses.append("district IN (SELECT UNNEST(?))")
+            params.append(list(districts))
+        if years:
+            clauses.append("year IN (SELECT UNNEST(?))")
+            params.append(list(years))
+        return (" AND ".join(clauses), params) if clauses else None
+
+    def filter_rows(self, districts: Sequence[str] = (), years: Sequence[int] = ()) -> Optional[np.ndarray]:
+        """Row ids of chunks from the given districts/years, or None when unfiltered."""
+        row_filter = self._row_filter(districts, years)
+        if row_filter is None:
+            return None
+        where, params = row_filter
+        with self._cursor() as cur:
+            rows = cur.execute(f"SELECT row_id FROM nodes WHERE {where} ORDER BY row_id", params).fetchall()
+        return np.asarray([r[0] for r in rows], dtype=np.int64)
+
+    def keyword_search(self, query: str, top_k=50, districts: Sequence[str] = (),
+                       years: Sequence[int] = ()) -> List[Tuple[int, float]]:
+        """BM25 search over chunk text; empty for stores built without a keyword index."""
+        with self._cursor() as cur:
+            if not has_keyword_index(cur):
+                return []
+            return bm25_search(cur, query, top_k=top_k, row_filter=self._row_filter(districts, years))
+
+    def get_nodes(self, row_ids: Iterable[int]) -> List["TextNode"]:
+        """Fetch the chunks for `row_ids`, preserving the order given."""
+        from llama_index.core.schema import TextNode
+
+        row_ids = [int(r) for r in row_ids]
+        if not row_ids:
+            return []
+        with self._cursor() as cur:
+            rows = cur.execute(
+                "SELECT row_id, node_id, text, metadata, excluded_embed_metadata_keys, excluded_llm_metadata_keys "
+                "FROM nodes WHERE row_id IN (SELECT UNNEST(?))",
+                [row_ids],
+            ).fetchall()
+        by_row = {
+            row[0]: TextNode(
+                id_=row[1],
+                text=row[2],
+                metadata=json.loads(row[3]),
+                excluded_embed_metadata_keys=json.loads(row[4]),
+                excluded_llm_metadata_keys=json.loads(row[5]),
+            )
+            for row in rows
+        }
+        return [by_row[r] for r in row_ids if r in by_row]
+
+    def read_file(self, file_name: str):
+        """
+        Return every stored chunk of `file_name` as writer-ready node dicts plus
+        their embedding rows, so unchanged files can be carried into a new store.
+        """
+        rows = self._con.execute(
+            "SELECT row_id, node_id, text, metadata, excluded_embed_metadata_keys, excluded_llm_metadata_keys, chunk_hash "
+            "FROM nodes WHERE file_name = ? ORDER BY row_id",
+            [file_name],
+        ).fetchall()
+        nodes = [
+            {
+                "node_id": row[1],
+                "text": row[2],
+                "metadata": json.loads(row[3]),
+                "excluded_embed_metadata_keys": json.loads(row[4]),
+                "excluded_llm_metadata_keys": json.loads(row[5]),
+                "chunk_hash": row[6],
+            }
+            for row in rows
+        ]
+        row_ids = [row[0] for row in rows]
+        return nodes, np.asarray(self.embeddings[row_ids], dtype=np.float32)
+
+    def embeddings_for_chunks(self, chunk_hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Look up stored embeddings by chunk hash; hashes not in the store are omitted."""
+        chunk_hashes = list(set(chunk_hashes))
+        if not chunk_hashes:
+            return {}
+        rows = self._con.execute(
+            "SELECT chunk_hash, MIN(row_id) FROM nodes WHERE chunk_hash IN (SELECT UNNEST(?)) GROUP BY chunk_hash",
+            [chunk_hashes],
+        ).fetchall()
+        return {h: np.asarray(self.embeddings[row_id], dtype=np.float32) for h, row_id in rows}
+
+    def close(self):
+        self._con.close()
+        self.embeddings = None
+
+
+def convert_persisted_store(persist_dir="vectorstore", out_dir=None, dtype="float32") -> int:
+    """
+    Convert a llama-index JSON persist directory into the binary store format.
+
+    Reads `default__vector_store.json` and `docstore.json` directly, without
+    constructing a llama-index StorageContext. Returns the number of chunks written.
+    Raises ValueError if the persist directory holds no embeddings, rather than
+    writing an empty store that would answer every query with nothing.
+    """
+    start_time = time.time()
+    out_dir = out_dir or persist_dir
+
+    vector_store_path = os.path.join(persist_dir, "default__vector_store.json")
+    embedding_dict: Dict[str, List[float]] = {}
+    if os.path.exists(vector_store_path):
+        with open(vector_store_path) as f:
+            embedding_dict = json.load(f).get("embedding_dict", {})
+    if not embedding_dict:
+        raise ValueError(f"No embeddings found in {vector_store_path}; rebuild the index with "
+                         f"`python -m pdf_index.vector_index --full` instead of converting it")
+
+    with open(os.path.join(persist_dir, "docstore.json")) as f:
+        docstore_data = json.load(f).get("docstore/data", {})
+
+    with BinaryStoreWriter(out_dir, dtype=dtype) as writer:
+        batch_nodes, batch_embeddings = [], []
+        for node_id, embedding in embedding_dict.items():
+            entry = docstore_data.get(node_id)
+            if entry is None:
+                continue
+            data = entry.get("__data__", {})
+            batch_nodes.append({
+                "node_id": node_id,
+                "text": data.get("text", ""),
+                "metadata": data.get("metadata", {}),
+                "excluded_embed_metadata_keys": data.get("excluded_embed_metadata_keys", []),
+                "excluded_llm_metadata_keys": data.get("excluded_llm_metadata_keys", []),
+            })
+            batch_embeddings.append(embedding)
+            if len(batch_nodes) >= 1024:
+                writer.add(batch_nodes, batch_embeddings)
+                batch_nodes, batch_embeddings = [], []
+        writer.add(batch_nodes, batch_embeddings)
+        count = writer.count
+
+    print(f"Converted {count} chunks from {persist_dir} to binary store in {out_dir} "
+          f"({time.time() - start_time:.2f} seconds)")
+    return count
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    if matrix.ndim != 2 or matrix.shape[0] == 0:
+        return np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a llama-index JSON vector store to the binary format.")
+    parser.add_argument("persist_dir", nargs="?", default="vectorstore")
+    parser.add_argument("--out-dir", default=None)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    args = parser.parse_args()
+    convert_persisted_store(args.persist_dir, out_dir=args.out_dir, dtype=args.dtype)
@@ -0,0 +1,92 @@
+import re
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from common.tokens import count_tokens
+
+if TYPE_CHECKING:
+    # Imported lazily: count_tokens is used on startup paths that never touch llama-index
+    from llama_index.core.schema import NodeWithScore
+
+# Chunks scoring below this fraction of the best chunk are dropped. Scores are
+# fused RRF scores, 1 / (60 + rank) per retriever: a chunk only one retriever
+# found scores at most about half of one both rank first, e.g. 0.49 at rank 2
+# and 0.3 at rank 41. So 0.3 keeps single-retriever hits down to about rank 40.
+MIN_RELATIVE_SCORE = 0.3
+# A score drop this many times larger than the average drop marks the elbow
+ELBOW_FACTOR = 3.0
+# Fused scores halve from chunks both retrievers found to chunks one found.
+# That step is agreement, not relevance, so the elbow is only looked for below it.
+AGREEMENT_STEP = 0.5
+# Word-shingle Jaccard similarity above which two chunks count as the same boilerplate
+DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 5
+DEFAULT_TOKEN_BUDGET = 6000
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _elbow(scores: List[float]) -> int:
+    """Number of leading scores to keep before the sharpest drop, or all of them if there is none."""
+    if len(scores) < 3:
+        return len(scores)
+    drops = [scores[i] - scores[i + 1] for i in range(len(scores) - 1)]
+    mean_drop = sum(drops) / len(drops)
+    if mean_drop <= 0:
+        return len(scores)
+    biggest = max(range(len(drops)), key=lambda i: drops[i])
+    return biggest + 1 if drops[biggest] > ELBOW_FACTOR * mean_drop else len(scores)
+
+
+def select_context(nodes: List["NodeWithScore"], token_budget=DEFAULT_TOKEN_BUDGET,
+                   min_relative_score=MIN_RELATIVE_SCORE) -> Tuple[List["NodeWithScore"], Dict[str, int]]:
+    """
+    Choose which retrieved chunks to hand to the synthesizer.
+
+    Chunks are kept in score order while they are within `min_relative_score` of
+    the best one and above the elbow of the score curve past the chunks both
+    retrievers agree on (see `AGREEMENT_STEP`). Near-duplicates of an
+    already kept chunk (the boilerplate repeated in every annual report) are
+    collapsed, and selection stops once `token_budget` is spent. Returns the kept
+    chunks and counts for logging.
+    """
+    from llama_index.core.schema import MetadataMode
+
+    stats = {"retrieved": len(nodes), "cut_by_score": 0, "duplicates": 0, "cut_by_budget": 0,
+             "used": 0, "tokens": 0}
+    if not nodes:
+        return [], stats
+
+    ranked = sorted(nodes, key=lambda n: -(n.score or 0.0))
+    scores = [n.score or 0.0 for n in ranked]
+    best = scores[0]
+    agreed = sum(1 for s in scores if s > best * AGREEMENT_STEP)
+    keep = agreed + _elbow(scores[agreed:])
+    if best > 0:
+        keep = min(keep, sum(1 for s in scores if s >= best * min_relative_score))
+    keep = max(keep, 1)
+    stats["cut_by_score"] = len(ranked) - keep
+
+    selected: List["NodeWithScore"] = []
+    kept_shingles: List[set] = []
+    for candidate in ranked[:keep]:
+        content = candidate.node.get_content(metadata_mode=MetadataMode.LLM)
+        shingles = _shingles(content)
+        if any(len(shingles & other) / max(1, len(shingles | other)) >= DUPLICATE_THRESHOLD
+               for other in kept_shingles):
+            stats["duplicates"] += 1
+            continue
+        tokens = count_tokens(content)
+        if selected and stats["tokens"] + tokens > token_budget:
+            stats["cut_by_budget"] += 1
+            continue
+        selected.append(candidate)
+        kept_shingles.append(shingles)
+        stats["tokens"] += tokens
+
+    stats["used"] = len(selected)
+    return selected, stats
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import re
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from pdf_index.embedding_cache import CachedEmbedder, get_embedding_cache
+
+load_dotenv()
+api_key = os.getenv("OPENAI_API_KEY")
+
+DEFAULT_EMBED_MODEL = "text-embedding-3-small"
+
+
+class OpenAIEmbedder:
+    """Embedding backend that calls the OpenAI embeddings endpoint, one request per batch."""
+
+    def __init__(self, model=DEFAULT_EMBED_MODEL, client=None):
+        self.name = model
+        self._client = client
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self._client is None:
+            import openai
+            self._client = openai.OpenAI(api_key=api_key)
+        # The endpoint rejects empty strings
+        response = self._client.embeddings.create(model=self.name, input=[t or " " for t in texts])
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class StubEmbedder:
+    """
+    Deterministic, offline embedding backend for tests and throughput benchmarks.
+
+    Words are feature-hashed into a fixed number of signed buckets, so texts that
+    share vocabulary get similar vectors and results are identical across runs.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"stub-hash-{dim}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vectors[row, value % self.dim] += 1.0 if (value >> 63) & 1 else -1.0
+        return vectors.tolist()
+
+
+def get_embedder(backend="openai", model=DEFAULT_EMBED_MODEL, cache_path: Optional[str] = None, use_cache=True,
+                 client=None):
+    """
+    Return an embedding backend by name (`openai` or `stub`), wrapped in the
+    shared on-disk embedding cache unless `use_cache` is False. `client` is an
+    OpenAI client to reuse, e.g. one sharing the server's connection pool.
+    """
+    if backend == "openai":
+        embedder = OpenAIEmbedder(model=model, client=client)
+    elif backend == "stub":
+        embedder = StubEmbedder()
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    if not use_cache:
+        return embedder
+    return CachedEmbedder(embedder, get_embedding_cache(cache_path))
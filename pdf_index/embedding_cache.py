@@ -0,0 +1,176 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CACHE_FILE = "embedding_cache.sqlite"
+DEFAULT_CACHE_PATH = os.path.join("vectorstore", CACHE_FILE)
+
+# Last-used times of hits are buffered and written back this many at a time
+TOUCH_BATCH_SIZE = 256
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies of a text share a cache entry."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model name, normalized text hash).
+
+    Backed by SQLite so it is shared across processes and survives restarts.
+    Entries carry a last-used timestamp and the least recently used ones are
+    evicted once the cache grows past `max_entries`. Hits only update that
+    timestamp in memory; the updates are written in batches, before any
+    eviction and on `close()`, so a lookup costs no write. The row count is
+    tracked as entries are added instead of being counted on every insert.
+    `hits` and `misses` count lookups made through this instance.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self._con.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._con.commit()
+        self._touched: Dict[tuple, float] = {}
+        # Upper bound on the row count: replaced rows are counted again
+        (self._count,) = self._con.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        """Return cached embeddings for `texts`, keyed by text hash."""
+        hashes = list({text_hash(t) for t in texts})
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._con.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+            for h in found:
+                self._touched[(model, h)] = now
+            if len(self._touched) >= TOUCH_BATCH_SIZE:
+                self._flush_touches()
+                self._con.commit()
+            for t in texts:
+                if text_hash(t) in found:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [
+            (model, text_hash(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._con.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            for row in rows:
+                self._touched.pop((model, row[1]), None)
+            self._count += len(rows)
+            if self._count > self.max_entries:
+                self._evict()
+            self._con.commit()
+
+    def _flush_touches(self):
+        if self._touched:
+            self._con.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(used, model, h) for (model, h), used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        # Recency has to be on disk before choosing what to drop
+        self._flush_touches()
+        (self._count,) = self._con.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if self._count > self.max_entries:
+            self._con.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                [self._count - self.max_entries],
+            )
+            self._count = self.max_entries
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._con.commit()
+            self._con.close()
+
+
+class CachedEmbedder:
+    """Wrap an embedding backend so cached texts never reach it."""
+
+    def __init__(self, embedder, cache: EmbeddingCache):
+        self.embedder = embedder
+        self.cache = cache
+        self.name = embedder.name
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        cached = self.cache.get_many(self.name, texts)
+        missing = []
+        seen = set()
+        for t in texts:
+            h = text_hash(t)
+            if h not in cached and h not in seen:
+                seen.add(h)
+                missing.append(t)
+        if missing:
+            vectors = self.embedder.embed(missing)
+            self.cache.put_many(self.name, missing, vectors)
+            for t, v in zip(missing, vectors):
+                cached[text_hash(t)] = v
+        return [cached[text_hash(t)] for t in texts]
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(path: Optional[str] = None) -> EmbeddingCache:
+    """Return the process-wide cache for `path`, so indexing and querying share one connection."""
+    path = path or DEFAULT_CACHE_PATH
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = EmbeddingCache(path)
+            _caches[path] = cache
+        return cache
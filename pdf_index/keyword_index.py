@@ -0,0 +1,97 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Okapi BM25 parameters
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has", "have",
+    "how", "in", "is", "it", "its", "of", "on", "or", "that", "the", "their", "they", "this", "to",
+    "was", "were", "what", "when", "where", "which", "who", "why", "will", "with",
+}
+
+# Must match the tokenization done in SQL by `build_keyword_index`
+TOKEN_SPLIT = r"[^a-z0-9]+"
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.split(TOKEN_SPLIT, text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def build_keyword_index(con):
+    """
+    Build the BM25 postings for the `nodes` table of a binary store.
+
+    Creates `postings(term, row_id, tf)`, sorted by term so DuckDB's zone maps
+    make term lookups cheap, and `doc_lengths(row_id, doc_len)`.
+    """
+    stopwords = sorted(STOPWORDS)
+    con.execute("DROP TABLE IF EXISTS postings")
+    con.execute("DROP TABLE IF EXISTS doc_lengths")
+    con.execute(f"""
+        CREATE TABLE postings AS
+        SELECT term, row_id, COUNT(*)::INTEGER AS tf
+        FROM (
+            SELECT row_id, UNNEST(regexp_split_to_array(lower(text), '{TOKEN_SPLIT}')) AS term
+            FROM nodes
+        )
+        WHERE length(term) > 1 AND NOT list_contains(?, term)
+        GROUP BY term, row_id
+        ORDER BY term
+    """, [stopwords])
+    con.execute("""
+        CREATE TABLE doc_lengths AS
+        SELECT n.row_id, COALESCE(SUM(p.tf), 0)::INTEGER AS doc_len
+        FROM nodes n LEFT JOIN postings p USING (row_id)
+        GROUP BY n.row_id
+    """)
+
+
+def has_keyword_index(con) -> bool:
+    rows = con.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name IN ('postings', 'doc_lengths')"
+    ).fetchone()
+    return rows[0] == 2
+
+
+def bm25_search(con, query: str, top_k=50, row_filter: Optional[Tuple[str, Sequence]] = None) -> List[Tuple[int, float]]:
+    """
+    Score chunks against `query` with BM25 and return (row_id, score) pairs.
+
+    `row_filter` is an optional (SQL predicate over `nodes`, parameters) pair used
+    to restrict the candidates, e.g. to one district and year.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms or top_k <= 0:
+        return []
+    where, params = row_filter if row_filter else ("TRUE", [])
+    rows = con.execute(f"""
+        WITH stats AS (SELECT COUNT(*) AS n, AVG(doc_len) AS avgdl FROM doc_lengths),
+        df AS (
+            SELECT term, COUNT(*) AS df FROM postings
+            WHERE term IN (SELECT UNNEST(?)) GROUP BY term
+        )
+        SELECT p.row_id,
+               SUM(ln(1 + (stats.n - df.df + 0.5) / (df.df + 0.5))
+                   * p.tf * {K1 + 1} / (p.tf + {K1} * (1 - {B} + {B} * d.doc_len / stats.avgdl))) AS score
+        FROM postings p
+        JOIN df USING (term)
+        JOIN doc_lengths d USING (row_id)
+        JOIN nodes USING (row_id)
+        CROSS JOIN stats
+        WHERE {where}
+        GROUP BY p.row_id
+        ORDER BY score DESC
+        LIMIT ?
+    """, [terms, *params, top_k]).fetchall()
+    return [(int(row_id), float(score)) for row_id, score in rows]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k=60) -> Dict[int, float]:
+    """Fuse ranked lists of row ids: each list contributes 1 / (k + rank) per item."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row_id in enumerate(ranking, start=1):
+            fused[row_id] = fused.get(row_id, 0.0) + 1.0 / (k + rank)
+    return fused
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+MANIFEST_FILE = "ingest_manifest.json"
+# Bump whenever chunk text or hashes change for the same PDF, so existing
+# indexes are rebuilt once instead of silently re-embedded file by file.
+# 2: PDFs are parsed with pypdf directly instead of SimpleDirectoryReader.
+MANIFEST_VERSION = 2
+
+
+def file_sha256(path: str, block_size=1 << 20) -> str:
+    """Hash a file's contents without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_hash(content: str) -> str:
+    """Hash the exact content that gets embedded for a chunk."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """
+    Record of what is currently in the vector store, keyed by PDF file name.
+
+    Each entry stores the file's content hash and the hashes of its chunks, so a
+    rebuild can tell new, changed, unchanged and deleted PDFs apart. The manifest
+    is only valid for the embedding model it was built with.
+    """
+
+    def __init__(self, embed_model: str, files: Optional[Dict[str, Dict]] = None):
+        self.embed_model = embed_model
+        self.files: Dict[str, Dict] = files or {}
+
+    @classmethod
+    def load(cls, persist_dir="vectorstore") -> Optional["IngestManifest"]:
+        path = os.path.join(persist_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(embed_model=data.get("embed_model", ""), files=data.get("files", {}))
+
+    def save(self, persist_dir="vectorstore"):
+        path = os.path.join(persist_dir, MANIFEST_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "embed_model": self.embed_model, "files": self.files}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def file_hash(self, file_name: str) -> Optional[str]:
+        entry = self.files.get(file_name)
+        return entry["sha256"] if entry else None
+
+    def set_file(self, file_name: str, sha256: str, chunk_hashes: List[str]):
+        self.files[file_name] = {"sha256": sha256, "chunks": chunk_hashes}
+
+    def diff(self, current_hashes: Dict[str, str]) -> Dict[str, List[str]]:
+        """Classify files against the manifest as added, changed, unchanged or removed."""
+        result = {"added": [], "changed": [], "unchanged": [], "removed": []}
+        for file_name, sha256 in sorted(current_hashes.items()):
+            previous = self.file_hash(file_name)
+            if previous is None:
+                result["added"].append(file_name)
+            elif previous != sha256:
+                result["changed"].append(file_name)
+            else:
+                result["unchanged"].append(file_name)
+        result["removed"] = sorted(set(self.files) - set(current_hashes))
+        return result
@@ -0,0 +1,212 @@
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import Document, MetadataMode
+
+from pdf_index.binary_store import BinaryStoreWriter
+from pdf_index.manifest import chunk_hash
+from pdf_index.report_metadata import parse_report_filename
+
+# Keep absolute paths out of the embedded text so moving the checkout doesn't change chunk hashes
+EXCLUDED_METADATA_KEYS = ["file_name", "file_path"]
+
+
+def parse_pdf_pages(path: str) -> List[Tuple[str, str]]:
+    """
+    Extract (page_label, text) pairs from a PDF.
+
+    Runs in a worker process: pypdf text extraction is pure Python and CPU-bound.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    try:
+        labels = list(reader.page_labels)
+    except Exception:
+        labels = []
+    pages = []
+    for i, page in enumerate(reader.pages):
+        label = labels[i] if i < len(labels) else str(i + 1)
+        pages.append((label, page.extract_text() or ""))
+    return pages
+
+
+class IngestionPipeline:
+    """
+    Parse, chunk, embed and store PDFs as a streaming pipeline.
+
+    PDFs are parsed in a process pool with a bounded number of files in flight.
+    Their chunks are grouped into batches of `batch_size` and embedded on a
+    thread pool with at most `max_concurrency` requests outstanding, retrying
+    failed batches with exponential backoff. A file is appended to the store
+    writer as soon as all of its chunks have embeddings, in their original
+    order, so memory stays bounded by the in-flight work rather than the corpus.
+    """
+
+    def __init__(self, embedder, writer: BinaryStoreWriter, batch_size=100, max_concurrency=4,
+                 parse_workers: Optional[int] = None, max_retries=5, backoff_seconds=1.0,
+                 splitter: Optional[SentenceSplitter] = None):
+        self.embedder = embedder
+        self.writer = writer
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.parse_workers = parse_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.splitter = splitter or SentenceSplitter()
+        self.stats = {"files": 0, "pages": 0, "chunks_embedded": 0, "chunks_skipped": 0, "seconds": 0.0}
+
+    def run(self, paths: Iterable[str],
+            lookup_embeddings: Optional[Callable[[List[str]], Dict[str, object]]] = None,
+            on_file_done: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """
+        Ingest `paths` into the writer.
+
+        `lookup_embeddings(chunk_hashes)` may return stored embeddings to reuse
+        instead of calling the embedder. `on_file_done(file_name, info)` is called
+        once every chunk of a file has been written, with its chunk hashes,
+        embedded/skipped counts and elapsed seconds.
+        """
+        start_time = time.time()
+        files: Dict[str, Dict] = {}
+        pending_batch: List[Dict] = []
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as embed_pool:
+            def flush(force=False):
+                nonlocal pending_batch
+                while len(pending_batch) >= self.batch_size or (force and pending_batch):
+                    batch, pending_batch = pending_batch[:self.batch_size], pending_batch[self.batch_size:]
+                    while len(in_flight) >= self.max_concurrency:
+                        self._drain(in_flight, files, on_file_done, block=True)
+                    future = embed_pool.submit(self._embed_with_retry, [c["content"] for c in batch])
+                    in_flight[future] = batch
+
+            for path, pages, parse_seconds in self._parse(paths):
+                chunks = self._chunk(path, pages)
+                reused = lookup_embeddings([c["chunk_hash"] for c in chunks]) if lookup_embeddings else {}
+                to_embed = [c for c in chunks if c["chunk_hash"] not in reused]
+                files[path] = {
+                    "start": time.time() - parse_seconds,
+                    "chunks": chunks,
+                    "embeddings": [reused.get(c["chunk_hash"]) for c in chunks],
+                    "chunk_hashes": [c["chunk_hash"] for c in chunks],
+                    "pages": len(pages),
+                    "embedded": len(to_embed),
+                    "skipped": len(chunks) - len(to_embed),
+                    "remaining": len(to_embed),
+                }
+                self.stats["files"] += 1
+                self.stats["pages"] += len(pages)
+                self.stats["chunks_embedded"] += len(to_embed)
+                self.stats["chunks_skipped"] += len(chunks) - len(to_embed)
+
+                pending_batch.extend(to_embed)
+                self._finish_if_done(path, files, on_file_done)
+                flush()
+                self._drain(in_flight, files, on_file_done, block=False)
+
+            flush(force=True)
+            while in_flight:
+                self._drain(in_flight, files, on_file_done, block=True)
+
+        self.stats["seconds"] = time.time() - start_time
+        return self.stats
+
+    def throughput(self) -> Dict[str, float]:
+        seconds = self.stats["seconds"] or 1e-9
+        return {
+            "pages_per_second": self.stats["pages"] / seconds,
+            "chunks_per_second": (self.stats["chunks_embedded"] + self.stats["chunks_skipped"]) / seconds,
+        }
+
+    def _parse(self, paths: Iterable[str]) -> Iterator[Tuple[str, List[Tuple[str, str]], float]]:
+        """Yield parsed PDFs as they finish, keeping at most two per worker in flight."""
+        paths = iter(paths)
+        max_in_flight = self.parse_workers * 2
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            in_flight = {}
+
+            def submit_next():
+                path = next(paths, None)
+                if path is not None:
+                    in_flight[pool.submit(parse_pdf_pages, path)] = (path, time.time())
+                return path is not None
+
+            while len(in_flight) < max_in_flight and submit_next():
+                pass
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, submitted = in_flight.pop(future)
+                    yield path, future.result(), time.time() - submitted
+                    submit_next()
+
+    def _chunk(self, path: str, pages: List[Tuple[str, str]]) -> List[Dict]:
+        file_name = os.path.basename(path)
+        district, year = parse_report_filename(file_name)
+        base_metadata = {"file_name": file_name, "file_path": os.path.abspath(path)}
+        if district is not None:
+            base_metadata.update(district=district, year=year)
+        documents = [
+            Document(
+                text=text,
+                metadata={"page_label": label, **base_metadata},
+                excluded_embed_metadata_keys=list(EXCLUDED_METADATA_KEYS),
+                excluded_llm_metadata_keys=list(EXCLUDED_METADATA_KEYS),
+            )
+            for label, text in pages
+        ]
+        chunks = []
+        for position, node in enumerate(self.splitter.get_nodes_from_documents(documents)):
+            content = node.get_content(metadata_mode=MetadataMode.EMBED)
+            chunks.append({
+                "node_id": node.node_id,
+                "text": node.text,
+                "metadata": node.metadata,
+                "excluded_embed_metadata_keys": node.excluded_embed_metadata_keys,
+                "excluded_llm_metadata_keys": node.excluded_llm_metadata_keys,
+                "chunk_hash": chunk_hash(content),
+                "content": content,
+                "path": path,
+                "position": position,
+            })
+        return chunks
+
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embedder.embed(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt) * (1 + random.random() / 2)
+                print(f"Embedding batch failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _drain(self, in_flight: Dict, files: Dict, on_file_done, block: bool):
+        if not in_flight:
+            return
+        done, _ = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            batch = in_flight.pop(future)
+            for chunk, embedding in zip(batch, future.result()):
+                info = files[chunk["path"]]
+                info["embeddings"][chunk["position"]] = embedding
+                info["remaining"] -= 1
+            for path in {chunk["path"] for chunk in batch}:
+                self._finish_if_done(path, files, on_file_done)
+
+    def _finish_if_done(self, path: str, files: Dict, on_file_done):
+        info = files[path]
+        if info["remaining"] == 0 and not info.get("done"):
+            info["done"] = True
+            # Batches finish out of order; writing the file whole keeps its chunks in page order
+            self.writer.add(info.pop("chunks"), info.pop("embeddings"))
+            info["seconds"] = time.time() - info["start"]
+            if on_file_done:
+                on_file_done(os.path.basename(path), info)
@@ -1,30 +1,48 @@
-import os
 import time
-from dotenv import load_dotenv
-from llama_index.core import StorageContext, load_index_from_storage
-from llama_index.llms.openai import OpenAI
-from llama_index.embeddings.openai import OpenAIEmbedding
+from typing import Iterator, Optional
+from pdf_index.retrieval_engine import PDFRetrievalEngine, get_engine
+from tracing.tracer import span
 
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-
-def query_pdf_index(question: str, persist_dir="vectorstore", top_k=200):
-    start_time = time.time()
-    
-    storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
-    index = load_index_from_storage(storage_context)
-    embed_model = OpenAIEmbedding(model="text-embedding-3-small", api_key=api_key)
-    query_engine = index.as_query_engine(
-        llm=OpenAI(model="o4-mini", reasoning_effort="low", api_key=api_key),
-        similarity_top_k=top_k,
-        embed_model=embed_model
-    )
-    response = query_engine.query(question)
-    
+def _print_stats(engine: PDFRetrievalEngine, start_time: float, first_token_time: Optional[float] = None):
     end_time = time.time()
-    print(f"PDF query took {end_time - start_time:.2f} seconds")
+    if first_token_time is not None:
+        print(f"PDF query took {end_time - start_time:.2f} seconds "
+              f"(first token after {first_token_time - start_time:.2f} seconds)")
+    else:
+        print(f"PDF query took {end_time - start_time:.2f} seconds")
+    cache_stats = engine.embedding_cache_stats()
+    if cache_stats:
+        print(f"Query embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+
+def _stream_pdf_answer(engine: PDFRetrievalEngine, question: str, top_k: int) -> Iterator[str]:
+    with span("pdf.query", top_k=top_k, stream=True) as s:
+        start_time = time.time()
+        first_token_time = None
+        for text in engine.stream_query(question, top_k=top_k):
+            if first_token_time is None:
+                first_token_time = time.time()
+                s.set(first_token_ms=round((first_token_time - start_time) * 1000, 3))
+            yield text
+        _print_stats(engine, start_time, first_token_time)
+
+def query_pdf_index(question: str, persist_dir="vectorstore", top_k=20, engine: Optional[PDFRetrievalEngine] = None,
+                    stream=False):
+    """
+    Answer `question` from the PDF index. With `stream=True`, return an iterator
+    over pieces of the answer as they are generated instead of the full text.
+    """
+    # Reuse the resident engine so the index is only deserialized once per process
+    if engine is None:
+        engine = get_engine(persist_dir)
+    if stream:
+        return _stream_pdf_answer(engine, question, top_k)
+
+    with span("pdf.query", top_k=top_k):
+        start_time = time.time()
+        response = engine.query(question, top_k=top_k)
+        _print_stats(engine, start_time)
     
-    return str(response)
+    return response
 
 # FOR DEBUGGING: Create a retriever to see what nodes are being fetched
 # retriever = index.as_retriever(similarity_top_k=50)
@@ -34,9 +52,6 @@ def query_pdf_index(question: str, persist_dir="vectorstore", top_k=200):
 # for i, node in enumerate(nodes):
 #     print(f"Node {i}:\n{node.node.get_content()}\n")
 
-# Hybrid retrieval - vector and keyword
-# https://docs.llamaindex.ai/en/stable/examples/query_engine/CustomRetrievers/
-
 if __name__ == "__main__":
     question = "What was Kinzie's total spending in 2023 and what were their main goals for that year?"
     result = query_pdf_index(question)
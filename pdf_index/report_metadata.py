@@ -0,0 +1,37 @@
+import os
+import re
+from typing import Iterable, List, Optional, Tuple
+
+REPORT_FILENAME = re.compile(r"^(?P<district>.+?)[_\- ](?P<year>(19|20)\d{2})$")
+YEAR_PATTERN = re.compile(r"\b((?:19|20)\d{2})\b")
+
+
+def parse_report_filename(file_name: str) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Extract (district, year) from a report file name like `LaSalle_2022.pdf`.
+
+    Returns (None, None) when the name doesn't follow the District_Year pattern.
+    """
+    stem = os.path.splitext(os.path.basename(file_name or ""))[0]
+    match = REPORT_FILENAME.match(stem)
+    if not match:
+        return None, None
+    return match.group("district").replace("_", " "), int(match.group("year"))
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def extract_report_filters(question: str, districts: Iterable[str], years: Iterable[int]) -> Tuple[List[str], List[int]]:
+    """
+    Find known districts and years mentioned in a question.
+
+    District names are compared with spaces and punctuation removed, so
+    "La Salle" matches `LaSalle`. Only years that exist in the index count.
+    """
+    squashed = _squash(question)
+    found_districts = [d for d in districts if d and _squash(d) in squashed]
+    known_years = set(years)
+    found_years = sorted({int(y) for y in YEAR_PATTERN.findall(question) if int(y) in known_years})
+    return found_districts, found_years
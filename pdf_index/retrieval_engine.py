@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from llama_index.core import get_response_synthesizer
+from llama_index.core.response_synthesizers import ResponseMode
+from llama_index.core.schema import NodeWithScore
+from llama_index.llms.openai import OpenAI
+
+from pdf_index.binary_store import BinaryVectorStore, convert_persisted_store
+from pdf_index.embedders import get_embedder
+from pdf_index.context_selection import DEFAULT_TOKEN_BUDGET, select_context
+from pdf_index.embedding_cache import CACHE_FILE
+from pdf_index.keyword_index import reciprocal_rank_fusion
+from pdf_index.report_metadata import extract_report_filters
+from tracing.tracer import span
+
+load_dotenv()
+api_key = os.getenv("OPENAI_API_KEY")
+
+# Each ranking contributes this many candidates per requested chunk to the fusion
+CANDIDATE_MULTIPLIER = 3
+MIN_CANDIDATES = 50
+
+
+class PDFRetrievalEngine:
+    """
+    Long-lived retrieval engine over the persisted PDF vector index.
+
+    The binary store is opened once (embeddings memory-mapped, chunk text fetched
+    on demand), and the embedding model, LLM and response synthesizer are reused
+    across queries. The embedding backend is pluggable (see `pdf_index.embedders`)
+    and must match the one the store was built with. A legacy llama-index JSON
+    persist directory is converted to the binary format the first time it is
+    loaded. Call `reload()` (or `invalidate()` for a lazy reload) after the index
+    has been rebuilt.
+
+    The engine lock only guards opening and swapping the store. Queries borrow
+    the current store and score against it unlocked, so concurrent requests run
+    in parallel; a store swapped out mid-query is closed when its last query ends.
+    """
+
+    def __init__(self, persist_dir="vectorstore", embed_model="text-embedding-3-small", llm_model="o4-mini",
+                 mmap=True, embedder=None, synthesizer=None, http_client=None):
+        self.persist_dir = persist_dir
+        # Pooled httpx client for the default embedder and LLM, shared with the caller's other OpenAI traffic
+        self.http_client = http_client
+        self.embed_model_name = embed_model
+        self.llm_model_name = llm_model
+        self.mmap = mmap
+        self._lock = threading.RLock()
+        self._store: Optional[BinaryVectorStore] = None
+        self._borrowed: Dict[int, int] = {}
+        self._districts: List[str] = []
+        self._years: List[int] = []
+        self._embedder = embedder
+        self._synthesizer = synthesizer
+        self._streaming_synthesizer = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._store is not None
+
+    @property
+    def index_version(self) -> str:
+        """Fingerprint of the loaded index (loading it if needed); changes when a rebuilt index is reloaded."""
+        self.load()
+        with self._lock:
+            return self._store.fingerprint
+
+    def embedding_cache_stats(self) -> Optional[Dict[str, int]]:
+        """Hit/miss counters of the query embedding cache, if the embedder is cached."""
+        cache = getattr(self._embedder, "cache", None)
+        return cache.stats() if cache is not None else None
+
+    def load(self):
+        """Open the persisted index if it is not loaded yet."""
+        with self._lock:
+            if self._store is not None:
+                return
+            with span("pdf.load_index", persist_dir=self.persist_dir) as s:
+                start_time = time.time()
+
+                if not BinaryVectorStore.exists(self.persist_dir):
+                    print(f"No binary vector store in {self.persist_dir}, converting the JSON store...")
+                    convert_persisted_store(self.persist_dir)
+                self._store = BinaryVectorStore(self.persist_dir, mmap=self.mmap)
+                self._districts = self._store.districts()
+                self._years = self._store.years()
+
+                if self._embedder is None:
+                    client = None
+                    if self.http_client is not None:
+                        import openai
+                        client = openai.OpenAI(api_key=api_key, http_client=self.http_client)
+                    self._embedder = get_embedder("openai", model=self.embed_model_name,
+                                                  cache_path=os.path.join(self.persist_dir, CACHE_FILE), client=client)
+                if self._synthesizer is None:
+                    llm = OpenAI(model=self.llm_model_name, reasoning_effort="low", api_key=api_key,
+                                 http_client=self.http_client)
+                    self._synthesizer = get_response_synthesizer(llm=llm, response_mode=ResponseMode.COMPACT)
+                    self._streaming_synthesizer = get_response_synthesizer(llm=llm, response_mode=ResponseMode.COMPACT,
+                                                                           streaming=True)
+
+                s.set(chunks=len(self._store))
+                print(f"PDF index loaded ({len(self._store)} chunks) in {time.time() - start_time:.2f} seconds")
+
+    def invalidate(self):
+        """Close the loaded index; the next query reopens it from disk."""
+        with self._lock:
+            # A store still in use by a query is closed by `_borrow_store` instead
+            if self._store is not None and id(self._store) not in self._borrowed:
+                self._store.close()
+            self._store = None
+
+    @contextmanager
+    def _borrow_store(self):
+        """Yield the loaded store with its district and year lists, keeping it open until released."""
+        with self._lock:
+            self.load()
+            store, districts, years = self._store, self._districts, self._years
+            self._borrowed[id(store)] = self._borrowed.get(id(store), 0) + 1
+        try:
+            yield store, districts, years
+        finally:
+            with self._lock:
+                self._borrowed[id(store)] -= 1
+                if self._borrowed[id(store)] == 0:
+                    del self._borrowed[id(store)]
+                    if store is not self._store:
+                        store.close()
+
+    def reload(self):
+        """Reload the index from disk, e.g. after `build_pdf_index` has run."""
+        with self._lock:
+            self.invalidate()
+            self.load()
+
+    def retrieve(self, question: str, top_k=20) -> List[NodeWithScore]:
+        """
+        Return the `top_k` chunks most relevant to the question.
+
+        Districts and years named in the question restrict the candidates to
+        those reports. Within them, dense vector and BM25 keyword rankings are
+        combined with reciprocal rank fusion; the returned score is the fused one.
+        """
+        self.load()
+        with span("pdf.embed_query") as s:
+            stats_before = self.embedding_cache_stats()
+            query_vector = np.asarray(self._embedder.embed([question])[0], dtype=np.float32)
+            if stats_before is not None:
+                s.set(cache_hit=self.embedding_cache_stats()["hits"] > stats_before["hits"])
+        with self._borrow_store() as (store, known_districts, known_years), \
+                span("pdf.retrieve", top_k=top_k) as s:
+            districts, years = extract_report_filters(question, known_districts, known_years)
+            rows = store.filter_rows(districts, years)
+            if rows is not None and len(rows) == 0:
+                # e.g. a district we have no report for that year; search everything instead
+                districts, years, rows = [], [], None
+            if districts or years:
+                print(f"PDF search filtered to districts={districts or 'any'} years={years or 'any'}")
+
+            candidate_k = max(top_k * CANDIDATE_MULTIPLIER, MIN_CANDIDATES)
+            vector_ids, _ = store.search(query_vector, top_k=candidate_k, rows=rows)
+            keyword_hits = store.keyword_search(question, top_k=candidate_k, districts=districts, years=years)
+            fused = reciprocal_rank_fusion([vector_ids.tolist(), [row_id for row_id, _ in keyword_hits]])
+            ranked = sorted(fused, key=lambda row_id: -fused[row_id])[:top_k]
+            nodes = store.get_nodes(ranked)
+            s.set(filtered=bool(districts or years), vector_hits=len(vector_ids), keyword_hits=len(keyword_hits),
+                  returned=len(nodes))
+        return [NodeWithScore(node=node, score=fused[row_id]) for row_id, node in zip(ranked, nodes)]
+
+    def _select(self, question: str, top_k: int, token_budget: int) -> List[NodeWithScore]:
+        nodes = self.retrieve(question, top_k=top_k)
+        with span("pdf.select_context", token_budget=token_budget) as s:
+            selected, stats = select_context(nodes, token_budget=token_budget)
+            s.set(retrieved=stats["retrieved"], used=stats["used"], context_tokens=stats["tokens"])
+        print(f"PDF context: {stats['retrieved']} chunks retrieved, {stats['used']} used "
+              f"({stats['cut_by_score']} below score cutoff, {stats['duplicates']} near-duplicates, "
+              f"{stats['cut_by_budget']} over budget), ~{stats['tokens']} tokens sent")
+        return selected
+
+    def query(self, question: str, top_k=20, token_budget=DEFAULT_TOKEN_BUDGET) -> str:
+        """
+        Retrieve up to `top_k` chunks, keep the ones worth sending (see
+        `select_context`) within `token_budget`, and synthesize an answer.
+        """
+        selected = self._select(question, top_k, token_budget)
+        with span("pdf.synthesize", chunks=len(selected), model=self.llm_model_name):
+            response = self._synthesizer.synthesize(question, nodes=selected)
+        return str(response)
+
+    def stream_query(self, question: str, top_k=20, token_budget=DEFAULT_TOKEN_BUDGET) -> Iterator[str]:
+        """
+        Like `query`, but yield the answer in pieces as the LLM produces them.
+        A synthesizer without streaming support yields its whole answer at once.
+        """
+        selected = self._select(question, top_k, token_budget)
+        synthesizer = self._streaming_synthesizer or self._synthesizer
+        with span("pdf.synthesize", chunks=len(selected), model=self.llm_model_name, stream=True) as s:
+            response = synthesizer.synthesize(question, nodes=selected)
+            response_gen = getattr(response, "response_gen", None)
+            if response_gen is None:
+                yield str(response)
+                return
+            for i, text in enumerate(response_gen):
+                if i == 0:
+                    s.set(first_token_ms=round(s.duration_ms, 3))
+                yield text
+
+
+_engines: Dict[str, PDFRetrievalEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(persist_dir="vectorstore") -> PDFRetrievalEngine:
+    """Return the process-wide engine for `persist_dir`, creating it on first use."""
+    with _engines_lock:
+        engine = _engines.get(persist_dir)
+        if engine is None:
+            engine = PDFRetrievalEngine(persist_dir=persist_dir)
+            _engines[persist_dir] = engine
+        return engine
@@ -1,14 +1,115 @@
+import argparse
+import glob
 import os
-from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
-from llama_index.embeddings.openai import OpenAIEmbedding
+import time
+from typing import Dict, Optional
+
 from dotenv import load_dotenv
+from pdf_index.binary_store import BinaryStoreWriter, BinaryVectorStore
+from pdf_index.embedders import get_embedder
+from pdf_index.embedding_cache import CACHE_FILE
+from pdf_index.manifest import IngestManifest, file_sha256
+from pdf_index.pipeline import IngestionPipeline
 
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-
-def build_pdf_index(pdf_dir="pdfs", persist_dir="vectorstore"):
-    documents = SimpleDirectoryReader(pdf_dir).load_data()
-    embed_model = OpenAIEmbedding(model="text-embedding-3-small", api_key=api_key)
-    index = VectorStoreIndex.from_documents(documents, embed_model=embed_model)
-    index.storage_context.persist(persist_dir=persist_dir)
-    print(f"Vector index built and saved to {persist_dir}")
+
+
+def build_pdf_index(pdf_dir="pdfs", persist_dir="vectorstore", incremental=True, embedder=None,
+                    batch_size=100, max_concurrency=4, parse_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Build or update the binary vector store from the PDFs in `pdf_dir`.
+
+    With `incremental=True`, the ingestion manifest is used to skip PDFs whose
+    content hash is unchanged, reuse embeddings for chunks whose hash is already
+    in the store, and drop chunks of PDFs that were deleted. New and changed PDFs
+    go through the parallel `IngestionPipeline`. Returns counts of files and
+    chunks processed plus pipeline throughput.
+    """
+    start_time = time.time()
+    embedder = embedder or get_embedder("openai", cache_path=os.path.join(persist_dir, CACHE_FILE))
+    pdf_paths = {os.path.basename(p): p for p in sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))}
+    current_hashes = {name: file_sha256(path) for name, path in pdf_paths.items()}
+
+    manifest = IngestManifest.load(persist_dir) if incremental else None
+    old_store = None
+    if manifest is not None and manifest.embed_model == embedder.name and BinaryVectorStore.exists(persist_dir):
+        old_store = BinaryVectorStore(persist_dir)
+    else:
+        manifest = IngestManifest(embed_model=embedder.name)
+
+    diff = manifest.diff(current_hashes)
+    stats = {"files_added": len(diff["added"]), "files_changed": len(diff["changed"]),
+             "files_unchanged": len(diff["unchanged"]), "files_removed": len(diff["removed"]),
+             "chunks_embedded": 0, "chunks_skipped": 0}
+
+    if old_store is not None and not (diff["added"] or diff["changed"] or diff["removed"]):
+        old_store.close()
+        print(f"Vector index in {persist_dir} is up to date ({len(diff['unchanged'])} PDFs unchanged)")
+        return stats
+
+    new_manifest = IngestManifest(embed_model=embedder.name)
+
+    def on_file_done(file_name: str, info: Dict):
+        new_manifest.set_file(file_name, current_hashes[file_name], info["chunk_hashes"])
+        status = "changed" if file_name in diff["changed"] else "new"
+        print(f"  {file_name}: {status}, {info['pages']} pages, {info['embedded']} chunks embedded, "
+              f"{info['skipped']} skipped ({info['seconds']:.2f}s)")
+
+    try:
+        with BinaryStoreWriter(persist_dir) as writer:
+            if old_store is not None:
+                for file_name in diff["unchanged"]:
+                    file_start = time.time()
+                    nodes, embeddings = old_store.read_file(file_name)
+                    writer.add(nodes, embeddings)
+                    new_manifest.set_file(file_name, current_hashes[file_name], manifest.files[file_name]["chunks"])
+                    stats["chunks_skipped"] += len(nodes)
+                    print(f"  {file_name}: unchanged, {len(nodes)} chunks skipped ({time.time() - file_start:.2f}s)")
+
+            pipeline = IngestionPipeline(embedder, writer, batch_size=batch_size,
+                                         max_concurrency=max_concurrency, parse_workers=parse_workers)
+            to_parse = [pdf_paths[name] for name in diff["added"] + diff["changed"]]
+            lookup = old_store.embeddings_for_chunks if old_store is not None else None
+            pipeline_stats = pipeline.run(to_parse, lookup_embeddings=lookup, on_file_done=on_file_done)
+
+            for file_name in diff["removed"]:
+                print(f"  {file_name}: removed, {len(manifest.files[file_name]['chunks'])} chunks dropped")
+
+            if old_store is not None:
+                old_store.close()
+                old_store = None
+    finally:
+        if old_store is not None:
+            old_store.close()
+
+    new_manifest.save(persist_dir)
+    stats["chunks_embedded"] += pipeline_stats["chunks_embedded"]
+    stats["chunks_skipped"] += pipeline_stats["chunks_skipped"]
+    stats["pages_parsed"] = pipeline_stats["pages"]
+    stats.update(pipeline.throughput())
+    cache = getattr(embedder, "cache", None)
+    if cache is not None:
+        print(f"Embedding cache: {cache.hits} hits, {cache.misses} misses")
+    print(f"Vector index built and saved to {persist_dir}: {stats['chunks_embedded']} chunks embedded, "
+          f"{stats['chunks_skipped']} skipped in {time.time() - start_time:.2f} seconds "
+          f"({stats['pages_per_second']:.1f} pages/s, {stats['chunks_per_second']:.1f} chunks/s)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or incrementally update the PDF vector index.")
+    parser.add_argument("--pdf-dir", default="pdfs")
+    parser.add_argument("--persist-dir", default="vectorstore")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-embed every PDF")
+    parser.add_argument("--embedder", choices=["openai", "stub"], default="openai",
+                        help="Embedding backend; 'stub' is deterministic and offline, for benchmarking")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-concurrency", type=int, default=4, help="Embedding requests in flight")
+    parser.add_argument("--workers", type=int, default=None, help="PDF parsing processes")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Bypass the on-disk embedding cache")
+    args = parser.parse_args()
+    embedder = get_embedder(args.embedder, cache_path=os.path.join(args.persist_dir, CACHE_FILE),
+                            use_cache=not args.no_embedding_cache)
+    build_pdf_index(pdf_dir=args.pdf_dir, persist_dir=args.persist_dir, incremental=not args.full,
+                    embedder=embedder, batch_size=args.batch_size,
+                    max_concurrency=args.max_concurrency, parse_workers=args.workers)
@@ -1,6 +1,75 @@
-def run_query(con, sql: str):
-    try:
-        result = con.execute(sql).fetchall()
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+import pyarrow as pa
+
+from tracing.tracer import span
+
+DEFAULT_MAX_ROWS = 10_000
+FETCH_BATCH_ROWS = 2048
+PREVIEW_ROWS = 20
+
+
+@dataclass
+class QueryResult:
+    """Result of one SQL execution, fetched as Arrow record batches."""
+    sql: str
+    columns: List[str] = field(default_factory=list)
+    types: List[str] = field(default_factory=list)
+    table: Optional[pa.Table] = None
+    row_count: int = 0
+    truncated: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_df(self):
+        """Materialize the fetched rows as a pandas DataFrame."""
+        return self.table.to_pandas()
+
+    def preview(self, max_rows=PREVIEW_ROWS):
+        """The first `max_rows` rows as a DataFrame, for prompts and logs."""
+        return self.table.slice(0, max_rows).to_pandas()
+
+
+def run_query(con, sql: str, params: Optional[Sequence] = None, max_rows=DEFAULT_MAX_ROWS,
+              batch_size=FETCH_BATCH_ROWS) -> QueryResult:
+    """
+    Execute `sql` once and stream its rows into an Arrow table.
+
+    At most `max_rows` rows are kept; `truncated` is set when the query produced
+    more. Errors are returned on the result rather than raised.
+    """
+    with span("sql.execute", max_rows=max_rows) as s:
+        result = _run_query(con, sql, params, max_rows, batch_size)
+        s.set(rows=result.row_count, truncated=result.truncated, sql_error=result.error)
         return result
+
+
+def _run_query(con, sql: str, params, max_rows: int, batch_size: int) -> QueryResult:
+    try:
+        cursor = con.execute(sql, params) if params else con.execute(sql)
+        columns = [desc[0] for desc in cursor.description]
+        types = [str(desc[1]) for desc in cursor.description]
+
+        to_reader = getattr(cursor, "to_arrow_reader", None) or cursor.fetch_record_batch
+        reader = to_reader(batch_size)
+        batches = []
+        row_count = 0
+        truncated = False
+        for batch in reader:
+            if row_count >= max_rows:
+                truncated = True
+                break
+            if row_count + batch.num_rows > max_rows:
+                batch = batch.slice(0, max_rows - row_count)
+                truncated = True
+            batches.append(batch)
+            row_count += batch.num_rows
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        return QueryResult(sql=sql, columns=columns, types=types, table=table,
+                           row_count=row_count, truncated=truncated)
     except Exception as e:
-        return f"SQL Error: {e}"
+        return QueryResult(sql=sql, error=f"SQL Error: {e}")
@@ -0,0 +1,106 @@
+import re
+from decimal import Decimal
+from typing import Any, List
+
+import pyarrow as pa
+
+from db.rollups import CATEGORY_COLUMNS
+from runner.executor import PREVIEW_ROWS, QueryResult
+
+# Numeric columns are dollar amounts unless a word of their name says otherwise.
+# Whole words only: "ratio" must not match "Site Preparation Costs", nor
+# "year" match "avg_yearly_spent". Spending categories are always dollars.
+NON_CURRENCY_WORDS = {"year", "years", "count", "number", "num", "rank", "id", "n", "rows",
+                      "districts", "pct", "percent", "percentage", "ratio"}
+YEAR_WORDS = {"year", "years"}
+PERCENT_WORDS = {"pct", "percent", "percentage"}
+CURRENCY_COLUMNS = set(CATEGORY_COLUMNS)
+# Amounts at least this large are rounded to whole dollars
+WHOLE_DOLLAR_THRESHOLD = 100
+
+
+def _is_numeric(data_type: pa.DataType) -> bool:
+    return pa.types.is_integer(data_type) or pa.types.is_floating(data_type) or pa.types.is_decimal(data_type)
+
+
+def _name_words(name: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", name.lower()))
+
+
+def is_currency_column(name: str, data_type: pa.DataType) -> bool:
+    if not _is_numeric(data_type):
+        return False
+    return name in CURRENCY_COLUMNS or not _name_words(name) & NON_CURRENCY_WORDS
+
+
+def format_currency(value) -> str:
+    """Format a dollar amount like $1,234,567 (cents are kept only for small amounts)."""
+    value = float(value) if isinstance(value, Decimal) else value
+    sign = "-" if value < 0 else ""
+    value = abs(value)
+    if value >= WHOLE_DOLLAR_THRESHOLD or float(value).is_integer():
+        return f"{sign}${round(value):,}"
+    return f"{sign}${value:,.2f}"
+
+
+def format_value(value: Any, name: str, data_type: pa.DataType) -> str:
+    """Render one cell deterministically, according to its column."""
+    if value is None:
+        return "—"
+    if is_currency_column(name, data_type):
+        return format_currency(value)
+    if _is_numeric(data_type):
+        words = _name_words(name)
+        if words & YEAR_WORDS:
+            return str(int(value))
+        if words & PERCENT_WORDS:
+            return f"{float(value):,.1f}%"
+        if isinstance(value, Decimal):
+            value = int(value) if value == value.to_integral_value() else float(value)
+        if isinstance(value, int):
+            return f"{value:,}"
+        return f"{value:,.2f}"
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def _label(name: str) -> str:
+    return name.replace("_", " ")
+
+
+def _markdown_table(columns: List[str], rows: List[List[str]]) -> str:
+    aligns = ["---:" if numeric else "---" for numeric in _numeric_columns(rows, len(columns))]
+    lines = ["| " + " | ".join(_label(column) for column in columns) + " |", "| " + " | ".join(aligns) + " |"]
+    lines += ["| " + " | ".join(row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def _numeric_columns(rows: List[List[str]], width: int) -> List[bool]:
+    """Right-align columns whose formatted cells all look like numbers."""
+    number = re.compile(r"^-?\$?[\d,]+(\.\d+)?%?$|^—$")
+    return [all(number.match(row[i]) for row in rows) for i in range(width)]
+
+
+def format_query_result(query_result: QueryResult, max_rows=PREVIEW_ROWS) -> str:
+    """
+    Turn a SQL result into exact, readable text without an LLM call.
+
+    A single value becomes "label: value", a single row a short list, and
+    anything larger a markdown table of at most `max_rows` rows. Dollar
+    amounts get a dollar sign and thousands separators; years stay bare.
+    """
+    table = query_result.table
+    schema = table.schema
+    shown = table.slice(0, max_rows).to_pylist()
+    rows = [[format_value(row[field.name], field.name, field.type) for field in schema] for row in shown]
+    columns = [field.name for field in schema]
+
+    if query_result.row_count == 1 and len(columns) == 1:
+        return f"{_label(columns[0])}: {rows[0][0]}"
+    if query_result.row_count == 1:
+        return "\n".join(f"- {_label(name)}: {value}" for name, value in zip(columns, rows[0]))
+
+    text = _markdown_table(columns, rows)
+    if query_result.row_count > max_rows or query_result.truncated:
+        total = f"{query_result.row_count}+" if query_result.truncated else str(query_result.row_count)
+        text += f"\n\n(showing {len(rows)} of {total} rows)"
+    return text
@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from llm.agent import TIFAgent
+from llm.resources import AgentResources
+from llm.tool_cache import DEFAULT_TTL_SECONDS, ToolResultCache
+
+load_dotenv()
+
+MAX_BODY_BYTES = 1 << 20
+
+
+class Session:
+    """One user's conversation: its own agent history, sharing the server's resources."""
+
+    def __init__(self, session_id: str, agent: TIFAgent):
+        self.session_id = session_id
+        self.agent = agent
+        self.lock = asyncio.Lock()  # One question at a time per session keeps the history consistent
+        self.last_used = time.time()
+
+
+class AgentServer:
+    """
+    Asyncio HTTP/JSON front end serving many agent sessions at once.
+
+    All sessions share one `AgentResources` (vector index, DuckDB cursor pool,
+    LLM client). Agent turns run on a bounded thread pool; at most
+    `max_concurrency` run at a time and at most `max_pending` more may wait,
+    beyond which requests are rejected with 503 so clients back off.
+
+    Endpoints:
+        POST /query            {"question": ..., "session_id": optional} -> {"session_id", "answer", "seconds"}
+        DELETE /session/<id>   end a session
+        GET /health            load and session counts
+    """
+
+    def __init__(self, resources: AgentResources, max_concurrency=8, max_pending=32, max_sessions=1000,
+                 session_ttl=3600, llm_humanizer=False):
+        self.resources = resources
+        self.llm_humanizer = llm_humanizer
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.sessions: Dict[str, Session] = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.stats = {"requests": 0, "rejected": 0, "errors": 0}
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._running = 0
+
+    def _get_session(self, session_id: Optional[str]) -> Session:
+        self._expire_sessions()
+        if session_id and session_id in self.sessions:
+            session = self.sessions[session_id]
+        else:
+            if len(self.sessions) >= self.max_sessions:
+                oldest = min(self.sessions.values(), key=lambda s: s.last_used)
+                del self.sessions[oldest.session_id]
+            session_id = session_id or uuid.uuid4().hex
+            session = Session(session_id, TIFAgent(self.resources.client, resources=self.resources,
+                                                  llm_humanizer=self.llm_humanizer, session_id=session_id))
+            self.sessions[session_id] = session
+        session.last_used = time.time()
+        return session
+
+    def _expire_sessions(self):
+        cutoff = time.time() - self.session_ttl
+        for session_id in [s.session_id for s in self.sessions.values() if s.last_used < cutoff]:
+            del self.sessions[session_id]
+
+    async def handle_query(self, payload: Dict) -> Tuple[int, Dict]:
+        question = (payload.get("question") or "").strip()
+        if not question:
+            return 400, {"error": "Missing 'question'"}
+        if self._waiting + self._running >= self.max_concurrency + self.max_pending:
+            self.stats["rejected"] += 1
+            return 503, {"error": "Server busy, retry later"}
+
+        session = self._get_session(payload.get("session_id"))
+        self._waiting += 1
+        acquired = False
+        try:
+            async with session.lock, self._slots:
+                self._waiting -= 1
+                acquired = True
+                self._running += 1
+                try:
+                    start_time = time.time()
+                    loop = asyncio.get_running_loop()
+                    answer = await loop.run_in_executor(self.executor, session.agent.process_query, question)
+                    return 200, {"session_id": session.session_id, "answer": answer,
+                                 "seconds": round(time.time() - start_time, 3)}
+                finally:
+                    self._running -= 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            return 500, {"error": str(e)}
+        finally:
+            if not acquired:  # Cancelled while queued
+                self._waiting -= 1
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        self.stats["requests"] += 1
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "sessions": len(self.sessions), "running": self._running,
+                         "waiting": self._waiting, **self.stats, "tool_cache": self.resources.tool_cache.summary()}
+        if method == "POST" and path == "/query":
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                return 400, {"error": "Body must be JSON"}
+            return await self.handle_query(payload)
+        if method == "DELETE" and path.startswith("/session/"):
+            removed = self.sessions.pop(path[len("/session/"):], None)
+            return (200, {"deleted": True}) if removed else (404, {"error": "Unknown session"})
+        return 404, {"error": f"No route for {method} {path}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", "0") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, response = await self.route(method.upper(), path.split("?", 1)[0], body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, response, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive=True):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                   500: "Internal Server Error", 503: "Service Unavailable"}
+        body = json.dumps(payload).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"TIF agent server listening on http://{host}:{port} "
+              f"(max {self.max_concurrency} concurrent, {self.max_pending} pending)")
+        async with server:
+            await server.serve_forever()
+
+
+def build_resources(fake_llm=False, persist_dir="vectorstore", chat_latency=0.0, max_db_cursors=8,
+                    max_parallel_tools=4, max_connections=32, tool_cache_ttl=DEFAULT_TTL_SECONDS) -> AgentResources:
+    """
+    Create the shared resources, with either the real OpenAI backend or the
+    offline fake. Chat, embedding and PDF synthesis requests share one pool of
+    `max_connections` HTTP connections.
+    """
+    tool_cache = ToolResultCache(ttl=tool_cache_ttl)
+    if fake_llm:
+        from llm.fake_client import FakeOpenAIClient, FakeSynthesizer
+        from pdf_index.embedders import get_embedder
+        from pdf_index.embedding_cache import CACHE_FILE
+
+        client = FakeOpenAIClient(chat_latency=chat_latency)
+        embedder = get_embedder("stub", cache_path=os.path.join(persist_dir, CACHE_FILE))
+        return AgentResources(client, persist_dir=persist_dir, embedder=embedder,
+                              synthesizer=FakeSynthesizer(latency=chat_latency), max_db_cursors=max_db_cursors,
+                              max_parallel_tools=max_parallel_tools, tool_cache=tool_cache)
+
+    import httpx
+    import openai
+
+    # One pooled HTTP client shared by every session and every OpenAI caller
+    http_client = httpx.Client(limits=httpx.Limits(max_connections=max_connections,
+                                                   max_keepalive_connections=max_connections))
+    client = openai.OpenAI(http_client=http_client)
+    return AgentResources(client, persist_dir=persist_dir, max_db_cursors=max_db_cursors,
+                          max_parallel_tools=max_parallel_tools, tool_cache=tool_cache, http_client=http_client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the TIF agent over HTTP/JSON to many concurrent sessions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--persist-dir", default="vectorstore")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Agent turns running at once")
+    parser.add_argument("--max-pending", type=int, default=32, help="Queued requests before returning 503")
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--db-cursors", type=int, default=8, help="DuckDB cursors shared by all sessions")
+    parser.add_argument("--tool-cache-ttl", type=float, default=DEFAULT_TTL_SECONDS,
+                        help="Seconds SQL and PDF tool results are shared across sessions (0 to only coalesce)")
+    parser.add_argument("--llm-humanizer", action="store_true",
+                        help="Have an LLM rewrite SQL results as prose instead of formatting them locally")
+    parser.add_argument("--fake-llm", action="store_true",
+                        help="Use the offline fake LLM and stub embedder (needs an index built with --embedder stub)")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Simulated seconds per fake LLM call")
+    args = parser.parse_args()
+
+    resources = build_resources(fake_llm=args.fake_llm, persist_dir=args.persist_dir,
+                                chat_latency=args.fake_latency, max_db_cursors=args.db_cursors,
+                                max_parallel_tools=max(4, args.max_concurrency), tool_cache_ttl=args.tool_cache_ttl)
+    # Listen right away; the database and index load in the background and early requests wait for them
+    resources.start_warm_up()
+    server = AgentServer(resources, max_concurrency=args.max_concurrency, max_pending=args.max_pending,
+                         max_sessions=args.max_sessions, llm_humanizer=args.llm_humanizer)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        resources.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import pytest
+
+from pdf_index.binary_store import BinaryStoreWriter
+from pdf_index.embedders import StubEmbedder
+
+# A handful of report chunks across two districts and two years
+REPORT_CHUNKS = {
+    "Kinzie_2022.pdf": [
+        "Kinzie industrial corridor goals for 2022 include job training and site preparation.",
+        "The Kinzie district funded new sewer lines and street resurfacing.",
+    ],
+    "Kinzie_2023.pdf": [
+        "In 2023 Kinzie spent on public works and the Fulton Market streetscape.",
+        "Kinzie planned two new Green Line station entrances.",
+    ],
+    "LaSalle_2023.pdf": [
+        "LaSalle Central supported office to residential conversions downtown.",
+        "LaSalle financed the Red Line extension design studies.",
+    ],
+}
+
+
+def write_store(store_dir, chunks=REPORT_CHUNKS, embedder=None):
+    """Build a binary store in `store_dir` from {file name: [chunk text]}, embedded with the stub backend."""
+    embedder = embedder or StubEmbedder()
+    with BinaryStoreWriter(str(store_dir)) as writer:
+        for file_name, texts in chunks.items():
+            nodes = [
+                {"node_id": f"{file_name}-{i}", "text": text, "metadata": {"file_name": file_name},
+                 "chunk_hash": f"{file_name}-{i}"}
+                for i, text in enumerate(texts)
+            ]
+            writer.add(nodes, embedder.embed(texts))
+    return store_dir
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    return write_store(tmp_path / "vectorstore")
+
+
+@pytest.fixture
+def expenditures_csv(tmp_path):
+    from bench.synthetic_data import generate_expenditures_csv
+
+    # Kinzie, LaSalle, Pilsen, Bronzeville, Englewood, Midway, Austin and Calumet, 2000-2023
+    return generate_expenditures_csv(str(tmp_path / "data" / "tif_expenditures.csv"), rows=192)
+
+
+@pytest.fixture
+def expenditures_db(tmp_path, expenditures_csv):
+    from db.init_duckdb import sync_expenditures_table
+
+    db_path = str(tmp_path / "tif.duckdb")
+    sync_expenditures_table(expenditures_csv, db_path)
+    return db_path
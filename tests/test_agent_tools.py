@@ -0,0 +1,116 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from llm.agent import TIFAgent
+from llm.resources import AgentResources
+
+
+def _chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+def _tool_call(index, call_id, name, arguments):
+    return SimpleNamespace(index=index, id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class ScriptedClient:
+    """Requests the given tool calls in the first turn, then answers; records every request."""
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, **kwargs):
+        self.requests.append([dict(m) if isinstance(m, dict) else m for m in messages])
+        if len(self.requests) == 1:
+            return iter([_chunk(tool_calls=[_tool_call(i, *call) for i, call in enumerate(self.calls)])])
+        return iter([_chunk(content="Done.")])
+
+
+@pytest.fixture
+def make_agent():
+    agents = []
+
+    def make(calls):
+        client = ScriptedClient(calls)
+        agent = TIFAgent(client, resources=AgentResources(client=client))
+        agents.append(agent)
+        return agent, client
+
+    yield make
+    for agent in agents:
+        agent.resources.tool_pool.shutdown()
+
+
+def _tool_messages(messages):
+    return {m["tool_call_id"]: m["content"] for m in messages if isinstance(m, dict) and m.get("role") == "tool"}
+
+
+def test_failing_call_still_answers_every_tool_call(make_agent, monkeypatch):
+    agent, client = make_agent([
+        ("call_bad", "query_sql_database", "{not json"),
+        ("call_ok", "get_schema_info", "{}"),
+        ("call_boom", "get_schema_info", '{"fail": true}'),
+    ])
+
+    def execute(function_name, function_args, emit=None):
+        if "fail" in function_args:
+            raise RuntimeError("database is locked")
+        return "schema text"
+
+    monkeypatch.setattr(agent, "_execute_function", execute)
+    assert agent.process_query("How much did Kinzie spend?").startswith("Done.")
+
+    results = _tool_messages(client.requests[1])
+    assert set(results) == {"call_bad", "call_ok", "call_boom"}
+    assert results["call_ok"] == "schema text"
+    assert results["call_bad"].startswith("Error running query_sql_database")
+    assert results["call_boom"] == "Error running get_schema_info: database is locked"
+
+
+def test_tool_output_is_streamed_before_results(make_agent, monkeypatch):
+    agent, _ = make_agent([("call_1", "get_schema_info", "{}"), ("call_2", "get_schema_info", "{}")])
+    started = threading.Barrier(2, timeout=5)
+
+    def execute(function_name, function_args, emit=None):
+        started.wait()  # both calls run at once
+        for piece in ("part 1 ", "part 2"):
+            emit(piece)
+        return "part 1 part 2"
+
+    monkeypatch.setattr(agent, "_execute_function", execute)
+    events = list(agent.stream_query("Describe the schema"))
+    deltas = [e["text"] for e in events if e["type"] == "tool_delta"]
+    assert deltas.count("part 1 ") == 2 and deltas.count("part 2") == 2
+    assert events[-1]["type"] == "done"
+
+
+def test_abandoned_stream_leaves_no_unanswered_tool_call(make_agent, monkeypatch):
+    agent, client = make_agent([("call_1", "get_schema_info", "{}")])
+    monkeypatch.setattr(agent, "_execute_function", lambda name, args, emit=None: "schema text")
+
+    stream = agent.stream_query("Describe the schema")
+    assert next(stream)["type"] == "status"  # the tool call has been requested
+    stream.close()
+    assert not any(m.get("tool_calls") for m in agent.conversation_history if isinstance(m, dict))
+
+    # The session still works: the next request carries a well-formed history
+    assert agent.process_query("Describe the schema again").startswith("Done.")
+    _assert_every_tool_call_answered(client.requests[-1])
+
+
+def _assert_every_tool_call_answered(messages):
+    pending = set()
+    for message in messages:
+        if not isinstance(message, dict):
+            continue
+        if message.get("role") == "tool":
+            pending.discard(message["tool_call_id"])
+        else:
+            assert not pending
+            pending.update(call["id"] for call in message.get("tool_calls") or [])
+    assert not pending
@@ -0,0 +1,30 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from bench.run_benchmarks import prepare_data
+
+ARGS = SimpleNamespace(rows=20, reports=1, pages=1, seed=0)
+
+
+def test_refuses_unmarked_non_empty_workdir(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "tif_expenditures.csv").write_text("real data")
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError, match="not empty"):
+        prepare_data(ARGS)
+    assert (tmp_path / "data" / "tif_expenditures.csv").read_text() == "real data"
+
+
+def test_generates_into_empty_workdir_and_regenerates_marked_one(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    prepare_data(ARGS)
+    assert json.loads((tmp_path / "bench_data.json").read_text())["rows"] == 20
+    assert (tmp_path / "data" / "tif_expenditures.csv").exists()
+    assert list((tmp_path / "pdfs").glob("*.pdf"))
+
+    (tmp_path / "vectorstore").mkdir()
+    prepare_data(SimpleNamespace(rows=30, reports=1, pages=1, seed=0))
+    assert json.loads((tmp_path / "bench_data.json").read_text())["rows"] == 30
+    assert not (tmp_path / "vectorstore").exists()
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+
+from pdf_index.binary_store import BinaryStoreWriter, BinaryVectorStore, convert_persisted_store
+from pdf_index.embedders import StubEmbedder
+
+
+def test_search_returns_nearest_chunks(store_dir):
+    store = BinaryVectorStore(str(store_dir))
+    query = StubEmbedder().embed(["LaSalle financed the Red Line extension design studies."])[0]
+    row_ids, scores = store.search(query, top_k=2)
+    assert store.get_nodes(row_ids[:1])[0].text.startswith("LaSalle financed")
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert scores[0] >= scores[1]
+    store.close()
+
+
+def test_filters_and_metadata_come_from_file_names(store_dir):
+    store = BinaryVectorStore(str(store_dir))
+    assert store.districts() == ["Kinzie", "LaSalle"]
+    assert store.years() == [2022, 2023]
+    rows = store.filter_rows(["Kinzie"], [2023])
+    assert [n.metadata["file_name"] for n in store.get_nodes(rows)] == ["Kinzie_2023.pdf"] * 2
+    assert store.filter_rows() is None
+    store.close()
+
+
+def test_search_within_candidate_rows(store_dir):
+    store = BinaryVectorStore(str(store_dir))
+    rows = store.filter_rows(["LaSalle"])
+    query = StubEmbedder().embed(["Kinzie sewer lines"])[0]
+    row_ids, _ = store.search(query, top_k=10, rows=rows)
+    assert sorted(row_ids.tolist()) == rows.tolist()
+    store.close()
+
+
+def test_get_nodes_preserves_requested_order(store_dir):
+    store = BinaryVectorStore(str(store_dir))
+    assert [n.id_ for n in store.get_nodes([3, 0])] == ["Kinzie_2023.pdf-1", "Kinzie_2022.pdf-0"]
+    store.close()
+
+
+def test_writer_rejects_mismatched_dimensions(tmp_path):
+    with pytest.raises(ValueError):
+        with BinaryStoreWriter(str(tmp_path)) as writer:
+            writer.add([{"node_id": "a", "text": "a"}], [[1.0, 0.0]])
+            writer.add([{"node_id": "b", "text": "b"}], [[1.0, 0.0, 0.0]])
+    assert not BinaryVectorStore.exists(str(tmp_path))
+
+
+def _write_json_store(persist_dir, embeddings):
+    persist_dir.mkdir()
+    docstore = {"docstore/data": {
+        node_id: {"__data__": {"text": f"chunk {node_id}", "metadata": {"file_name": "Kinzie_2022.pdf"}}}
+        for node_id in ["n1", "n2"]
+    }}
+    (persist_dir / "docstore.json").write_text(json.dumps(docstore))
+    if embeddings is not None:
+        (persist_dir / "default__vector_store.json").write_text(json.dumps({"embedding_dict": embeddings}))
+
+
+def test_convert_persisted_store(tmp_path):
+    persist_dir = tmp_path / "json_store"
+    _write_json_store(persist_dir, {"n1": [1.0, 0.0], "n2": [0.0, 2.0]})
+    assert convert_persisted_store(str(persist_dir)) == 2
+    store = BinaryVectorStore(str(persist_dir))
+    np.testing.assert_allclose(store.embeddings[1], [0.0, 1.0])
+    assert store.districts() == ["Kinzie"]
+    store.close()
+
+
+def test_convert_refuses_store_without_vectors(tmp_path):
+    persist_dir = tmp_path / "json_store"
+    _write_json_store(persist_dir, None)
+    with pytest.raises(ValueError, match="No embeddings"):
+        convert_persisted_store(str(persist_dir))
+    assert not BinaryVectorStore.exists(str(persist_dir))
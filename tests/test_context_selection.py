@@ -0,0 +1,55 @@
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from pdf_index.context_selection import count_tokens, select_context
+from pdf_index.keyword_index import reciprocal_rank_fusion
+
+
+def _nodes(scores, texts=None):
+    texts = texts or {}
+    return [
+        NodeWithScore(node=TextNode(id_=name, text=texts.get(name, f"Distinct chunk {name} about topic {name}.")),
+                      score=score)
+        for name, score in scores.items()
+    ]
+
+
+def _fused(vector_ranking, keyword_ranking):
+    return reciprocal_rank_fusion([vector_ranking, keyword_ranking])
+
+
+def test_strong_keyword_only_hit_survives():
+    # "top" is first for both retrievers; "bm25" is second for BM25 only
+    vector = ["top"] + [f"v{i}" for i in range(1, 20)]
+    keyword = ["top", "bm25"] + [f"k{i}" for i in range(2, 20)]
+    selected, _ = select_context(_nodes(_fused(vector, keyword)))
+    ids = [n.node.id_ for n in selected]
+    assert ids[0] == "top"
+    assert "bm25" in ids
+    assert "v1" in ids  # likewise the best vector-only hit
+
+
+def test_weak_single_retriever_tail_is_cut():
+    vector = ["top"] + [f"v{i}" for i in range(1, 60)]
+    keyword = ["top"]
+    selected, stats = select_context(_nodes(_fused(vector, keyword)), token_budget=100_000)
+    ids = {n.node.id_ for n in selected}
+    assert "v2" in ids
+    assert "v55" not in ids
+    assert stats["cut_by_score"] > 0
+
+
+def test_near_duplicate_boilerplate_is_collapsed():
+    boilerplate = "The TIF annual report is prepared under the Tax Increment Allocation Redevelopment Act " * 3
+    nodes = _nodes({"a": 0.9, "b": 0.85, "c": 0.8}, texts={"a": boilerplate, "b": boilerplate + " Page 2."})
+    selected, stats = select_context(nodes)
+    assert [n.node.id_ for n in selected] == ["a", "c"]
+    assert stats["duplicates"] == 1
+
+
+def test_token_budget_keeps_at_least_one_chunk():
+    long_text = "spending " * 500
+    nodes = _nodes({"a": 0.9, "b": 0.89}, texts={"a": long_text, "b": "short " + long_text})
+    selected, stats = select_context(nodes, token_budget=10)
+    assert [n.node.id_ for n in selected] == ["a"]
+    assert stats["cut_by_budget"] == 1
+    assert stats["tokens"] == count_tokens(selected[0].node.get_content())
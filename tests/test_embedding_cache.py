@@ -0,0 +1,76 @@
+import sqlite3
+import time
+
+from pdf_index import embedding_cache
+from pdf_index.embedding_cache import CachedEmbedder, EmbeddingCache
+from pdf_index.embedders import StubEmbedder
+
+
+def _statements(cache):
+    statements = []
+    cache._con.set_trace_callback(statements.append)
+    return statements
+
+
+def _last_used(path):
+    con = sqlite3.connect(path)
+    rows = dict(con.execute("SELECT text_hash, last_used FROM embeddings").fetchall())
+    con.close()
+    return rows
+
+
+def test_cached_embedder_only_embeds_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    embedder = CachedEmbedder(StubEmbedder(), cache)
+    first = embedder.embed(["kinzie goals", "lasalle  goals"])
+    second = embedder.embed(["kinzie goals", "lasalle goals", "new text"])
+    assert second[:2] == first
+    assert cache.stats() == {"hits": 2, "misses": 3}
+    cache.close()
+
+
+def test_hits_do_not_write_until_a_batch_is_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "TOUCH_BATCH_SIZE", 3)
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    statements = _statements(cache)
+    cache.get_many("m", ["a"])
+    cache.get_many("m", ["b"])
+    assert not [s for s in statements if s.startswith(("UPDATE", "COMMIT"))]
+    cache.get_many("m", ["c"])
+    assert sum(s.startswith("UPDATE") for s in statements) == 3
+    cache.close()
+
+
+def test_puts_below_the_limit_do_not_count_rows(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=10)
+    statements = _statements(cache)
+    for i in range(5):
+        cache.put_many("m", [f"text {i}"], [[float(i)]])
+    assert not [s for s in statements if "COUNT(*)" in s]
+    cache.close()
+
+
+def test_eviction_keeps_recently_used_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path, max_entries=3)
+    for i, text in enumerate(["a", "b", "c"]):
+        cache.put_many("m", [text], [[float(i)]])
+        time.sleep(0.01)
+    cache.get_many("m", ["a"])  # buffered touch must be flushed before evicting
+    cache.put_many("m", ["d"], [[4.0]])
+    assert set(cache.get_many("m", ["a", "b", "c", "d"])) == {
+        embedding_cache.text_hash(t) for t in ["a", "c", "d"]}
+    cache.close()
+    assert len(_last_used(path)) == 3
+
+
+def test_close_writes_buffered_touches(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path)
+    cache.put_many("m", ["a"], [[1.0]])
+    before = _last_used(path)
+    time.sleep(0.01)
+    cache.get_many("m", ["a"])
+    cache.close()
+    assert _last_used(path)[embedding_cache.text_hash("a")] > before[embedding_cache.text_hash("a")]
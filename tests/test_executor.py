@@ -0,0 +1,47 @@
+import duckdb
+import pytest
+
+from runner.executor import run_query
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE t AS SELECT range AS n, 'row ' || range AS label FROM range(5000)")
+    yield con
+    con.close()
+
+
+def test_small_result_is_complete(con):
+    result = run_query(con, "SELECT n, label FROM t WHERE n < ? ORDER BY n", [3])
+    assert result.ok
+    assert result.columns == ["n", "label"]
+    assert result.row_count == 3
+    assert not result.truncated
+    assert result.to_df()["label"].tolist() == ["row 0", "row 1", "row 2"]
+
+
+def test_rows_are_capped_mid_batch(con):
+    result = run_query(con, "SELECT n FROM t ORDER BY n", max_rows=150, batch_size=100)
+    assert result.row_count == 150
+    assert result.truncated
+    assert result.to_df()["n"].tolist() == list(range(150))
+
+
+def test_cap_on_a_batch_boundary(con):
+    exact = run_query(con, "SELECT n FROM t WHERE n < 200", max_rows=200, batch_size=100)
+    assert exact.row_count == 200 and not exact.truncated
+    more = run_query(con, "SELECT n FROM t WHERE n < 201", max_rows=200, batch_size=100)
+    assert more.row_count == 200 and more.truncated
+
+
+def test_preview_is_limited(con):
+    result = run_query(con, "SELECT n FROM t")
+    assert len(result.preview(max_rows=5)) == 5
+
+
+def test_errors_are_returned_not_raised(con):
+    result = run_query(con, "SELECT missing_column FROM t")
+    assert not result.ok
+    assert result.error.startswith("SQL Error:")
+    assert result.table is None
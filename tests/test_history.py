@@ -0,0 +1,70 @@
+from llm.history import ConversationHistory, summarize_text
+
+LONG_RESULT = " ".join(f"Row {i}: Kinzie spent ${i * 1000:,} on public works in {2000 + i % 24}." for i in range(200))
+
+
+def _turn(history, question, call_id):
+    history.append({"role": "user", "content": question})
+    history.append({"role": "assistant", "content": "", "tool_calls": [
+        {"id": call_id, "type": "function", "function": {"name": "query_sql_database", "arguments": "{}"}}]})
+    history.append({"role": "tool", "tool_call_id": call_id, "content": LONG_RESULT})
+    history.append({"role": "assistant", "content": "Kinzie spent a lot. " + LONG_RESULT})
+
+
+def _assert_tool_messages_follow_their_calls(messages):
+    requested = set()
+    for message in messages:
+        for call in message.get("tool_calls") or []:
+            requested.add(call["id"])
+        if message["role"] == "tool":
+            assert message["tool_call_id"] in requested
+
+
+def test_summarize_text_keeps_leading_sentences():
+    summary = summarize_text(LONG_RESULT, max_tokens=30)
+    assert summary.startswith("Row 0: Kinzie spent $0 on public works in 2000.")
+    assert "compacted, originally" in summary
+    assert summarize_text("Short.", max_tokens=30) == "Short."
+
+
+def test_within_budget_nothing_changes():
+    history = ConversationHistory("system", token_budget=100_000)
+    _turn(history, "q1", "c1")
+    before = [dict(m) for m in history.messages]
+    history.compact()
+    assert history.messages == before
+
+
+def test_old_tool_results_are_compacted_first():
+    history = ConversationHistory("system", token_budget=14000)
+    for i in range(3):
+        _turn(history, f"question {i}", f"c{i}")
+    history.compact()
+    assert history.total_tokens <= 14000
+    assert "compacted" in history.messages[3]["content"]  # first turn's tool result
+    assert "compacted" not in history.messages[4]["content"]  # its answer wasn't needed
+    assert history.messages[-2]["content"] == LONG_RESULT  # recent turns stay verbatim
+    assert history.stats["dropped_turns"] == 0
+
+
+def test_turns_are_dropped_whole_with_a_note():
+    history = ConversationHistory("system", token_budget=4500)
+    for i in range(5):
+        _turn(history, f"question {i}", f"c{i}")
+    history.compact()
+    assert history.stats["dropped_turns"] > 0
+    assert history.messages[1]["role"] == "system"
+    assert "question 0" in history.messages[1]["content"]
+    assert [m["content"] for m in history.messages if m["role"] == "user"][-2:] == ["question 3", "question 4"]
+    _assert_tool_messages_follow_their_calls(history.messages)
+    assert history.total_tokens == sum(history._tokens)
+
+
+def test_tokens_saved_is_net_of_the_earlier_note():
+    history = ConversationHistory("system", token_budget=4500)
+    for i in range(5):
+        _turn(history, f"question {i}", f"c{i}")
+    before = history.total_tokens
+    history.compact()
+    assert history.stats["dropped_turns"] > 1  # the note was rewritten at least once
+    assert history.stats["tokens_saved"] == before - history.total_tokens
@@ -0,0 +1,65 @@
+import os
+
+import duckdb
+import pytest
+
+from db.init_duckdb import (TABLE_NAME, get_data_version, load_expenditures_table, sync_expenditures_table,
+                            _file_sha256)
+
+
+def _count(db_path):
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        return con.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+    finally:
+        con.close()
+
+
+def test_first_sync_loads_the_csv(tmp_path, expenditures_csv):
+    db_path = str(tmp_path / "tif.duckdb")
+    assert sync_expenditures_table(expenditures_csv, db_path)
+    assert _count(db_path) == 192
+
+
+def test_unchanged_csv_is_not_reloaded(expenditures_db, expenditures_csv):
+    assert not sync_expenditures_table(expenditures_csv, expenditures_db)
+
+
+def test_touched_csv_is_hashed_but_not_reloaded(expenditures_db, expenditures_csv):
+    stat = os.stat(expenditures_csv)
+    os.utime(expenditures_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not sync_expenditures_table(expenditures_csv, expenditures_db)
+    con = duckdb.connect(expenditures_db, read_only=True)
+    mtime_ns = con.execute("SELECT mtime_ns FROM _sources WHERE table_name = ?", [TABLE_NAME]).fetchone()[0]
+    con.close()
+    assert mtime_ns == os.stat(expenditures_csv).st_mtime_ns
+
+
+def test_modified_csv_is_reloaded(expenditures_db, expenditures_csv):
+    with open(expenditures_csv) as f:
+        lines = f.readlines()
+    with open(expenditures_csv, "w") as f:
+        f.writelines(lines[:-10])
+    assert sync_expenditures_table(expenditures_csv, expenditures_db)
+    assert _count(expenditures_db) == 182
+    con = duckdb.connect(expenditures_db, read_only=True)
+    assert get_data_version(con) == _file_sha256(expenditures_csv)
+    con.close()
+
+
+def test_missing_csv_falls_back_to_existing_table(expenditures_db, expenditures_csv):
+    os.remove(expenditures_csv)
+    assert not sync_expenditures_table(expenditures_csv, expenditures_db)
+    assert _count(expenditures_db) == 192
+
+
+def test_missing_csv_without_table_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        sync_expenditures_table(str(tmp_path / "missing.csv"), str(tmp_path / "tif.duckdb"))
+
+
+def test_load_returns_read_only_connection(expenditures_db, expenditures_csv):
+    con = load_expenditures_table(expenditures_csv, expenditures_db)
+    with pytest.raises(duckdb.Error):
+        con.execute(f"DELETE FROM {TABLE_NAME}")
+    con.close()
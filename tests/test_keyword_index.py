@@ -0,0 +1,38 @@
+import pytest
+
+from pdf_index.binary_store import BinaryVectorStore
+from pdf_index.keyword_index import reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize("What are the Red-Line goals of a TIF in 2023?") == ["red", "line", "goals", "tif", "2023"]
+
+
+def test_bm25_ranks_exact_terms_first(store_dir):
+    store = BinaryVectorStore(str(store_dir))
+    hits = store.keyword_search("sewer resurfacing")
+    assert [n.id_ for n in store.get_nodes([hits[0][0]])] == ["Kinzie_2022.pdf-1"]
+    assert len(hits) == 1
+    store.close()
+
+
+def test_bm25_respects_district_and_year_filter(store_dir):
+    store = BinaryVectorStore(str(store_dir))
+    hits = store.keyword_search("Kinzie LaSalle line", districts=["LaSalle"], years=[2023])
+    files = {n.metadata["file_name"] for n in store.get_nodes([row_id for row_id, _ in hits])}
+    assert files == {"LaSalle_2023.pdf"}
+    store.close()
+
+
+def test_bm25_without_query_terms_returns_nothing(store_dir):
+    store = BinaryVectorStore(str(store_dir))
+    assert store.keyword_search("what is the") == []
+    store.close()
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert fused[1] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[3] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[2] == pytest.approx(1 / 62)
+    assert sorted(fused, key=lambda r: -fused[r]) == [1, 3, 2]
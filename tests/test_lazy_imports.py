@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("openai", "llama_index")
+
+
+@pytest.mark.parametrize("module", ["app", "llm.agent"])
+def test_import_does_not_load_llm_sdks(module, tmp_path):
+    code = (f"import sys, {module}\n"
+            "print(sorted({name.split('.')[0] for name in sys.modules} & set(sys.argv[1:])))")
+    out = subprocess.run([sys.executable, "-c", code, *HEAVY_MODULES], cwd=tmp_path,
+                         env={**os.environ, "PYTHONPATH": REPO_ROOT}, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,34 @@
+import json
+
+from pdf_index.manifest import MANIFEST_FILE, IngestManifest, chunk_hash, file_sha256
+
+
+def test_diff_classifies_files():
+    manifest = IngestManifest("model")
+    manifest.set_file("kept.pdf", "a", [])
+    manifest.set_file("edited.pdf", "b", [])
+    manifest.set_file("deleted.pdf", "c", [])
+    diff = manifest.diff({"kept.pdf": "a", "edited.pdf": "b2", "new.pdf": "d"})
+    assert diff == {"added": ["new.pdf"], "changed": ["edited.pdf"], "unchanged": ["kept.pdf"],
+                    "removed": ["deleted.pdf"]}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    manifest = IngestManifest("text-embedding-3-small")
+    manifest.set_file("Kinzie_2022.pdf", "abc", [chunk_hash("one"), chunk_hash("two")])
+    manifest.save(str(tmp_path))
+    loaded = IngestManifest.load(str(tmp_path))
+    assert loaded.embed_model == "text-embedding-3-small"
+    assert loaded.files == manifest.files
+
+
+def test_load_ignores_missing_or_outdated_manifest(tmp_path):
+    assert IngestManifest.load(str(tmp_path)) is None
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps({"version": 0, "embed_model": "m", "files": {}}))
+    assert IngestManifest.load(str(tmp_path)) is None
+
+
+def test_file_sha256_reads_in_blocks(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"x" * 10)
+    assert file_sha256(str(path), block_size=3) == file_sha256(str(path))
@@ -0,0 +1,105 @@
+import threading
+import time
+
+from llama_index.core.node_parser import SentenceSplitter
+
+from bench.synthetic_data import write_text_pdf
+from pdf_index.binary_store import BinaryVectorStore
+from pdf_index.embedders import StubEmbedder
+from pdf_index.manifest import IngestManifest
+from pdf_index.vector_index import build_pdf_index
+
+
+class ReversingEmbedder(StubEmbedder):
+    """Finishes earlier batches last, so out-of-order writes would show up in the store."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed(self, texts):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, 0.05 - 0.01 * self.calls)
+        time.sleep(delay)
+        return super().embed(texts)
+
+
+def _page(name, page):
+    return [f"{name} report page {page} line {line} describes streetscape and transit work." for line in range(30)]
+
+
+def _write_pdfs(pdf_dir, names, pages=4):
+    pdf_dir.mkdir(exist_ok=True)
+    for name in names:
+        write_text_pdf(str(pdf_dir / f"{name}.pdf"), [_page(name, page) for page in range(1, pages + 1)])
+
+
+def _build(pdf_dir, persist_dir, embedder=None, incremental=True):
+    return build_pdf_index(pdf_dir=str(pdf_dir), persist_dir=str(persist_dir), incremental=incremental,
+                           embedder=embedder or ReversingEmbedder(), batch_size=2, max_concurrency=4,
+                           parse_workers=1)
+
+
+def _page_labels(persist_dir, file_name):
+    store = BinaryVectorStore(str(persist_dir))
+    nodes, embeddings = store.read_file(file_name)
+    store.close()
+    return [int(n["metadata"]["page_label"]) for n in nodes], embeddings
+
+
+def _use_small_chunks(monkeypatch):
+    original = SentenceSplitter.__init__
+
+    def init(self, *args, **kwargs):
+        kwargs.setdefault("chunk_size", 128)
+        kwargs.setdefault("chunk_overlap", 0)
+        original(self, *args, **kwargs)
+
+    monkeypatch.setattr(SentenceSplitter, "__init__", init)
+
+
+def test_chunks_are_stored_in_page_order(tmp_path, monkeypatch):
+    _use_small_chunks(monkeypatch)
+    pdf_dir, persist_dir = tmp_path / "pdfs", tmp_path / "vectorstore"
+    _write_pdfs(pdf_dir, ["Kinzie_2022", "LaSalle_2023"])
+    stats = _build(pdf_dir, persist_dir)
+    assert stats["files_added"] == 2
+    for file_name in ("Kinzie_2022.pdf", "LaSalle_2023.pdf"):
+        labels, _ = _page_labels(persist_dir, file_name)
+        assert len(labels) > 4
+        assert labels == sorted(labels)
+
+
+def test_incremental_build_reuses_embeddings_in_order(tmp_path, monkeypatch):
+    _use_small_chunks(monkeypatch)
+    pdf_dir, persist_dir = tmp_path / "pdfs", tmp_path / "vectorstore"
+    _write_pdfs(pdf_dir, ["Kinzie_2022", "LaSalle_2023"])
+    _build(pdf_dir, persist_dir)
+
+    # Change only the first page: its new chunks come before the reused ones
+    pages = [_page("Kinzie_2022", page) for page in range(1, 5)]
+    pages[0] = ["A rewritten first page about the new Green Line station."] * 30
+    write_text_pdf(str(pdf_dir / "Kinzie_2022.pdf"), pages)
+    embedder = ReversingEmbedder()
+    stats = _build(pdf_dir, persist_dir, embedder=embedder)
+
+    assert (stats["files_changed"], stats["files_unchanged"]) == (1, 1)
+    assert stats["chunks_skipped"] > stats["chunks_embedded"] > 0
+    labels, _ = _page_labels(persist_dir, "Kinzie_2022.pdf")
+    assert labels == sorted(labels)
+    manifest = IngestManifest.load(str(persist_dir))
+    assert sorted(manifest.files) == ["Kinzie_2022.pdf", "LaSalle_2023.pdf"]
+
+
+def test_removed_pdf_is_dropped(tmp_path):
+    pdf_dir, persist_dir = tmp_path / "pdfs", tmp_path / "vectorstore"
+    _write_pdfs(pdf_dir, ["Kinzie_2022", "LaSalle_2023"], pages=1)
+    _build(pdf_dir, persist_dir)
+    (pdf_dir / "LaSalle_2023.pdf").unlink()
+    stats = _build(pdf_dir, persist_dir)
+    assert stats["files_removed"] == 1
+    store = BinaryVectorStore(str(persist_dir))
+    assert store.districts() == ["Kinzie"]
+    store.close()
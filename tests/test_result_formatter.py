@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+import duckdb
+import pyarrow as pa
+import pytest
+
+from db.rollups import CATEGORY_COLUMNS
+from runner.executor import run_query
+from runner.result_formatter import format_currency, format_query_result, format_value, is_currency_column
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    yield con
+    con.close()
+
+
+@pytest.mark.parametrize("value, expected", [
+    (1234567, "$1,234,567"), (1234.56, "$1,235"), (12.5, "$12.50"), (-250000.4, "-$250,000"),
+    (Decimal("99.99"), "$99.99"), (0, "$0"),
+])
+def test_format_currency(value, expected):
+    assert format_currency(value) == expected
+
+
+def test_columns_decide_the_format():
+    assert format_value(2022, "Report Year", pa.int64()) == "2022"
+    assert format_value(1500, "row_count", pa.int64()) == "1,500"
+    assert format_value(12.345, "yoy_pct", pa.float64()) == "12.3%"
+    assert format_value(1500, "total_spent", pa.int64()) == "$1,500"
+    assert format_value(None, "total_spent", pa.int64()) == "—"
+    assert format_value("a|b", "TIF District", pa.string()) == "a\\|b"
+
+
+def test_keywords_match_whole_words_only():
+    assert format_value(1500.0, "avg_yearly_spent", pa.float64()) == "$1,500"
+    assert format_value(12, "num_districts", pa.int64()) == "12"
+    assert format_value(2021, "Report_Year", pa.int64()) == "2021"
+    assert format_value(7, "district rank", pa.int64()) == "7"
+
+
+@pytest.mark.parametrize("column", CATEGORY_COLUMNS)
+def test_every_spending_category_is_currency(column):
+    assert is_currency_column(column, pa.float64())
+    assert format_value(1500.0, column, pa.float64()) == "$1,500"
+
+
+def test_single_value(con):
+    result = run_query(con, "SELECT 1234567.0 AS total_spent")
+    assert format_query_result(result) == "total spent: $1,234,567"
+
+
+def test_single_row(con):
+    result = run_query(con, "SELECT 'Kinzie' AS \"TIF District\", 2022 AS \"Report Year\", 500 AS total_spent")
+    assert format_query_result(result) == "- TIF District: Kinzie\n- Report Year: 2022\n- total spent: $500"
+
+
+def test_table_is_aligned_and_capped(con):
+    result = run_query(con, "SELECT range AS \"Report Year\", range * 1000 AS amount FROM range(2000, 2030)")
+    text = format_query_result(result, max_rows=5)
+    lines = text.splitlines()
+    assert lines[0] == "| Report Year | amount |"
+    assert lines[1] == "| ---: | ---: |"
+    assert lines[2] == "| 2000 | $2,000,000 |"
+    assert text.endswith("(showing 5 of 30 rows)")
+
+
+def test_truncated_results_say_so(con):
+    result = run_query(con, "SELECT range AS n FROM range(100)", max_rows=10)
+    assert format_query_result(result, max_rows=5).endswith("(showing 5 of 10+ rows)")
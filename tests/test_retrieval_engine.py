@@ -0,0 +1,85 @@
+import threading
+
+from llm.fake_client import FakeSynthesizer
+from llm.resources import AgentResources
+from pdf_index.binary_store import BinaryVectorStore
+from pdf_index.embedders import StubEmbedder
+from pdf_index.retrieval_engine import PDFRetrievalEngine, get_engine
+from tests.conftest import write_store
+
+
+def make_engine(store_dir):
+    return PDFRetrievalEngine(persist_dir=str(store_dir), embedder=StubEmbedder(), synthesizer=FakeSynthesizer())
+
+
+def test_retrieve_filters_by_district_and_year(store_dir):
+    engine = make_engine(store_dir)
+    nodes = engine.retrieve("What did Kinzie spend on public works in 2023?", top_k=5)
+    assert nodes
+    assert {n.node.metadata["file_name"] for n in nodes} == {"Kinzie_2023.pdf"}
+
+
+def test_concurrent_retrievals_score_in_parallel(store_dir, monkeypatch):
+    engine = make_engine(store_dir)
+    engine.load()
+    # Both searches must be inside the scan at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    original_search = BinaryVectorStore.search
+
+    def search(self, *args, **kwargs):
+        barrier.wait()
+        return original_search(self, *args, **kwargs)
+
+    monkeypatch.setattr(BinaryVectorStore, "search", search)
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(engine.retrieve("Red Line extension", top_k=3))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(results) == 2
+
+
+def test_reload_during_retrieval_keeps_borrowed_store_open(store_dir, monkeypatch):
+    engine = make_engine(store_dir)
+    engine.load()
+    original_search = BinaryVectorStore.search
+
+    def search(self, *args, **kwargs):
+        # The index is rebuilt and reloaded while this query is scoring
+        write_store(store_dir)
+        engine.reload()
+        return original_search(self, *args, **kwargs)
+
+    monkeypatch.setattr(BinaryVectorStore, "search", search)
+    old_store = engine._store
+    nodes = engine.retrieve("LaSalle conversions", top_k=2)
+    assert nodes
+    assert engine._store is not old_store
+    assert old_store.embeddings is None  # closed once the query released it
+    assert engine._borrowed == {}
+
+
+def test_resources_share_the_process_wide_engine(store_dir):
+    resources = AgentResources(client=object(), persist_dir=str(store_dir))
+    try:
+        assert resources.pdf_engine is get_engine(str(store_dir))
+    finally:
+        resources.tool_pool.shutdown()
+
+
+def test_resources_with_custom_backends_get_their_own_engine(store_dir):
+    resources = AgentResources(client=object(), persist_dir=str(store_dir), embedder=StubEmbedder(),
+                               synthesizer=FakeSynthesizer())
+    try:
+        assert resources.pdf_engine is not get_engine(str(store_dir))
+    finally:
+        resources.tool_pool.shutdown()
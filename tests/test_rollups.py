@@ -0,0 +1,96 @@
+import duckdb
+import pytest
+
+from db.rollups import CATEGORY_ROLLUP, DISTRICT_YEAR_ROLLUP, refresh_rollups, rollups_exist
+
+ROWS = [
+    # district, year, public works, job training
+    ("Kinzie", 2020, 100.0, 10.0),
+    ("Kinzie", 2020, 50.0, None),
+    ("Kinzie", 2021, 300.0, 20.0),
+    ("Kinzie", 2023, 80.0, 0.0),
+    ("LaSalle", 2021, 40.0, 5.0),
+    ("LaSalle", 2022, 60.0, 5.0),
+]
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute('CREATE TABLE expenditures ("TIF District" VARCHAR, "Report Year" INTEGER, '
+                '"Public Works" DOUBLE, "Job Training" DOUBLE, "Notes" VARCHAR)')
+    con.executemany("INSERT INTO expenditures VALUES (?, ?, ?, ?, 'x')", ROWS)
+    yield con
+    con.close()
+
+
+def _district_years(con):
+    return {(d, y): (total, prev, change, pct) for d, y, total, prev, change, pct in con.execute(
+        f'SELECT "TIF District", "Report Year", total_spent, prev_total, yoy_change, yoy_pct '
+        f"FROM {DISTRICT_YEAR_ROLLUP}").fetchall()}
+
+
+def test_rollup_matches_raw_sums(con):
+    assert not rollups_exist(con)
+    assert refresh_rollups(con) == 5
+    assert rollups_exist(con)
+
+    raw = dict(((d, y), t) for d, y, t in con.execute(
+        'SELECT "TIF District", "Report Year", SUM(COALESCE("Public Works", 0) + COALESCE("Job Training", 0)) '
+        'FROM expenditures GROUP BY ALL').fetchall())
+    assert {key: row[0] for key, row in _district_years(con).items()} == raw
+    assert con.execute(f'SELECT "Public Works", "Job Training", source_rows FROM {DISTRICT_YEAR_ROLLUP} '
+                       'WHERE "TIF District" = \'Kinzie\' AND "Report Year" = 2020').fetchone() == (150.0, 10.0, 2)
+
+
+def test_year_over_year_figures(con):
+    refresh_rollups(con)
+    rows = _district_years(con)
+    assert rows[("Kinzie", 2020)][1:] == (None, None, None)
+    assert rows[("Kinzie", 2021)][1:] == (160.0, 160.0, 100.0)
+    # 2022 is missing, so 2023 has nothing to compare with
+    assert rows[("Kinzie", 2023)][1:] == (None, None, None)
+    assert rows[("LaSalle", 2022)][1:] == (45.0, 20.0, pytest.approx(20 / 45 * 100))
+
+
+def test_category_rollup_is_consistent_with_district_years(con):
+    refresh_rollups(con)
+    long_totals = dict(((d, y), t) for d, y, t in con.execute(
+        f'SELECT "TIF District", "Report Year", SUM(amount) FROM {CATEGORY_ROLLUP} GROUP BY ALL').fetchall())
+    assert long_totals == {key: row[0] for key, row in _district_years(con).items()}
+    assert {c for (c,) in con.execute(f"SELECT DISTINCT category FROM {CATEGORY_ROLLUP}").fetchall()} == \
+        {"Public Works", "Job Training"}
+    assert con.execute(f"SELECT amount, prev_amount, yoy_change FROM {CATEGORY_ROLLUP} "
+                       "WHERE \"TIF District\" = 'Kinzie' AND \"Report Year\" = 2021 "
+                       "AND category = 'Public Works'").fetchone() == (300.0, 150.0, 150.0)
+
+
+def test_incremental_refresh_rewrites_only_changed_district_years(con):
+    refresh_rollups(con)
+    assert refresh_rollups(con) == 0
+
+    con.execute('UPDATE expenditures SET "Public Works" = 200 '
+                'WHERE "TIF District" = \'Kinzie\' AND "Report Year" = 2020 AND "Job Training" = 10')
+    before = _district_years(con)
+    assert refresh_rollups(con) == 1
+    after = _district_years(con)
+    assert after[("Kinzie", 2020)][0] == 260.0
+    # The following year's comparison moves with it; the other district is untouched
+    assert after[("Kinzie", 2021)][1:3] == (260.0, 60.0)
+    assert after[("LaSalle", 2021)] == before[("LaSalle", 2021)]
+    assert con.execute(f"SELECT SUM(amount) FROM {CATEGORY_ROLLUP} "
+                       "WHERE \"TIF District\" = 'Kinzie' AND \"Report Year\" = 2020").fetchone()[0] == 260.0
+
+    con.execute('DELETE FROM expenditures WHERE "TIF District" = \'LaSalle\' AND "Report Year" = 2021')
+    assert refresh_rollups(con) == 1
+    after = _district_years(con)
+    assert ("LaSalle", 2021) not in after
+    assert after[("LaSalle", 2022)][1:] == (None, None, None)
+    assert con.execute(f"SELECT COUNT(*) FROM {CATEGORY_ROLLUP} WHERE \"TIF District\" = 'LaSalle'").fetchone()[0] == 2
+
+
+def test_table_without_district_or_year_is_skipped():
+    con = duckdb.connect()
+    con.execute('CREATE TABLE expenditures ("Public Works" DOUBLE)')
+    assert refresh_rollups(con) == 0
+    assert not rollups_exist(con)
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from pdf_index.embedding_cache import CACHE_FILE
+from server import build_resources
+
+
+@pytest.fixture
+def resources_factory():
+    built = []
+
+    def build(**kwargs):
+        resources = build_resources(**kwargs)
+        built.append(resources)
+        return resources
+
+    yield build
+    for resources in built:
+        resources.close()
+
+
+def test_openai_callers_share_one_http_pool(store_dir, resources_factory, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    resources = resources_factory(persist_dir=str(store_dir))
+    engine = resources.pdf_engine
+    engine.load()
+    assert resources.client._client is resources.http_client
+    # Query embeddings and answer synthesis go through the same pool as chat
+    assert engine._embedder.embedder._client._client is resources.http_client
+    assert engine._synthesizer._llm._get_client()._client is resources.http_client
+
+
+def test_fake_mode_keeps_embedding_cache_in_persist_dir(store_dir, resources_factory):
+    resources = resources_factory(fake_llm=True, persist_dir=str(store_dir))
+    assert resources.embedder.cache.path == os.path.join(str(store_dir), CACHE_FILE)
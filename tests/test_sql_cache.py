@@ -0,0 +1,80 @@
+import pytest
+
+from llm import query_planner
+from llm.sql_cache import SQLTranslationCache, _anchors, normalize_question
+from pdf_index.embedders import StubEmbedder
+
+VOCABULARY = ["Kinzie", "LaSalle", "Lake", "Public Works", "Job Training"]
+SCHEMA = "CREATE TABLE expenditures (...)"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLTranslationCache(SCHEMA, embedder=StubEmbedder(), path=str(tmp_path / "sql_cache.sqlite"),
+                               threshold=0.5, vocabulary=VOCABULARY)
+
+
+def test_normalize_question():
+    assert normalize_question("  What did Kinzie   SPEND? ") == "what did kinzie spend"
+
+
+def test_anchors_ignore_case_and_possessives():
+    assert _anchors("what was kinzie's spending in 2022", VOCABULARY) == _anchors(
+        "What was Kinzie spending in 2022", VOCABULARY) == {"kinzie", "2022"}
+
+
+def test_anchors_distinguish_ordering_words():
+    most = _anchors("Which district spent the most on public works", VOCABULARY)
+    least = _anchors("Which district spent the least on public works", VOCABULARY)
+    assert most != least
+    assert most == _anchors("which district spent the highest on public works", VOCABULARY)
+    assert _anchors("spending before 2020", VOCABULARY) != _anchors("spending after 2020", VOCABULARY)
+    assert "avg" in _anchors("average kinzie spending", VOCABULARY)
+
+
+def test_anchors_find_lowercase_categories_and_districts():
+    assert _anchors("how much went to public works in lasalle", VOCABULARY) == {"publicworks", "lasalle"}
+    # Short names only match whole words
+    assert _anchors("how much did the lake district spend", VOCABULARY) == {"lake"}
+    assert "lake" not in _anchors("spending by the lakeside office", VOCABULARY)
+
+
+def test_semantic_hit_requires_matching_anchors(cache):
+    cache.store("Which district spent the most on public works in 2022", "SELECT most", 1.5)
+    assert cache.lookup("which district spent the least on public works in 2022") is None
+    sql, match, _ = cache.lookup("Which district spent the highest on Public Works in 2022")
+    assert (sql, match) == ("SELECT most", "semantic")
+    assert cache.lookup("Which district spent the most on public works in 2023") is None
+
+
+def test_exact_hit_and_stats(cache):
+    cache.store("What did Kinzie spend in 2022?", "SELECT 1", 2.0)
+    assert cache.lookup("what did kinzie spend in 2022") == ("SELECT 1", "exact", 1.0)
+    assert cache.summary()["exact_hits"] == 1
+    assert cache.summary()["saved_seconds"] == 2.0
+
+
+def test_schema_change_drops_old_translations(tmp_path):
+    path = str(tmp_path / "sql_cache.sqlite")
+    SQLTranslationCache(SCHEMA, path=path).store("q", "SELECT 1", 1.0)
+    assert SQLTranslationCache(SCHEMA, path=path).lookup("q") is not None
+    assert SQLTranslationCache(SCHEMA + " -- new column", path=path).lookup("q") is None
+
+
+def test_schema_failure_disables_cache_without_invalidating(tmp_path):
+    path = str(tmp_path / "sql_cache.sqlite")
+    SQLTranslationCache(SCHEMA, path=path).store("q", "SELECT 1", 1.0)
+    failed = SQLTranslationCache("-- Failed to read schema: database is locked", path=path)
+    assert not failed.enabled
+    assert failed.lookup("q") is None
+    failed.store("other", "SELECT 2", 1.0)
+    assert SQLTranslationCache(SCHEMA, path=path).lookup("q") == ("SELECT 1", "exact", 1.0)
+
+
+def test_schema_context_failure_is_not_memoized(monkeypatch):
+    results = iter(["-- Failed to read schema: database is locked", SCHEMA, "unused"])
+    monkeypatch.setattr(query_planner, "get_prompt_context", lambda: next(results))
+    monkeypatch.setattr(query_planner, "_schema_context", None)
+    assert query_planner.get_schema_context().startswith("-- Failed")
+    assert query_planner.get_schema_context() == SCHEMA
+    assert query_planner.get_schema_context() == SCHEMA
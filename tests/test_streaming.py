@@ -0,0 +1,43 @@
+import pytest
+
+from llm.agent import TIFAgent
+from llm.fake_client import FakeOpenAIClient, FakeSynthesizer
+from llm.resources import AgentResources
+from pdf_index.embedders import StubEmbedder
+from pdf_index.query_pdf import query_pdf_index
+from pdf_index.retrieval_engine import PDFRetrievalEngine
+
+
+@pytest.fixture
+def agent(store_dir):
+    client = FakeOpenAIClient()
+    resources = AgentResources(client, persist_dir=str(store_dir), embedder=StubEmbedder(),
+                               synthesizer=FakeSynthesizer())
+    yield TIFAgent(client, resources=resources)
+    resources.close()
+
+
+def test_agent_streams_status_tool_output_and_tokens(agent):
+    events = list(agent.stream_query("What were the goals of the Kinzie report in 2022?"))
+    kinds = [e["type"] for e in events]
+    assert kinds[0] == "status"
+    assert "tool_delta" in kinds
+    assert kinds[-1] == "done"
+    tokens = "".join(e["text"] for e in events if e["type"] == "token")
+    assert len([k for k in kinds if k == "token"]) > 1
+    assert tokens == events[-1]["answer"]
+    assert events[-1]["answer"].endswith("[Source: PDF Documents]")
+    assert 0 <= events[-1]["ttft"] <= events[-1]["seconds"]
+
+
+def test_process_query_returns_the_streamed_answer(agent):
+    answer = agent.process_query("What were the goals of the Kinzie report in 2022?")
+    assert "Kinzie" in answer
+
+
+def test_pdf_stream_falls_back_to_whole_answer(store_dir):
+    engine = PDFRetrievalEngine(persist_dir=str(store_dir), embedder=StubEmbedder(), synthesizer=FakeSynthesizer())
+    pieces = list(query_pdf_index("Kinzie goals 2022", engine=engine, stream=True))
+    assert len(pieces) == 1
+    assert pieces[0].startswith("(fake) From Kinzie_2022.pdf")
+    assert query_pdf_index("Kinzie goals 2022", engine=engine) == pieces[0]
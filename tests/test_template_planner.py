@@ -0,0 +1,70 @@
+import duckdb
+import pytest
+
+from llm.template_planner import TemplatePlanner
+
+
+@pytest.fixture
+def planner(expenditures_db):
+    con = duckdb.connect(expenditures_db, read_only=True)
+    yield TemplatePlanner(con)
+    con.close()
+
+
+def _run(expenditures_db, plan):
+    con = duckdb.connect(expenditures_db, read_only=True)
+    try:
+        return con.execute(plan.sql, plan.params).fetchall()
+    finally:
+        con.close()
+
+
+def test_total_for_district_and_year(planner, expenditures_db):
+    plan = planner.plan("Total spending in Austin in 2020")
+    assert plan.template == "total_spent"
+    assert plan.params == [["Austin"], [2020]]
+    rows = _run(expenditures_db, plan)
+    assert [(r[0], r[1]) for r in rows] == [("Austin", 2020)]
+
+
+def test_explicit_year_range(planner):
+    for question in ("Austin spending from 2018 to 2020", "Austin spending between 2018 and 2020",
+                     "Austin spending from 2018 through 2020"):
+        assert planner.plan(question).params == [["Austin"], [2018, 2019, 2020]], question
+
+
+def test_category_total_and_breakdown(planner):
+    assert planner.plan("How much did Kinzie spend on public works in 2021?").template == "category_total"
+    assert planner.plan("Kinzie spending breakdown for 2021").template == "category_breakdown"
+
+
+def test_several_districts(planner):
+    assert planner.plan("Compare spending in Kinzie and LaSalle in 2022").params[0] == ["Kinzie", "LaSalle"]
+
+
+@pytest.mark.parametrize("question", [
+    "Total spending in Austin since 2020",
+    "Total spending in Austin before 2020",
+    "Total spending in Austin after 2020",
+    "Total spending in Austin prior to 2020",
+    "Total spending in Austin until 2020",
+    "Total spending in Austin through 2020",
+    "Total spending in Austin excluding administration in 2020",
+    "Total spending in Austin except administration in 2020",
+    "Total spending in Austin not counting administration in 2020",
+    "Total spending in Austin without administration in 2020",
+    "Total spending in Austin other than administration in 2020",
+])
+def test_open_ranges_and_exclusions_go_to_the_llm(planner, question):
+    assert planner.plan(question) is None
+
+
+@pytest.mark.parametrize("question", [
+    "Which district spent the most in 2020?",
+    "Average spending in Austin",
+    "Why did Austin spend so much in 2020?",
+    "What were the goals of Austin in 2020?",
+    "Total spending in Springfield in 2020",
+])
+def test_other_shapes_go_to_the_llm(planner, question):
+    assert planner.plan(question) is None
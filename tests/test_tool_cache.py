@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm.agent import TIFAgent, ToolError
+from llm.resources import AgentResources
+from llm.tool_cache import ToolResultCache, tool_cache_key
+
+
+def test_key_normalizes_arguments_and_includes_versions():
+    key = tool_cache_key("query_sql_database", {"query": "How much did Kinzie spend?"}, "v1")
+    assert tool_cache_key("query_sql_database", {"query": "  how much did kinzie   spend "}, "v1") == key
+    assert tool_cache_key("query_sql_database", {"query": "How much did Kinzie spend?"}, "v2") != key
+    assert tool_cache_key("search_pdf_documents", {"query": "How much did Kinzie spend?"}, "v1") != key
+
+
+def test_hit_after_miss():
+    cache = ToolResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "result"
+
+    assert cache.get_or_compute("k", compute) == ("result", "miss")
+    assert cache.get_or_compute("k", compute) == ("result", "hit")
+    assert len(calls) == 1
+    assert cache.summary() == {"hits": 1, "coalesced": 0, "misses": 1, "expired": 0, "evicted": 0, "entries": 1}
+
+
+def test_identical_calls_are_coalesced():
+    cache = ToolResultCache()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append(cache.get_or_compute("k", compute)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while cache.summary()["coalesced"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(o for _, o in outcomes) == ["coalesced"] * 3 + ["miss"]
+    assert {r for r, _ in outcomes} == {"answer"}
+
+
+def test_exception_reaches_waiters_and_is_not_cached():
+    cache = ToolResultCache()
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert cache.get_or_compute("k", lambda: "ok") == ("ok", "miss")
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("llm.tool_cache.time.monotonic", lambda: now[0])
+    cache = ToolResultCache(ttl=10)
+    cache.get_or_compute("k", lambda: "old")
+    now[0] += 9
+    assert cache.get_or_compute("k", lambda: "new") == ("old", "hit")
+    now[0] += 2
+    assert cache.get_or_compute("k", lambda: "new") == ("new", "miss")
+    assert cache.summary()["expired"] == 1
+
+
+def test_least_recently_used_is_evicted():
+    cache = ToolResultCache(max_entries=2)
+    cache.get_or_compute("a", lambda: "A")
+    cache.get_or_compute("b", lambda: "B")
+    cache.get_or_compute("a", lambda: "A2")  # a is now the most recent
+    cache.get_or_compute("c", lambda: "C")
+    assert cache.get_or_compute("a", lambda: "A3") == ("A", "hit")
+    assert cache.get_or_compute("b", lambda: "B2") == ("B2", "miss")
+    assert cache.summary()["evicted"] == 2
+
+
+def test_zero_ttl_and_rejected_results_are_not_stored():
+    cache = ToolResultCache(ttl=0)
+    cache.get_or_compute("k", lambda: "a")
+    assert cache.get_or_compute("k", lambda: "b") == ("b", "miss")
+
+    cache = ToolResultCache()
+    cache.get_or_compute("k", lambda: "Error: nope", cacheable=lambda r: not r.startswith("Error"))
+    assert cache.get_or_compute("k", lambda: "fine") == ("fine", "miss")
+
+
+@pytest.mark.parametrize("failure", [
+    "SQL Error: Catalog Error: Table with name expenditure does not exist!",
+    "Error generating SQL: -- LLM error: timeout",
+    "Unknown function: query_sql_database",
+])
+def test_agent_does_not_cache_failed_tool_results(failure, monkeypatch):
+    monkeypatch.setattr(AgentResources, "data_version", "v1")
+    resources = AgentResources(client=object())
+    agent = TIFAgent(resources.client, resources=resources)
+    outcomes = iter([ToolError(failure), "Kinzie spent $1,000."])
+
+    def execute(function_name, function_args, emit=None):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(agent, "_execute_function", execute)
+    try:
+        args = '{"query": "How much did Kinzie spend?"}'
+        assert agent._timed_execute("query_sql_database", args) == failure
+        assert agent._timed_execute("query_sql_database", args) == "Kinzie spent $1,000."
+        assert agent._timed_execute("query_sql_database", args) == "Kinzie spent $1,000."
+        assert resources.tool_cache.summary()["hits"] == 1
+    finally:
+        resources.tool_pool.shutdown()
+
+
+class FailingStreamClient:
+    """Streams the start of an answer, then drops the connection."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        def chunks():
+            delta = SimpleNamespace(content="Kinzie spent ")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+            raise ConnectionError("stream interrupted")
+        return chunks()
+
+
+def test_humanizer_failing_mid_stream_is_not_cached(expenditures_db, monkeypatch):
+    monkeypatch.chdir(os.path.dirname(expenditures_db))
+    client = FailingStreamClient()
+    resources = AgentResources(client=client)
+    agent = TIFAgent(client, resources=resources, llm_humanizer=True)
+    streamed = []
+    try:
+        result = agent._timed_execute("query_sql_database", '{"query": "How much did Kinzie spend in 2022?"}',
+                                      streamed.append)
+        assert streamed == ["Kinzie spent "]
+        assert result == "Error generating humanized response: stream interrupted"
+        assert resources.tool_cache.summary()["entries"] == 0
+    finally:
+        resources.close()
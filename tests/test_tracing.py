@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tracing.summarize import format_summary, load_spans, percentile, summarize_spans
+from tracing.tracer import JSONLExporter, NOOP_SPAN, Tracer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def on_start(self, span):
+        pass
+
+    def on_end(self, span):
+        self.spans.append(span)
+
+
+def _default_exporters(tmp_path, **env):
+    """The exporter classes a fresh process picks up under `env`."""
+    clean = {k: v for k, v in os.environ.items() if not k.startswith("TIF_TRACE")}
+    clean.update(env)
+    code = "from tracing.tracer import get_tracer; print([type(e).__name__ for e in get_tracer().exporters])"
+    # Run from an empty directory so the repo's .env can't turn tracing on
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env={**clean, "PYTHONPATH": REPO_ROOT},
+                         capture_output=True, text=True, check=True).stdout
+    return out.strip().splitlines()[-1]
+
+
+def test_tracing_is_off_by_default(tmp_path):
+    assert _default_exporters(tmp_path) == "[]"
+    assert not os.path.exists(tmp_path / "traces.jsonl")
+
+
+def test_trace_file_or_exporter_turns_jsonl_on(tmp_path):
+    assert _default_exporters(tmp_path, TIF_TRACE_FILE=str(tmp_path / "t.jsonl")) == "['JSONLExporter']"
+    assert _default_exporters(tmp_path, TIF_TRACE_EXPORTER="jsonl") == "['JSONLExporter']"
+    assert _default_exporters(tmp_path, TIF_TRACE_EXPORTER="none", TIF_TRACE_FILE="t.jsonl") == "[]"
+
+
+def test_disabled_tracer_yields_noop_span():
+    tracer = Tracer([])
+    with tracer.span("agent.query") as span:
+        span.set(rows=1)
+        span.add("prompt_tokens", 5)
+    assert span is NOOP_SPAN
+    assert not tracer.enabled
+
+
+def test_spans_nest_and_record_errors():
+    exporter = CollectingExporter()
+    tracer = Tracer([exporter])
+    with tracer.span("agent.query", question="q") as root:
+        with tracer.span("sql.execute") as child:
+            child.add("prompt_tokens", 10)
+            child.add("prompt_tokens", 5)
+        with pytest.raises(ValueError):
+            with tracer.span("sql.humanize"):
+                raise ValueError("boom")
+
+    child, failed, root = exporter.spans
+    assert root.parent_id is None
+    assert child.parent_id == root.span_id and failed.parent_id == root.span_id
+    assert child.trace_id == root.trace_id == failed.trace_id
+    assert child.attributes == {"prompt_tokens": 15}
+    assert failed.error == "ValueError: boom"
+    assert root.attributes == {"question": "q"}
+    assert root.duration_ms >= child.duration_ms
+
+    # A new root starts a new trace
+    with tracer.span("agent.query"):
+        pass
+    assert exporter.spans[-1].trace_id != root.trace_id
+
+
+def test_jsonl_round_trip_and_summary(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer([JSONLExporter(str(path))])
+    for hit in (True, False, True, True):
+        with tracer.span("agent.query"):
+            with tracer.span("pdf.retrieve", cache_hit=hit) as span:
+                span.add("prompt_tokens", 3)
+
+    spans = load_spans([str(path)])
+    assert len(spans) == 8
+    assert all(json.dumps(s) for s in spans)
+
+    rows = {row["stage"]: row for row in summarize_spans(spans)}
+    assert rows["pdf.retrieve"]["count"] == 4
+    assert rows["pdf.retrieve"]["cache_hit_rate"] == 0.75
+    assert rows["pdf.retrieve"]["prompt_tokens"] == 12
+    assert rows["agent.query"]["cache_hit_rate"] is None
+    text = format_summary(list(rows.values()), traces=len({s["trace_id"] for s in spans}))
+    assert text.startswith("4 traces")
+    assert "75%" in text
+
+
+def test_percentiles_are_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 100) == 100
+    assert percentile([7.0], 95) == 7.0
+
+    spans = [{"name": "sql.execute", "trace_id": "t", "duration_ms": float(d)} for d in values]
+    spans.append({"name": "sql.execute", "trace_id": "t", "duration_ms": 1.0, "error": "boom"})
+    (row,) = summarize_spans(spans)
+    assert row["p50_ms"] == 50 and row["p95_ms"] == 95 and row["max_ms"] == 100
+    assert row["errors"] == 1
@@ -0,0 +1,83 @@
+import argparse
+import json
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from tracing.tracer import TRACE_FILE
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def load_spans(paths: Iterable[str]) -> List[Dict]:
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    spans.append(json.loads(line))
+    return spans
+
+
+def summarize_spans(spans: List[Dict]) -> List[Dict]:
+    """
+    Aggregate spans per stage name: count, p50/p95/max latency, error count,
+    token totals, and the hit rate where spans record a `cache_hit` attribute.
+    """
+    by_name = defaultdict(list)
+    for span in spans:
+        by_name[span["name"]].append(span)
+
+    rows = []
+    for name, group in by_name.items():
+        durations = [span["duration_ms"] for span in group]
+        attributes = [span.get("attributes") or {} for span in group]
+        cache_flags = [a["cache_hit"] for a in attributes if "cache_hit" in a]
+        rows.append({
+            "stage": name,
+            "count": len(group),
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+            "max_ms": max(durations),
+            "total_s": sum(durations) / 1000,
+            "errors": sum(1 for span in group if span.get("error")),
+            "prompt_tokens": sum(a.get("prompt_tokens", 0) for a in attributes),
+            "completion_tokens": sum(a.get("completion_tokens", 0) for a in attributes),
+            "cache_hit_rate": sum(cache_flags) / len(cache_flags) if cache_flags else None,
+        })
+    return sorted(rows, key=lambda row: -row["total_s"])
+
+
+def format_summary(rows: List[Dict], traces: int) -> str:
+    header = (f"{'stage':<24} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'total s':>9} "
+              f"{'errors':>6} {'prompt tok':>10} {'compl tok':>9} {'cache hit':>9}")
+    lines = [f"{traces} traces", header, "-" * len(header)]
+    for row in rows:
+        hit_rate = f"{row['cache_hit_rate']:.0%}" if row["cache_hit_rate"] is not None else "-"
+        lines.append(f"{row['stage']:<24} {row['count']:>6} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+                     f"{row['max_ms']:>9.1f} {row['total_s']:>9.2f} {row['errors']:>6} "
+                     f"{row['prompt_tokens']:>10} {row['completion_tokens']:>9} {hit_rate:>9}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize per-stage latency (p50/p95) from JSONL trace files.")
+    parser.add_argument("paths", nargs="*", default=[TRACE_FILE], help="Trace files written by the agent")
+    parser.add_argument("--stage", help="Only stages whose name starts with this prefix, e.g. 'pdf.'")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    spans = load_spans(args.paths)
+    if args.stage:
+        spans = [span for span in spans if span["name"].startswith(args.stage)]
+    rows = summarize_spans(spans)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(format_summary(rows, traces=len({span["trace_id"] for span in spans})))
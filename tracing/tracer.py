@@ -0,0 +1,201 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "jsonl", "otel", "both" or "none". Tracing is off unless asked for; setting
+# TIF_TRACE_FILE alone turns on the JSONL exporter.
+TRACE_FILE = os.getenv("TIF_TRACE_FILE") or "traces.jsonl"
+TRACE_EXPORTER = os.getenv("TIF_TRACE_EXPORTER") or ("jsonl" if os.getenv("TIF_TRACE_FILE") else "none")
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("tif_current_span", default=None)
+
+
+class Span:
+    """One timed stage of a request, with free-form attributes (tokens, cache hits, row counts...)."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end", "attributes", "error", "_otel")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes = dict(attributes)
+        self.error: Optional[str] = None
+        self._otel = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, name: str, amount=1):
+        """Increment a numeric attribute, e.g. `span.add("prompt_tokens", usage.prompt_tokens)`."""
+        self.attributes[name] = self.attributes.get(name, 0) + (amount or 0)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time()) - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def add(self, name: str, amount=1):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JSONLExporter:
+    """Append each finished span as one JSON line."""
+
+    def __init__(self, path=TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span):
+        pass
+
+    def on_end(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTelExporter:
+    """
+    Mirror spans into OpenTelemetry, so any configured OTel exporter (OTLP,
+    Jaeger, console...) receives them. Requires `opentelemetry-api`; the SDK and
+    exporter setup are left to the deployment.
+    """
+
+    def __init__(self, service_name="tif-agent"):
+        from opentelemetry import trace
+
+        self._trace = trace
+        self._tracer = trace.get_tracer(service_name)
+
+    def on_start(self, span: Span):
+        parent = _find_otel_parent(span)
+        context = self._trace.set_span_in_context(parent) if parent is not None else None
+        span._otel = self._tracer.start_span(span.name, context=context, start_time=int(span.start * 1e9))
+
+    def on_end(self, span: Span):
+        otel_span = span._otel
+        if otel_span is None:
+            return
+        for key, value in span.attributes.items():
+            if isinstance(value, (str, bool, int, float)):
+                otel_span.set_attribute(key, value)
+        if span.error:
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.error))
+        otel_span.end(end_time=int(span.end * 1e9))
+
+
+def _find_otel_parent(span: Span):
+    parent = _current_span.get()
+    return parent._otel if isinstance(parent, Span) and parent.span_id == span.parent_id else None
+
+
+class Tracer:
+    """Creates spans, tracks the current one per context, and hands finished spans to the exporters."""
+
+    def __init__(self, exporters: Optional[List] = None):
+        self.exporters = exporters or []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        if not self.exporters:
+            yield NOOP_SPAN
+            return
+        span = Span(name, _current_span.get(), attributes)
+        for exporter in self.exporters:
+            exporter.on_start(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end = time.time()
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Reset from another context, e.g. a generator closed on a different thread
+                _current_span.set(None)
+            for exporter in self.exporters:
+                try:
+                    exporter.on_end(span)
+                except Exception as e:
+                    print(f"Trace export failed: {e}")
+
+
+def _default_exporters() -> List:
+    exporters = []
+    if TRACE_EXPORTER in ("jsonl", "both"):
+        exporters.append(JSONLExporter(TRACE_FILE))
+    if TRACE_EXPORTER in ("otel", "both"):
+        try:
+            exporters.append(OTelExporter())
+        except ImportError:
+            print("TIF_TRACE_EXPORTER asks for OpenTelemetry, but opentelemetry-api is not installed")
+    return exporters
+
+
+_tracer = Tracer(_default_exporters())
+
+
+def configure_tracing(exporters: Optional[List] = None):
+    """Replace the exporters spans are sent to; an empty list turns tracing off."""
+    _tracer.exporters = list(exporters or [])
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """Time a stage: `with span("sql.execute", rows=...) as s: ...; s.set(...)`."""
+    return _tracer.span(name, **attributes)
+
+
+def current_span():
+    """The innermost open span in this context, for adding attributes from deeper code."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def record_usage(target, usage):
+    """Add an OpenAI response's token usage to a span."""
+    if usage is None:
+        return
+    target.add("prompt_tokens", getattr(usage, "prompt_tokens", 0))
+    target.add("completion_tokens", getattr(usage, "completion_tokens", 0))